@@ -0,0 +1,32 @@
+-- Add delta sync support for edutech_cards
+-- GET /api/cards/changes?since=<version> returns only the rows whose updated_at is newer than the client's version,
+-- so every write (including the reorder RPC and soft delete) must bump updated_at
+
+-- 비어 있는 updated_at 채우기
+UPDATE edutech_cards
+SET updated_at = COALESCE(created_at, NOW())
+WHERE updated_at IS NULL;
+
+ALTER TABLE edutech_cards
+ALTER COLUMN updated_at SET NOT NULL;
+
+-- 모든 UPDATE에서 updated_at 갱신 (reorder_edutech_cards RPC처럼 앱이 updated_at을 보내지 않는 경로 포함)
+-- clock_timestamp()는 트랜잭션 시작 시각이 아닌 실제 시각이므로 늦게 커밋된 행이 이전 버전에 묻히는 경우가 줄어듭니다
+CREATE OR REPLACE FUNCTION touch_edutech_cards_updated_at()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    NEW.updated_at = clock_timestamp();
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS edutech_cards_touch_updated_at ON edutech_cards;
+CREATE TRIGGER edutech_cards_touch_updated_at
+BEFORE UPDATE ON edutech_cards
+FOR EACH ROW
+EXECUTE FUNCTION touch_edutech_cards_updated_at();
+
+-- 변경분 조회: WHERE updated_at > since ORDER BY updated_at, id
+CREATE INDEX IF NOT EXISTS idx_edutech_cards_updated_at ON edutech_cards(updated_at, id);
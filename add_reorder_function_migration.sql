@@ -0,0 +1,28 @@
+-- Add batched reorder support for edutech_cards
+-- This migration allows fractional sort_order values and adds a single-statement reorder RPC
+-- used by POST /api/cards/reorder
+
+-- 카드 하나를 옮길 때 그 카드만 수정할 수 있도록 두 값 사이의 소수 값을 허용
+ALTER TABLE edutech_cards
+ALTER COLUMN sort_order TYPE DOUBLE PRECISION;
+
+-- 모든 순서 변경을 하나의 UPDATE 문으로 적용 (원자적), 실제로 값이 바뀐 행 수를 반환
+CREATE OR REPLACE FUNCTION reorder_edutech_cards(orders JSONB)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    updated_count INTEGER;
+BEGIN
+    UPDATE edutech_cards AS c
+    SET sort_order = o.sort_order
+    FROM jsonb_to_recordset(orders) AS o(id BIGINT, sort_order DOUBLE PRECISION)
+    WHERE c.id = o.id
+      AND c.sort_order IS DISTINCT FROM o.sort_order;
+
+    GET DIAGNOSTICS updated_count = ROW_COUNT;
+    RETURN updated_count;
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION reorder_edutech_cards(JSONB) TO anon, authenticated;
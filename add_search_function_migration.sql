@@ -0,0 +1,85 @@
+-- Add ranked full-text search function for edutech_cards
+-- This migration adds the search_edutech_cards RPC used by GET /api/cards?search=...&search_mode=fulltext
+-- The WHERE clause repeats the exact idx_edutech_cards_search expression so the GIN index is used.
+
+CREATE OR REPLACE FUNCTION search_edutech_cards(
+    search_query TEXT,
+    include_hidden BOOLEAN DEFAULT FALSE,
+    max_results INTEGER DEFAULT 100
+)
+RETURNS SETOF edutech_cards
+LANGUAGE sql
+STABLE
+AS $$
+    WITH raw_terms AS (
+        -- 공백으로 나눈 검색어에서 tsquery 특수문자를 제거 (view.js filterCards()와 같은 AND 검색)
+        SELECT DISTINCT regexp_replace(t, '[^[:alnum:]_]+', '', 'g') AS term
+        FROM regexp_split_to_table(trim(search_query), '\s+') AS t
+    ),
+    terms AS (
+        SELECT
+            array_agg(term) AS original_terms,
+            array_agg(DISTINCT lower(term)) AS lower_terms,
+            array_agg(DISTINCT upper(term)) AS upper_terms,
+            array_agg(DISTINCT initcap(term)) AS initcap_terms
+        FROM raw_terms
+        WHERE term <> ''
+    ),
+    q AS (
+        SELECT
+            -- 키워드/교과목 배열은 대소문자를 구분하므로 흔한 표기를 모두 넣어 GIN 인덱스로 비교
+            original_terms || lower_terms || upper_terms || initcap_terms AS array_terms,
+            lower_terms,
+            to_tsquery('simple', array_to_string(
+                ARRAY(SELECT quote_literal(x) || ':*' FROM unnest(lower_terms) AS x), ' & '
+            )) AS tsq
+        FROM terms
+        WHERE lower_terms IS NOT NULL
+    )
+    SELECT c.*
+    FROM edutech_cards AS c, q
+    WHERE (include_hidden OR c.view = 1)
+      -- 인덱스로 후보를 찾는 조건 (GIN: idx_edutech_cards_search, idx_edutech_cards_keyword, idx_edutech_cards_useful_subjects)
+      AND (
+        to_tsvector('simple',
+            COALESCE(c.webpage_name, '') || ' ' ||
+            COALESCE(c.user_summary, '') || ' ' ||
+            COALESCE(c.ai_summary, '') || ' ' ||
+            COALESCE(c.educational_meaning, '')
+        ) @@ q.tsq
+        OR c.keyword && q.array_terms
+        OR c.useful_subjects && q.array_terms
+      )
+      -- 후보 중에서 모든 검색어가 본문, 키워드, 교과목 중 한 곳에는 있어야 함
+      AND NOT EXISTS (
+        SELECT 1
+        FROM unnest(q.lower_terms) AS term
+        WHERE NOT (
+            to_tsvector('simple',
+                COALESCE(c.webpage_name, '') || ' ' ||
+                COALESCE(c.user_summary, '') || ' ' ||
+                COALESCE(c.ai_summary, '') || ' ' ||
+                COALESCE(c.educational_meaning, '')
+            ) @@ to_tsquery('simple', quote_literal(term) || ':*')
+            OR EXISTS (SELECT 1 FROM unnest(c.keyword) AS k WHERE lower(k) = term)
+            OR EXISTS (SELECT 1 FROM unnest(c.useful_subjects) AS s WHERE lower(s) = term)
+        )
+      )
+    ORDER BY
+        ts_rank(
+            setweight(to_tsvector('simple', COALESCE(c.webpage_name, '')), 'A') ||
+            setweight(to_tsvector('simple', COALESCE(c.user_summary, '')), 'B') ||
+            setweight(to_tsvector('simple',
+                COALESCE(c.ai_summary, '') || ' ' || COALESCE(c.educational_meaning, '')), 'C'),
+            q.tsq
+        )
+        + 0.5 * (SELECT count(*) FROM unnest(c.keyword) AS k WHERE lower(k) = ANY(q.lower_terms))
+        + 0.3 * (SELECT count(*) FROM unnest(c.useful_subjects) AS s WHERE lower(s) = ANY(q.lower_terms))
+        DESC,
+        c.sort_order ASC,
+        c.created_at DESC
+    LIMIT LEAST(GREATEST(max_results, 1), 500);
+$$;
+
+-- 익명 사용자도 검색 가능하도록 실행 권한 부여
+GRANT EXECUTE ON FUNCTION search_edutech_cards(TEXT, BOOLEAN, INTEGER) TO anon, authenticated;
@@ -0,0 +1,7 @@
+-- Add thumbnail size variants to edutech_cards
+-- This migration stores the WebP variant URLs generated by POST /api/upload-thumbnail
+-- so card grids can load the smallest image instead of the full-size thumbnail
+
+-- 너비별 변형 URL: {"80": "...-80.webp", "240": "...-240.webp", "480": "...-480.webp"}
+ALTER TABLE edutech_cards
+ADD COLUMN IF NOT EXISTS thumbnail_variants JSONB NOT NULL DEFAULT '{}'::jsonb;
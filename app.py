@@ -1,16 +1,66 @@
 #!/usr/bin/env python3
 import os
 import sys
+import time
+import atexit
+import queue
+import random
 import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener
 
 # Configure logging for Railway
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+# 요청 스레드는 로그 레코드를 큐에 넣기만 하고, 별도 스레드(QueueListener)가 stdout에 기록합니다.
+# - LOG_LEVEL: 기본 INFO (요청/카드 내용 덤프는 DEBUG에서만 출력)
+# - LOG_SAMPLE_RATE / LOG_SAMPLE_RATES: 경로별 INFO 이하 로그를 요청 단위로 샘플링
+#   예) LOG_SAMPLE_RATES="/api/cards=0.1,/thumb/<int:card_id>/<int:size>=0"
+#   경고/오류는 샘플링과 관계없이 항상 기록됩니다.
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+LOG_SAMPLE_RATE = float(os.getenv('LOG_SAMPLE_RATE', '1.0'))
+LOG_SAMPLE_RATES = {
+    route.strip(): float(rate)
+    for route, _, rate in (item.rpartition('=') for item in os.getenv('LOG_SAMPLE_RATES', '').split(',') if '=' in item)
+}
+
+log_context = threading.local()  # sampled: 현재 요청의 INFO 이하 로그를 남길지
+
+class RequestSamplingFilter(logging.Filter):
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or getattr(log_context, 'sampled', True)
+
+class DroppingQueueHandler(QueueHandler):
+    """큐가 가득 차면 기다리지 않고 버립니다. (stdout이 느려도 요청이 막히지 않도록)"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+log_output_handler = logging.StreamHandler(sys.stdout)
+log_output_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+log_queue_handler = DroppingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+log_queue_handler.setFormatter(logging.Formatter('%(message)s'))  # 최종 형식은 log_output_handler가 적용
+log_queue_handler.addFilter(RequestSamplingFilter())
+log_listener = None
+
+def start_log_listener():
+    """로그 기록 스레드를 시작합니다. (gunicorn --preload에서는 fork 후 워커마다 다시 시작)"""
+    global log_listener
+    log_queue_handler.queue = queue.Queue(LOG_QUEUE_SIZE)
+    log_listener = QueueListener(log_queue_handler.queue, log_output_handler, respect_handler_level=True)
+    log_listener.start()
+
+logging.basicConfig(level=LOG_LEVEL, handlers=[log_queue_handler])
+start_log_listener()
+if hasattr(os, 'register_at_fork'):  # Windows에는 fork가 없음
+    os.register_at_fork(after_in_child=start_log_listener)
+atexit.register(lambda: log_listener.stop())
 logger = logging.getLogger(__name__)
 
 logger.info("=== Flask 앱 초기화 시작 ===")
@@ -25,33 +75,182 @@ except Exception as e:
 
 # Import Flask components
 try:
-    from flask import Flask, render_template, request, jsonify, send_from_directory
+    from flask import Flask, Response, render_template, request, jsonify, send_file, send_from_directory, stream_with_context
+    from flask import Request
     from werkzeug.utils import secure_filename
+    from werkzeug.exceptions import RequestEntityTooLarge
     import uuid
-    from urllib.parse import urlparse
-    from datetime import datetime
+    import io
+    import re
+    import csv
+    import gzip
+    import json
+    import tempfile
+    from concurrent.futures import ThreadPoolExecutor
+    from contextlib import contextmanager
+    from collections import deque
+    import base64
+    import html
+    import hashlib
+    from urllib.parse import urlsplit, parse_qsl, urlencode
+    import sqlite3
+    from datetime import datetime, timedelta, timezone
     logger.info("✅ Flask 모듈 import 완료")
 except ImportError as e:
     logger.error(f"❌ Flask 모듈 import 실패: {e}")
     raise
 
-# Import Supabase
+# 선택 의존성: brotli 압축 (없으면 gzip만 사용)
 try:
-    from supabase import create_client, Client
-    logger.info("✅ Supabase 모듈 import 완료")
-except ImportError as e:
-    logger.error(f"❌ Supabase 모듈 import 실패: {e}")
-    raise
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+# 무거운 모듈은 처음 사용할 때 불러옵니다. (import 시간: bench_startup.py로 측정)
+#   supabase(+gotrue/realtime/httpx) 약 300ms, PIL.Image 약 17ms, openpyxl은 내보내기 함수 안에서 import
+# 선택 의존성: Pillow 썸네일 변환 (없으면 업로드 원본을 그대로 저장)
+pillow_modules = None
+
+def load_pillow():
+    """(Image, ImageOps)를 반환합니다. Pillow가 없으면 None"""
+    global pillow_modules
+    if pillow_modules is None:
+        try:
+            from PIL import Image, ImageOps
+            pillow_modules = (Image, ImageOps)
+        except ImportError:
+            pillow_modules = ()
+    return pillow_modules or None
+
+class AppRequest(Request):
+    """카드 가져오기 파일만 MAX_CONTENT_LENGTH보다 크게 받습니다. (나머지 요청은 1MB 제한 유지)"""
+
+    @property
+    def max_content_length(self):
+        if self.endpoint == 'import_card_file':
+            return IMPORT_MAX_BYTES
+        return super().max_content_length
 
 logger.info("Flask 앱 생성 중...")
 app = Flask(__name__)
+app.request_class = AppRequest
 
 # 파일 업로드 설정 (Supabase Storage 전용)
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
 app.config['MAX_CONTENT_LENGTH'] = 1 * 1024 * 1024  # 1MB max file size
+IMPORT_MAX_BYTES = int(os.getenv('IMPORT_MAX_BYTES', str(20 * 1024 * 1024)))  # /api/cards/import 파일 크기 제한
+THUMBNAIL_MAX_BYTES = 1 * 1024 * 1024
+THUMBNAIL_UPLOAD_CHUNK_SIZE = 64 * 1024  # 업로드 요청당 메모리 사용량은 이 크기로 제한됩니다
+
+# 이미지 형식은 확장자가 아니라 파일 앞부분(매직 바이트)으로 판별합니다.
+IMAGE_SIGNATURES = (
+    (b'\x89PNG\r\n\x1a\n', 'png', 'image/png'),
+    (b'\xff\xd8\xff', 'jpg', 'image/jpeg'),
+    (b'GIF87a', 'gif', 'image/gif'),
+    (b'GIF89a', 'gif', 'image/gif'),
+)
+IMAGE_SNIFF_BYTES = 12
+
+def sniff_image_type(head):
+    """파일 앞부분으로 (확장자, content-type)을 반환합니다. 지원하지 않는 형식이면 None"""
+    for signature, extension, content_type in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return extension, content_type
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp', 'image/webp'
+    return None
+
+# 요청 계측 (Server-Timing 헤더, /metrics)
+# 요청마다 구간(db, storage, image, serialize, xlsx)별 소요 시간을 모아 Server-Timing 헤더로 보내고,
+# 경로별 최근 요청으로 지연시간 분위수(p50/p95/p99)를 계산해 /metrics에서 Prometheus 형식으로 제공합니다.
+# 구간 시간은 중첩된 하위 구간을 뺀 순수 시간이라 합계가 total을 넘지 않습니다. (값은 워커 프로세스별)
+METRICS_WINDOW = 1024  # 분위수 계산에 쓰는 경로별 최근 요청 수
+METRICS_QUANTILES = (0.5, 0.95, 0.99)
+
+request_timing = threading.local()  # started, timings({구간: 초}), stack(하위 구간 누적 시간)
+metrics_lock = threading.Lock()
+request_metrics = {}  # (route, method) -> {'samples', 'count', 'sum'}
+phase_metrics = {}  # (route, phase) -> {'samples', 'count', 'sum'}
+request_counts = {}  # (route, method, status) -> 요청 수
+worker_stats = {'requests_in_flight': 0, 'requests_in_flight_peak': 0, 'exports_queued': 0, 'exports_running': 0}
+
+def record_metric(table, key, seconds):
+    with metrics_lock:
+        entry = table.get(key)
+        if entry is None:
+            entry = table[key] = {'samples': deque(maxlen=METRICS_WINDOW), 'count': 0, 'sum': 0.0}
+        entry['samples'].append(seconds)
+        entry['count'] += 1
+        entry['sum'] += seconds
 
-def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+@contextmanager
+def timed(phase):
+    """구간 소요 시간을 현재 요청에 기록합니다. (데코레이터로도 사용 가능)
+
+    요청 밖(백그라운드 내보내기 등)에서 실행되면 route="background"로 바로 집계합니다.
+    """
+    stack = getattr(request_timing, 'stack', None)
+    if stack is None:
+        stack = request_timing.stack = []
+    stack.append(0.0)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        own = elapsed - stack.pop()
+        if stack:
+            stack[-1] += elapsed
+        timings = getattr(request_timing, 'timings', None)
+        if timings is not None:
+            timings[phase] = timings.get(phase, 0.0) + own
+        else:
+            record_metric(phase_metrics, ('background', phase), own)
+
+@app.before_request
+def start_request_timing():
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    rate = LOG_SAMPLE_RATES.get(route, LOG_SAMPLE_RATE)
+    log_context.sampled = rate >= 1 or random.random() < rate
+    request_timing.started = time.perf_counter()
+    request_timing.timings = {}
+    request_timing.stack = []
+    with metrics_lock:
+        worker_stats['requests_in_flight'] += 1
+        worker_stats['requests_in_flight_peak'] = max(worker_stats['requests_in_flight_peak'], worker_stats['requests_in_flight'])
+
+@app.after_request
+def add_server_timing(response):
+    started = getattr(request_timing, 'started', None)
+    timings = getattr(request_timing, 'timings', None)
+    if started is None or timings is None:
+        return response
+    
+    elapsed = time.perf_counter() - started
+    response.headers['Server-Timing'] = ', '.join(
+        [f"{phase};dur={seconds * 1000:.1f}" for phase, seconds in timings.items()]
+        + [f"total;dur={elapsed * 1000:.1f}"]
+    )
+    
+    # 스트리밍 응답은 본문 전송이 끝난 뒤 집계 (전송 중 기록된 xlsx/db 구간 포함)
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    method = request.method
+    status = response.status_code
+    
+    def finish_request_metrics():
+        record_metric(request_metrics, (route, method), time.perf_counter() - started)
+        for phase, seconds in timings.items():
+            record_metric(phase_metrics, (route, phase), seconds)
+        with metrics_lock:
+            request_counts[(route, method, status)] = request_counts.get((route, method, status), 0) + 1
+            worker_stats['requests_in_flight'] -= 1
+        if request_timing.timings is timings:
+            request_timing.timings = None
+    
+    response.call_on_close(finish_request_metrics)
+    return response
 
 # Supabase 설정
 logger.info("Supabase 연결 설정 중...")
@@ -62,35 +261,1326 @@ supabase_service_key = os.getenv('SUPABASE_SERVICE_ROLE_KEY')
 logger.info(f"Supabase URL 존재: {bool(supabase_url)}")
 logger.info(f"Supabase Key 존재: {bool(supabase_key)}")
 
+# Supabase HTTP 연결 풀
+# postgrest(DB), storage3(Storage), Storage REST 직접 호출이 프로세스당 하나의 httpx 연결 풀을 공유합니다.
+# 같은 호스트로 가는 keep-alive/HTTP/2 연결을 재사용하므로 대부분의 호출은 TCP/TLS 핸드셰이크 없이 한 번의 왕복으로 끝나고,
+# 백그라운드 준비 상태 확인(READINESS_PROBE_INTERVAL < keep-alive 유지 시간)이 유휴 워커의 연결도 살려 둡니다.
+SUPABASE_HTTP_MAX_CONNECTIONS = int(os.getenv('SUPABASE_HTTP_MAX_CONNECTIONS', '20'))
+SUPABASE_HTTP_MAX_KEEPALIVE = int(os.getenv('SUPABASE_HTTP_MAX_KEEPALIVE', '10'))
+SUPABASE_HTTP_KEEPALIVE_EXPIRY = float(os.getenv('SUPABASE_HTTP_KEEPALIVE_EXPIRY', '60'))  # 초, 유휴 연결 유지 시간
+SUPABASE_HTTP_CONNECT_TIMEOUT = float(os.getenv('SUPABASE_HTTP_CONNECT_TIMEOUT', '5'))  # 초
+SUPABASE_HTTP_TIMEOUT = float(os.getenv('SUPABASE_HTTP_TIMEOUT', '30'))  # 초, 읽기/쓰기/풀 대기
+SUPABASE_HTTP_RETRIES = int(os.getenv('SUPABASE_HTTP_RETRIES', '2'))
+SUPABASE_HTTP_RETRY_BACKOFF = 0.1  # 초, 재시도마다 2배 (+ 무작위 지터)
+SUPABASE_HTTP2 = os.getenv('SUPABASE_HTTP2', '1') != '0'  # h2 패키지(requirements.txt의 httpx[http2])가 있을 때만 사용
+IDEMPOTENT_METHODS = frozenset(('GET', 'HEAD', 'OPTIONS'))
+RETRY_STATUS_CODES = frozenset((502, 503, 504))
+
+http_pool_lock = threading.Lock()
+http_pool_stats = {'requests': 0, 'retries': 0, 'errors': 0, 'connections_opened': 0, 'tls_handshakes': 0}
+http_transport = None
+http_transport_lock = threading.Lock()
+http_session = None  # Storage REST API 직접 호출용
+http_session_lock = threading.Lock()
+
+def count_http_pool(name):
+    with http_pool_lock:
+        http_pool_stats[name] += 1
+
+def trace_http_connection(event, info):
+    """httpcore trace 콜백: 새 TCP 연결과 TLS 핸드셰이크 수를 셉니다. (요청 수와 비교하면 연결 재사용률)"""
+    if event == 'connection.connect_tcp.complete':
+        count_http_pool('connections_opened')
+    elif event == 'connection.start_tls.complete':
+        count_http_pool('tls_handshakes')
+
+class RetryingTransport:
+    """연결 풀 transport를 감싸 일시적인 오류를 지수 백오프로 재시도합니다.
+
+    연결 수립 실패(ConnectError/ConnectTimeout)는 요청이 서버에 닿지 않았으므로 모든 메서드를 재시도하고,
+    끊긴 keep-alive 연결(RemoteProtocolError/ReadError)과 502/503/504 응답은 멱등 메서드만 재시도합니다.
+
+    여러 httpx.Client가 같은 transport를 쓰므로 Client.close()/with 블록이 부르는 close()/__exit__는 아무것도 하지 않고,
+    연결 풀은 프로세스 종료 시 shutdown()으로 한 번만 닫습니다.
+    """
+
+    def __init__(self, transport, retries, http2):
+        self.transport = transport
+        self.retries = retries
+        self.http2 = http2
+
+    def handle_request(self, request):
+        import httpx
+        request.extensions['trace'] = trace_http_connection
+        idempotent = request.method in IDEMPOTENT_METHODS
+        count_http_pool('requests')
+        for attempt in range(self.retries + 1):
+            if attempt:
+                count_http_pool('retries')
+                time.sleep(SUPABASE_HTTP_RETRY_BACKOFF * 2 ** (attempt - 1) * (0.5 + random.random()))
+            last_attempt = attempt == self.retries
+            try:
+                response = self.transport.handle_request(request)
+            except (httpx.ConnectError, httpx.ConnectTimeout):
+                if last_attempt:
+                    count_http_pool('errors')
+                    raise
+                continue
+            except (httpx.RemoteProtocolError, httpx.ReadError):
+                if last_attempt or not idempotent:
+                    count_http_pool('errors')
+                    raise
+                continue
+            if idempotent and not last_attempt and response.status_code in RETRY_STATUS_CODES:
+                response.close()
+                continue
+            return response
+
+    def close(self):
+        pass  # 공유 연결 풀: 클라이언트 하나를 닫아도 다른 클라이언트의 연결은 유지
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def shutdown(self):
+        self.transport.close()
+
+def get_http_transport():
+    """프로세스 공유 연결 풀 (처음 사용할 때 생성, fork 후에는 워커마다 새로 생성)"""
+    global http_transport
+    if http_transport is None:
+        with http_transport_lock:
+            if http_transport is None:
+                import httpx
+                try:
+                    import h2  # noqa: F401  (httpx[http2])
+                    http2 = SUPABASE_HTTP2
+                except ImportError:
+                    http2 = False
+                http_transport = RetryingTransport(httpx.HTTPTransport(
+                    http2=http2,
+                    limits=httpx.Limits(
+                        max_connections=SUPABASE_HTTP_MAX_CONNECTIONS,
+                        max_keepalive_connections=SUPABASE_HTTP_MAX_KEEPALIVE,
+                        keepalive_expiry=SUPABASE_HTTP_KEEPALIVE_EXPIRY,
+                    ),
+                ), SUPABASE_HTTP_RETRIES, http2)
+                logger.info("✅ HTTP 연결 풀 생성 (HTTP/2: %s, 최대 연결 %d)", http2, SUPABASE_HTTP_MAX_CONNECTIONS)
+    return http_transport
+
+def build_http_client(base_url='', headers=None):
+    """공유 연결 풀을 쓰는 httpx 클라이언트 (base_url/헤더만 클라이언트별로 다름)"""
+    import httpx
+    return httpx.Client(
+        base_url=base_url,
+        headers=headers,
+        transport=get_http_transport(),
+        timeout=httpx.Timeout(SUPABASE_HTTP_TIMEOUT, connect=SUPABASE_HTTP_CONNECT_TIMEOUT),
+        follow_redirects=True,
+    )
+
+def use_shared_http_pool(client):
+    """supabase 클라이언트의 postgrest/storage 세션을 공유 연결 풀 세션으로 바꿉니다.
+
+    supabase-py는 하위 클라이언트마다 별도의 httpx 풀을 만들어 anon/admin, DB/Storage가 연결을 따로 맺습니다.
+    """
+    for sub_client in (client.postgrest, client.storage):
+        own_session = sub_client.session
+        sub_client.session = build_http_client(str(own_session.base_url), own_session.headers)
+        own_session.close()
+    client.storage._client = client.storage.session  # storage3의 버킷 API가 요청에 쓰는 참조
+
+def get_http_session():
+    global http_session
+    if http_session is None:
+        with http_session_lock:
+            if http_session is None:
+                http_session = build_http_client()
+    return http_session
+
+def get_http_pool_stats():
+    with http_pool_lock:
+        stats = dict(http_pool_stats)
+    transport = http_transport
+    pool = getattr(transport.transport, '_pool', None) if transport else None
+    connections = pool.connections if pool is not None else []
+    idle = sum(1 for connection in connections if connection.is_idle())
+    stats.update({
+        'http2': transport.http2 if transport else None,
+        'connections': len(connections),
+        'idle_connections': idle,
+        'active_connections': len(connections) - idle,
+        'max_connections': SUPABASE_HTTP_MAX_CONNECTIONS,
+        'reuse_ratio': round(1 - stats['connections_opened'] / stats['requests'], 3) if stats['requests'] else None,
+    })
+    return stats
+
+class LazySupabaseClient:
+    """처음 사용할 때 Supabase 클라이언트를 만드는 프록시
+
+    import 시에는 supabase 모듈을 불러오지 않고 네트워크에도 연결하지 않으므로
+    워커 부팅 시간이 DB 지연과 무관해집니다. 연결 상태는 백그라운드 준비 상태 확인(readiness)이 확인합니다.
+    """
+
+    def __init__(self, key, label):
+        self.key = key
+        self.label = label
+        self.client = None
+        self.lock = threading.Lock()
+
+    def get(self):
+        if self.client is None:
+            with self.lock:
+                if self.client is None:
+                    started = time.perf_counter()
+                    from supabase import create_client
+                    client = create_client(supabase_url, self.key)
+                    use_shared_http_pool(client)
+                    self.client = client
+                    logger.info("✅ Supabase %s 클라이언트 생성 완료 (%.0fms)", self.label, (time.perf_counter() - started) * 1000)
+        return self.client
+
+    def reset(self):
+        self.client = None
+        self.lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
 if not supabase_url or not supabase_key:
     logger.error("❌ Supabase 환경변수 누락")
     logger.error("필요한 환경변수: NEXT_PUBLIC_SUPABASE_URL, NEXT_PUBLIC_SUPABASE_ANON_KEY")
     supabase = None
     supabase_admin = None
 else:
-    try:
-        # 일반 클라이언트 (데이터베이스용)
-        supabase: Client = create_client(supabase_url, supabase_key)
-        logger.info("✅ Supabase 클라이언트 생성 완료")
-        
-        # Storage용 관리자 클라이언트
-        if supabase_service_key:
-            supabase_admin: Client = create_client(supabase_url, supabase_service_key)
-            logger.info("✅ Supabase 관리자 클라이언트 생성 완료")
+    # 일반 클라이언트 (데이터베이스용)
+    supabase = LazySupabaseClient(supabase_key, 'anon')
+    
+    # Storage용 관리자 클라이언트
+    if supabase_service_key:
+        supabase_admin = LazySupabaseClient(supabase_service_key, 'admin')
+    else:
+        supabase_admin = supabase
+        logger.warning("⚠️ Service Role Key 없음, anon key 사용")
+
+def reset_http_clients():
+    """fork 직후 자식(워커)에서 부모가 만든 클라이언트와 연결 풀을 버립니다.
+
+    gunicorn --preload에서 마스터가 연결을 맺은 뒤 fork하면 워커들이 같은 소켓/TLS 세션을 공유하게 됩니다.
+    자식에서 close()하면 TLS 종료 메시지가 부모의 연결로 나가므로 닫지 않고 참조만 버리며,
+    fork 시점에 다른 스레드가 잡고 있었을 수 있는 락도 새로 만듭니다.
+    """
+    global http_transport, http_transport_lock, http_session, http_session_lock, http_pool_lock
+    http_transport = None
+    http_session = None
+    http_transport_lock = threading.Lock()
+    http_session_lock = threading.Lock()
+    http_pool_lock = threading.Lock()
+    for name in http_pool_stats:
+        http_pool_stats[name] = 0
+    for client in (supabase, supabase_admin):
+        if client is not None:
+            client.reset()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=reset_http_clients)
+
+def close_http_transport():
+    """프로세스 종료 시 공유 연결 풀을 한 번만 닫습니다. (fork로 물려받은 풀은 reset_http_clients가 이미 버림)"""
+    transport = http_transport
+    if transport is not None:
+        try:
+            transport.shutdown()
+        except Exception as e:
+            logger.debug("HTTP 연결 풀 종료 실패: %s", e)
+
+atexit.register(close_http_transport)
+
+# 카드 저장소 (Repository)
+# 라우트는 supabase.table(...) 체인을 직접 쓰지 않고 card_repo의 메서드만 사용합니다.
+# CARD_REPOSITORY=sqlite로 실행하면 Supabase 없이 로컬 SQLite 파일(또는 :memory:)로 같은 라우트를 실행할 수 있어
+# 오프라인 개발, 벤치마크, 부하 테스트를 결정적으로 반복할 수 있습니다.
+CARD_TABLE = 'edutech_cards'
+CARD_ARRAY_FIELDS = ('useful_subjects', 'ai_keywords', 'keyword')
+CARD_OBJECT_FIELDS = ('thumbnail_variants',)
+
+class DuplicateCardError(Exception):
+    """같은 URL의 카드가 이미 있는 경우"""
+
+class StaleCardError(Exception):
+    """updated_at 조건이 맞지 않는 경우 (다른 요청이 먼저 수정함). current는 현재 저장된 카드"""
+
+    def __init__(self, current):
+        super().__init__(f"card {current.get('id')} was modified at {current.get('updated_at')}")
+        self.current = current
+
+class CardRepository:
+    """카드 저장소 인터페이스
+
+    모든 목록은 sort_order ASC, created_at DESC, id DESC 순서로 반환합니다.
+    """
+    backend = 'base'
+
+    def list_cards(self, include_hidden=False):
+        raise NotImplementedError
+
+    def page_cards(self, include_hidden, limit, cursor=None, fields=None, category='', subject='', with_total=True):
+        """keyset 페이지 조회. (items, total, has_more) 튜플, with_total=False면 total=None"""
+        raise NotImplementedError
+
+    def search_cards(self, search, include_hidden=False, category='', subject=''):
+        """제목/요약/AI 요약의 부분 문자열 검색"""
+        raise NotImplementedError
+
+    def search_fulltext(self, search, include_hidden=False, max_results=100):
+        """순위가 매겨진 전체 텍스트 검색. 지원하지 않으면 예외 발생"""
+        raise NotImplementedError
+
+    def get_card(self, card_id, columns='*'):
+        raise NotImplementedError
+
+    def get_cards(self, card_ids, columns='*'):
+        """ID 목록의 카드를 한 번에 조회합니다. (없는 ID는 결과에서 빠짐, 순서 보장 없음)"""
+        raise NotImplementedError
+
+    def get_cards_by_url(self, urls, columns='*'):
+        """URL 목록과 정확히 같은 url의 카드를 한 번에 조회합니다. (숨김 포함, 순서 보장 없음)"""
+        raise NotImplementedError
+
+    def create_card(self, card):
+        """새 카드를 저장하고 저장된 행을 반환합니다. URL이 중복이면 DuplicateCardError"""
+        raise NotImplementedError
+
+    def update_card(self, card_id, values, expected_updated_at=None):
+        """카드를 수정하고 (updated_at 자동 갱신) 수정된 행을 반환합니다. 없으면 None
+
+        expected_updated_at을 주면 updated_at이 같은 경우에만 수정하는 조건부 UPDATE 한 번으로 처리하고,
+        다르면 StaleCardError를 발생시킵니다.
+        """
+        raise NotImplementedError
+
+    def soft_delete_card(self, card_id, expected_updated_at=None):
+        """카드를 숨깁니다. (view=0) 수정된 행을 반환, 없으면 None (expected_updated_at은 update_card와 같음)"""
+        raise NotImplementedError
+
+    def missing_or_stale(self, card_id, expected_updated_at):
+        """조건부 UPDATE가 아무 행도 바꾸지 못한 경우에만 다시 조회해 없는 카드(None)와 충돌을 구분합니다."""
+        if expected_updated_at:
+            current = self.get_card(card_id)
+            if current:
+                raise StaleCardError(current)
+        return None
+
+    def set_view(self, card_ids, view):
+        """여러 카드의 view를 한 문장으로 바꾸고 (updated_at 갱신) 바뀐 행들을 반환합니다."""
+        raise NotImplementedError
+
+    def upsert_cards(self, cards, ignore_duplicates=False):
+        """url UNIQUE 제약 기준으로 없으면 추가, 있으면 수정하는 한 문장. 저장된 행들을 반환합니다.
+
+        한 번에 보내는 카드들은 같은 필드를 가져야 합니다.
+        ignore_duplicates면 이미 있는 url은 건드리지 않고 (ON CONFLICT DO NOTHING) 새로 추가된 행만 반환합니다.
+        """
+        raise NotImplementedError
+
+    def reorder_cards(self, orders, dense_orders=None):
+        """{id: sort_order}를 한 번에 적용합니다. (기록된 행 수, 방식) 튜플"""
+        raise NotImplementedError
+
+    def list_changes(self, since, limit):
+        """updated_at이 since(ISO 시각)보다 나중인 카드 (숨김 포함), updated_at, id 오름차순"""
+        raise NotImplementedError
+
+    def catalog_version(self, include_hidden=False):
+        """카드 수와 가장 최근 updated_at을 한 번의 조회로 반환합니다. (count, max_updated_at) 튜플"""
+        raise NotImplementedError
+
+    def head_sort_order(self):
+        """맨 앞 카드(숨김 포함)의 sort_order. 카드가 없으면 None"""
+        raise NotImplementedError
+
+    def ping(self):
+        """연결 확인용 가벼운 조회. 실패하면 예외 발생"""
+        raise NotImplementedError
+
+class SupabaseCardRepository(CardRepository):
+    backend = 'supabase'
+
+    def __init__(self, client):
+        self.client = client
+
+    def table(self):
+        return self.client.table(CARD_TABLE)
+
+    def apply_filters(self, query, include_hidden, category='', subject=''):
+        if not include_hidden:
+            query = query.eq('view', 1)
+        if category:
+            query = query.eq('ai_category', category)
+        if subject:
+            query = query.contains('useful_subjects', [subject])
+        return query
+
+    def list_cards(self, include_hidden=False):
+        query = self.apply_filters(self.table().select('*'), include_hidden)
+        result = query.order('sort_order', desc=False).order('created_at', desc=True).order('id', desc=True).execute()
+        return result.data or []
+
+    def catalog_version(self, include_hidden=False):
+        # count=exact로 전체 수를, updated_at 내림차순 첫 행으로 최댓값을 함께 받음 (idx_edutech_cards_updated_at)
+        query = self.apply_filters(self.table().select('updated_at', count='exact'), include_hidden)
+        result = query.order('updated_at', desc=True).limit(1).execute()
+        return result.count or 0, (result.data[0].get('updated_at') or '') if result.data else ''
+
+    def head_sort_order(self):
+        # idx_edutech_cards_sort_order 첫 행 (NULL은 오름차순에서 마지막)
+        result = self.table().select('sort_order').order('sort_order', desc=False).limit(1).execute()
+        return result.data[0].get('sort_order') if result.data else None
+
+    def page_cards(self, include_hidden, limit, cursor=None, fields=None, category='', subject='', with_total=True):
+        columns = ','.join(fields) if fields else '*'
+        query = self.table().select(columns, count='exact') if with_total else self.table().select(columns)
+        query = self.apply_filters(query, include_hidden, category, subject)
+        if cursor:
+            sort_order, created_at, card_id = cursor
+            query = query.or_(
+                f'sort_order.gt.{sort_order},'
+                f'and(sort_order.eq.{sort_order},created_at.lt."{created_at}"),'
+                f'and(sort_order.eq.{sort_order},created_at.eq."{created_at}",id.lt.{card_id})'
+            )
+        result = (query.order('sort_order', desc=False).order('created_at', desc=True)
+                  .order('id', desc=True).limit(limit + 1).execute())
+        items = result.data or []
+
+        # count='exact'는 커서 조건이 적용된 개수이므로 첫 페이지가 아니면 전체 개수를 따로 계산
+        total = result.count if with_total else None
+        if cursor and with_total:
+            count_query = self.apply_filters(self.table().select('id', count='exact'), include_hidden, category, subject)
+            total = count_query.limit(1).execute().count
+
+        return items[:limit], total, len(items) > limit
+
+    def search_cards(self, search, include_hidden=False, category='', subject=''):
+        query = self.apply_filters(self.table().select('*'), include_hidden, category, subject)
+        query = query.or_(f"webpage_name.ilike.%{search}%,user_summary.ilike.%{search}%,ai_summary.ilike.%{search}%")
+        result = query.order('sort_order', desc=False).order('created_at', desc=True).execute()
+        return result.data or []
+
+    def search_fulltext(self, search, include_hidden=False, max_results=100):
+        # add_search_function_migration.sql의 search_edutech_cards RPC
+        result = self.client.rpc('search_edutech_cards', {
+            'search_query': search,
+            'include_hidden': include_hidden,
+            'max_results': max_results,
+        }).execute()
+        return result.data or []
+
+    def get_card(self, card_id, columns='*'):
+        result = self.table().select(columns).eq('id', card_id).execute()
+        return result.data[0] if result.data else None
+
+    def get_cards(self, card_ids, columns='*'):
+        return self.table().select(columns).in_('id', list(card_ids)).execute().data or []
+
+    def get_cards_by_url(self, urls, columns='*'):
+        # in_()이 쉼표/콜론이 든 값을 따옴표로 감싸므로 URL을 그대로 넘겨도 됨
+        return self.table().select(columns).in_('url', list(urls)).execute().data or []
+
+    def create_card(self, card):
+        try:
+            result = self.table().insert(card).execute()
+        except Exception as e:
+            if 'duplicate key' in str(e):
+                raise DuplicateCardError(str(e)) from e
+            raise
+        return result.data[0] if result.data else None
+
+    def conditional_update(self, card_id, values, expected_updated_at):
+        # 존재 확인을 따로 하지 않고 UPDATE ... WHERE id AND updated_at ... RETURNING * 한 번으로 처리
+        query = self.table().update(values).eq('id', card_id)
+        if expected_updated_at:
+            query = query.eq('updated_at', expected_updated_at)
+        try:
+            result = query.execute()
+        except Exception as e:
+            if 'duplicate key' in str(e):
+                raise DuplicateCardError(str(e)) from e
+            raise
+        if result.data:
+            return result.data[0]
+        return self.missing_or_stale(card_id, expected_updated_at)
+
+    def update_card(self, card_id, values, expected_updated_at=None):
+        return self.conditional_update(card_id, dict(values, updated_at='now()'), expected_updated_at)
+
+    def soft_delete_card(self, card_id, expected_updated_at=None):
+        # 변경분 동기화가 숨김을 tombstone으로 전달하도록 updated_at도 갱신
+        return self.conditional_update(card_id, {'view': 0, 'updated_at': 'now()'}, expected_updated_at)
+
+    def set_view(self, card_ids, view):
+        result = self.table().update({'view': view, 'updated_at': 'now()'}).in_('id', list(card_ids)).execute()
+        return result.data or []
+
+    def upsert_cards(self, cards, ignore_duplicates=False):
+        # INSERT ... ON CONFLICT (url) DO UPDATE (또는 DO NOTHING), updated_at은 add_card_changes_migration.sql 트리거가 갱신
+        result = self.table().upsert(cards, on_conflict='url', ignore_duplicates=ignore_duplicates).execute()
+        return result.data or []
+
+    def reorder_cards(self, orders, dense_orders=None):
+        # RPC가 없으면(마이그레이션 전) sort_order가 INTEGER이므로 dense_orders(정수 번호)로 대체
+        payload = [{'id': card_id, 'sort_order': sort_order} for card_id, sort_order in orders.items()]
+        try:
+            # add_reorder_function_migration.sql: 하나의 UPDATE 문으로 원자적으로 적용
+            result = self.client.rpc('reorder_edutech_cards', {'orders': payload}).execute()
+            rows_written = result.data if isinstance(result.data, int) else len(payload)
+            return rows_written, 'rpc'
+        except Exception as rpc_error:
+            logger.warning("일괄 순서 변경 RPC 실패, 카드별 업데이트로 대체: %s", rpc_error)
+
+        if dense_orders is not None:
+            payload = [{'id': card_id, 'sort_order': sort_order} for card_id, sort_order in dense_orders.items()]
+        for item in payload:
+            self.table().update({
+                'sort_order': item['sort_order'],
+                'updated_at': 'now()',
+            }).eq('id', item['id']).execute()
+        return len(payload), 'per_row'
+
+    def list_changes(self, since, limit):
+        # add_card_changes_migration.sql: idx_edutech_cards_updated_at, 모든 UPDATE에서 updated_at 갱신 (RPC 포함)
+        result = (self.table().select('*').gt('updated_at', since)
+                  .order('updated_at', desc=False).order('id', desc=False).limit(limit).execute())
+        return result.data or []
+
+    def ping(self):
+        return self.table().select('id').eq('view', 1).limit(1).execute().data
+
+class SQLiteCardRepository(CardRepository):
+    """로컬 SQLite 저장소 (배열 컬럼은 JSON 문자열로 저장)"""
+    backend = 'sqlite'
+
+    SCHEMA = f"""
+        CREATE TABLE IF NOT EXISTS {CARD_TABLE} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            url TEXT NOT NULL UNIQUE,
+            webpage_name TEXT NOT NULL,
+            user_summary TEXT,
+            useful_subjects TEXT,
+            educational_meaning TEXT,
+            ai_summary TEXT,
+            ai_keywords TEXT,
+            ai_category TEXT,
+            thumbnail_url TEXT,
+            thumbnail_variants TEXT,
+            keyword TEXT,
+            view INTEGER DEFAULT 1,
+            sort_order REAL NOT NULL DEFAULT 1,
+            created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now')),
+            updated_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now'))
+        );
+        CREATE INDEX IF NOT EXISTS idx_{CARD_TABLE}_sort_order ON {CARD_TABLE}(sort_order, created_at, id);
+        CREATE INDEX IF NOT EXISTS idx_{CARD_TABLE}_view ON {CARD_TABLE}(view);
+        CREATE INDEX IF NOT EXISTS idx_{CARD_TABLE}_updated_at ON {CARD_TABLE}(updated_at, id);
+    """
+    ORDER_BY = 'ORDER BY sort_order ASC, created_at DESC, id DESC'
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        with self.lock, self.connection:
+            self.connection.executescript(self.SCHEMA)
+        self.columns = [row['name'] for row in self.connection.execute(f'PRAGMA table_info({CARD_TABLE})')]
+        if 'thumbnail_variants' not in self.columns:  # 이전 버전에서 만든 DB 파일
+            with self.lock, self.connection:
+                self.connection.execute(f'ALTER TABLE {CARD_TABLE} ADD COLUMN thumbnail_variants TEXT')
+            self.columns.append('thumbnail_variants')
+
+    def now(self):
+        # 문자열 비교로 정렬되도록 항상 마이크로초까지 기록 (list_changes)
+        return datetime.now(timezone.utc).isoformat(timespec='microseconds')
+
+    def to_card(self, row):
+        card = dict(row)
+        for field in CARD_ARRAY_FIELDS:
+            if field in card:
+                card[field] = json.loads(card[field]) if card[field] else []
+        for field in CARD_OBJECT_FIELDS:
+            if field in card:
+                card[field] = json.loads(card[field]) if card[field] else {}
+        return card
+
+    def to_row(self, values):
+        row = {}
+        for field, value in values.items():
+            if field not in self.columns:
+                continue
+            if field in CARD_ARRAY_FIELDS:
+                value = json.dumps(value or [], ensure_ascii=False)
+            elif field in CARD_OBJECT_FIELDS:
+                value = json.dumps(value or {}, ensure_ascii=False)
+            row[field] = value
+        return row
+
+    def query(self, sql, params=()):
+        with self.lock:
+            return [self.to_card(row) for row in self.connection.execute(sql, params)]
+
+    def where(self, include_hidden, category='', subject=''):
+        clauses, params = [], []
+        if not include_hidden:
+            clauses.append('view = 1')
+        if category:
+            clauses.append('ai_category = ?')
+            params.append(category)
+        if subject:
+            clauses.append('EXISTS (SELECT 1 FROM json_each(useful_subjects) WHERE value = ?)')
+            params.append(subject)
+        return clauses, params
+
+    def list_cards(self, include_hidden=False):
+        clauses, params = self.where(include_hidden)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        return self.query(f'SELECT * FROM {CARD_TABLE} {where} {self.ORDER_BY}', params)
+
+    def catalog_version(self, include_hidden=False):
+        clauses, params = self.where(include_hidden)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        with self.lock:
+            count, max_updated_at = self.connection.execute(
+                f'SELECT count(*), max(updated_at) FROM {CARD_TABLE} {where}', params).fetchone()
+        return count, max_updated_at or ''
+
+    def head_sort_order(self):
+        with self.lock:
+            return self.connection.execute(f'SELECT min(sort_order) FROM {CARD_TABLE}').fetchone()[0]
+
+    def page_cards(self, include_hidden, limit, cursor=None, fields=None, category='', subject='', with_total=True):
+        columns = ', '.join(fields) if fields else '*'
+        clauses, params = self.where(include_hidden, category, subject)
+        total = None
+        if with_total:
+            where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+            with self.lock:
+                total = self.connection.execute(f'SELECT count(*) FROM {CARD_TABLE} {where}', params).fetchone()[0]
+        if cursor:
+            sort_order, created_at, card_id = cursor
+            clauses.append('(sort_order > ? OR (sort_order = ? AND (created_at < ? OR (created_at = ? AND id < ?))))')
+            params += [sort_order, sort_order, created_at, created_at, card_id]
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        items = self.query(f'SELECT {columns} FROM {CARD_TABLE} {where} {self.ORDER_BY} LIMIT ?', params + [limit + 1])
+        return items[:limit], total, len(items) > limit
+
+    def search_cards(self, search, include_hidden=False, category='', subject=''):
+        clauses, params = self.where(include_hidden, category, subject)
+        clauses.append('(webpage_name LIKE ? OR user_summary LIKE ? OR ai_summary LIKE ?)')
+        params += [f'%{search}%'] * 3
+        return self.query(f"SELECT * FROM {CARD_TABLE} WHERE {' AND '.join(clauses)} {self.ORDER_BY}", params)
+
+    def search_fulltext(self, search, include_hidden=False, max_results=100):
+        # 모든 검색어가 제목/요약/AI 요약/교육적 의미/키워드/교과목 중 하나에 포함되어야 함 (AND)
+        terms = [term for term in search.split() if term]
+        if not terms:
+            return []
+        clauses, params = self.where(include_hidden)
+        for term in terms:
+            clauses.append("(COALESCE(webpage_name, '') || ' ' || COALESCE(user_summary, '') || ' ' || "
+                           "COALESCE(ai_summary, '') || ' ' || COALESCE(educational_meaning, '') || ' ' || "
+                           "COALESCE(keyword, '') || ' ' || COALESCE(useful_subjects, '')) LIKE ?")
+            params.append(f'%{term}%')
+        rank = ' + '.join(['(webpage_name LIKE ?)'] * len(terms))
+        sql = (f"SELECT * FROM {CARD_TABLE} WHERE {' AND '.join(clauses)} "
+               f"ORDER BY ({rank}) DESC, sort_order ASC, created_at DESC, id DESC LIMIT ?")
+        return self.query(sql, params + [f'%{term}%' for term in terms] + [max_results])
+
+    def get_card(self, card_id, columns='*'):
+        rows = self.query(f'SELECT {columns} FROM {CARD_TABLE} WHERE id = ?', (card_id,))
+        return rows[0] if rows else None
+
+    def get_cards(self, card_ids, columns='*'):
+        placeholders = ', '.join('?' for _ in card_ids)
+        return self.query(f'SELECT {columns} FROM {CARD_TABLE} WHERE id IN ({placeholders})', list(card_ids))
+
+    def get_cards_by_url(self, urls, columns='*'):
+        placeholders = ', '.join('?' for _ in urls)
+        return self.query(f'SELECT {columns} FROM {CARD_TABLE} WHERE url IN ({placeholders})', list(urls))
+
+    def create_card(self, card):
+        row = self.to_row(card)
+        fields = ', '.join(row)
+        placeholders = ', '.join('?' for _ in row)
+        try:
+            with self.lock, self.connection:
+                cursor = self.connection.execute(
+                    f'INSERT INTO {CARD_TABLE} ({fields}) VALUES ({placeholders})', list(row.values()))
+        except sqlite3.IntegrityError as e:
+            raise DuplicateCardError(str(e)) from e
+        return self.get_card(cursor.lastrowid)
+
+    def conditional_update(self, card_id, values, expected_updated_at):
+        row = self.to_row(dict(values, updated_at=self.now()))
+        assignments = ', '.join(f'{field} = ?' for field in row)
+        where, params = 'id = ?', [card_id]
+        if expected_updated_at:
+            where += ' AND updated_at = ?'
+            params.append(expected_updated_at)
+        try:
+            with self.lock, self.connection:
+                cursor = self.connection.execute(
+                    f'UPDATE {CARD_TABLE} SET {assignments} WHERE {where}', list(row.values()) + params)
+        except sqlite3.IntegrityError as e:
+            raise DuplicateCardError(str(e)) from e
+        if cursor.rowcount:
+            return self.get_card(card_id)
+        return self.missing_or_stale(card_id, expected_updated_at)
+
+    def update_card(self, card_id, values, expected_updated_at=None):
+        return self.conditional_update(card_id, values, expected_updated_at)
+
+    def soft_delete_card(self, card_id, expected_updated_at=None):
+        return self.conditional_update(card_id, {'view': 0}, expected_updated_at)
+
+    def set_view(self, card_ids, view):
+        placeholders = ', '.join('?' for _ in card_ids)
+        with self.lock, self.connection:
+            self.connection.execute(f'UPDATE {CARD_TABLE} SET view = ?, updated_at = ? WHERE id IN ({placeholders})',
+                                    [view, self.now()] + list(card_ids))
+        return self.get_cards(card_ids)
+
+    def upsert_cards(self, cards, ignore_duplicates=False):
+        now = self.now()
+        rows = [self.to_row(dict(card, updated_at=now)) for card in cards]
+        fields = list(rows[0])
+        urls = [row['url'] for row in rows]
+        url_filter = f"url IN ({', '.join('?' for _ in urls)})"
+        if ignore_duplicates:
+            conflict = 'DO NOTHING'
         else:
-            supabase_admin = supabase
-            logger.warning("⚠️ Service Role Key 없음, anon key 사용")
-        
-        # 연결 테스트
-        test_result = supabase.table('edutech_cards').select('id').eq('view', 1).limit(1).execute()
-        logger.info(f"✅ Supabase 연결 테스트 성공 - 데이터: {bool(test_result.data)}")
-    except Exception as e:
-        logger.error(f"❌ Supabase 연결 실패: {e}")
-        supabase = None
-        supabase_admin = None
+            conflict = 'DO UPDATE SET ' + ', '.join(f'{field} = excluded.{field}' for field in fields if field != 'url')
+        with self.lock, self.connection:
+            if ignore_duplicates:
+                # 같은 잠금 안에서 먼저 있던 url을 빼 두어 새로 추가된 행만 반환
+                existing = {row[0] for row in self.connection.execute(
+                    f'SELECT url FROM {CARD_TABLE} WHERE {url_filter}', urls)}
+                urls = [url for url in urls if url not in existing]
+            self.connection.executemany(
+                f"INSERT INTO {CARD_TABLE} ({', '.join(fields)}) VALUES ({', '.join('?' for _ in fields)}) "
+                f"ON CONFLICT(url) {conflict}",
+                [[row[field] for field in fields] for row in rows])
+        if not urls:
+            return []
+        return self.query(f"SELECT * FROM {CARD_TABLE} WHERE url IN ({', '.join('?' for _ in urls)})", urls)
+
+    def reorder_cards(self, orders, dense_orders=None):
+        # 하나의 트랜잭션으로 적용 (원자적)
+        now = self.now()
+        with self.lock, self.connection:
+            cursor = self.connection.executemany(
+                f'UPDATE {CARD_TABLE} SET sort_order = ?, updated_at = ? WHERE id = ? AND sort_order IS NOT ?',
+                [(sort_order, now, card_id, sort_order) for card_id, sort_order in orders.items()])
+        return cursor.rowcount, 'sqlite'
+
+    def list_changes(self, since, limit):
+        return self.query(f'SELECT * FROM {CARD_TABLE} WHERE updated_at > ? ORDER BY updated_at ASC, id ASC LIMIT ?',
+                          (since, limit))
+
+    def ping(self):
+        with self.lock:
+            return self.connection.execute(f'SELECT id FROM {CARD_TABLE} WHERE view = 1 LIMIT 1').fetchall()
+
+def create_card_repository():
+    """CARD_REPOSITORY 환경변수(supabase | sqlite)에 따라 저장소를 만듭니다."""
+    backend = os.getenv('CARD_REPOSITORY', 'supabase').lower()
+    if backend == 'sqlite':
+        path = os.getenv('SQLITE_DATABASE_PATH', 'edutech_cards.sqlite3')
+        logger.info(f"✅ SQLite 카드 저장소 사용: {path}")
+        return SQLiteCardRepository(path)
+    if supabase is None:
+        return None
+    return SupabaseCardRepository(supabase)
+
+class TimedCardRepository:
+    """저장소 호출 시간을 요청의 'db' 구간으로 기록하는 래퍼"""
+
+    def __init__(self, repo):
+        self.repo = repo
+
+    def __getattr__(self, name):
+        attr = getattr(self.repo, name)
+        if not callable(attr):
+            return attr
+
+        def timed_call(*args, **kwargs):
+            with timed('db'):
+                return attr(*args, **kwargs)
+        return timed_call
+
+card_repo = create_card_repository()
+if card_repo is not None:
+    card_repo = TimedCardRepository(card_repo)
 
 logger.info("=== Flask 앱 초기화 완료 ===")
 
+# 카드 목록 캐시 (워커별 인메모리 캐시)
+# 읽기 요청이 쓰기보다 훨씬 많으므로 승인된 카드 목록(public)과 관리자용 전체 목록(admin)을
+# 워커 메모리에 보관합니다. 쓰기 요청이 들어오면 버전을 올려 즉시 무효화하고,
+# 다른 워커에서 발생한 쓰기는 TTL이 지나면 반영됩니다.
+CARD_CACHE_TTL = float(os.getenv('CARD_CACHE_TTL', '60'))  # 초 단위, 0이면 캐시 비활성화
+
+card_cache_lock = threading.Lock()
+card_cache = {}  # scope('public' | 'admin') -> {'version', 'fetched_at', 'rows'}
+card_cache_stats = {'version': 0, 'hits': 0, 'misses': 0, 'invalidations': 0}
+
+def fetch_catalog_rows(admin_view):
+    """저장소에서 정렬된 전체 카드 목록을 가져옵니다."""
+    return card_repo.list_cards(include_hidden=admin_view)
+
+def get_cached_catalog(admin_view):
+    """캐시된 카드 목록을 반환합니다. (rows, cache_hit) 튜플"""
+    scope = 'admin' if admin_view else 'public'
+    now = time.monotonic()
+
+    with card_cache_lock:
+        version = card_cache_stats['version']
+        entry = card_cache.get(scope)
+        if entry and entry['version'] == version and now - entry['fetched_at'] < CARD_CACHE_TTL:
+            card_cache_stats['hits'] += 1
+            return entry['rows'], True
+
+        # 관리자 목록이 유효하면 승인된 카드만 골라 public 목록을 만들 수 있음 (DB 조회 불필요)
+        admin_entry = card_cache.get('admin')
+        if (scope == 'public' and admin_entry and admin_entry['version'] == version
+                and now - admin_entry['fetched_at'] < CARD_CACHE_TTL):
+            rows = [card for card in admin_entry['rows'] if card.get('view') == 1]
+            card_cache[scope] = {'version': version, 'fetched_at': admin_entry['fetched_at'], 'rows': rows}
+            card_cache_stats['hits'] += 1
+            return rows, True
+
+        card_cache_stats['misses'] += 1
+
+    rows = fetch_catalog_rows(admin_view)
+
+    with card_cache_lock:
+        # 조회하는 동안 쓰기가 발생했다면 오래된 결과는 저장하지 않음
+        if CARD_CACHE_TTL > 0 and card_cache_stats['version'] == version:
+            card_cache[scope] = {'version': version, 'fetched_at': time.monotonic(), 'rows': rows}
+
+    return rows, False
+
+def invalidate_card_cache(reason=''):
+    """쓰기 작업 후 호출하여 캐시 버전을 올리고 저장된 목록을 비웁니다."""
+    with card_cache_lock:
+        card_cache_stats['version'] += 1
+        card_cache_stats['invalidations'] += 1
+        card_cache.clear()
+    logger.info("카드 캐시 무효화: %s (version=%d)", reason, card_cache_stats['version'])
+
+@timed('serialize')
+def build_catalog_payload(rows, changes=False):
+    """카드 목록을 한 번만 직렬화하고 ETag/Last-Modified를 계산합니다.
+
+    changes면 /api/cards/changes의 전체 목록 응답({version, full, cards, deleted}) 형태로 직렬화합니다.
+    """
+    if changes:
+        body = app.json.dumps({
+            'version': max((card_version(card) for card in rows), default=0),
+            'full': True,
+            'cards': rows,
+            'deleted': [],
+        }).encode('utf-8')
+    else:
+        body = app.json.dumps(rows).encode('utf-8')  # jsonify와 동일한 직렬화
+    updated_values = [card.get('updated_at') or card.get('created_at') or '' for card in rows]
+    max_updated_at = max(updated_values) if updated_values else ''
+
+    # 카탈로그 버전: 행 수 + max(updated_at) + 본문 해시
+    # (add_card_changes_migration.sql 적용 전의 순서 변경 RPC는 updated_at을 바꾸지 않으므로 본문 해시로 보완)
+    digest = hashlib.blake2b(body, digest_size=8).hexdigest()
+    etag = f"{len(rows)}-{max_updated_at.replace(':', '').replace('+', '')}-{digest}"
+
+    last_modified = None
+    if max_updated_at:
+        try:
+            last_modified = datetime.fromisoformat(max_updated_at.replace('Z', '+00:00'))
+        except ValueError:
+            last_modified = None
+
+    return {
+        'etag': etag,
+        'last_modified': last_modified,
+        'bodies': {'identity': body},  # 인코딩별 본문 (gzip/br은 처음 요청될 때 한 번만 압축)
+    }
+
+def get_catalog_payload(admin_view, changes=False):
+    """캐시된 카드 목록의 직렬화 결과를 반환합니다. (payload, cache_hit) 튜플"""
+    rows, cache_hit = get_cached_catalog(admin_view)
+    scope = 'admin' if admin_view else 'public'
+    key = 'changes_payload' if changes else 'payload'
+
+    with card_cache_lock:
+        entry = card_cache.get(scope)
+        if entry is not None and entry['rows'] is rows and key in entry:
+            return entry[key], cache_hit
+
+    payload = build_catalog_payload(rows, changes)
+
+    with card_cache_lock:
+        entry = card_cache.get(scope)
+        if entry is not None and entry['rows'] is rows:
+            entry[key] = payload
+
+    return payload, cache_hit
+
+def choose_content_encoding():
+    """Accept-Encoding 헤더에 따라 br > gzip > identity 순으로 선택합니다."""
+    accept = request.accept_encodings
+    if brotli is not None and accept['br']:
+        return 'br'
+    if accept['gzip']:
+        return 'gzip'
+    return 'identity'
+
+@timed('serialize')
+def encode_catalog_body(payload, encoding):
+    bodies = payload['bodies']
+    body = bodies.get(encoding)
+    if body is None:
+        raw = bodies['identity']
+        if encoding == 'br':
+            body = brotli.compress(raw, quality=9)
+        else:
+            body = gzip.compress(raw, compresslevel=9, mtime=0)
+        bodies[encoding] = body
+    return body
+
+def catalog_response(payload, cache_hit):
+    """조건부 요청(If-None-Match/If-Modified-Since)을 처리하고 캐시된 본문으로 응답합니다."""
+    encoding = choose_content_encoding()
+    etag = payload['etag'] if encoding == 'identity' else f"{payload['etag']}-{encoding}"
+
+    not_modified = False
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains(etag)
+    elif request.if_modified_since and payload['last_modified']:
+        not_modified = payload['last_modified'].replace(microsecond=0) <= request.if_modified_since
+
+    if not_modified:
+        response = Response(status=304)
+    else:
+        response = Response(encode_catalog_body(payload, encoding), mimetype='application/json')
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+
+    response.set_etag(etag)
+    if payload['last_modified']:
+        response.last_modified = payload['last_modified']
+    # 브라우저가 매번 ETag로 재검증하도록 (변경이 없으면 304로 본문 없이 응답)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['X-Cache'] = 'HIT' if cache_hit else 'MISS'
+    return response
+
+def peek_cached_catalog(admin_view):
+    """DB 조회 없이 유효한 캐시 목록만 반환합니다. 캐시가 비어 있으면 None"""
+    scope = 'admin' if admin_view else 'public'
+    with card_cache_lock:
+        entry = card_cache.get(scope)
+        if (entry and entry['version'] == card_cache_stats['version']
+                and time.monotonic() - entry['fetched_at'] < CARD_CACHE_TTL):
+            card_cache_stats['hits'] += 1
+            return entry['rows']
+    return None
+
+def get_card_cache_stats():
+    with card_cache_lock:
+        stats = dict(card_cache_stats)
+        stats['ttl_seconds'] = CARD_CACHE_TTL
+        stats['entries'] = {
+            scope: {'rows': len(entry['rows']), 'age_seconds': round(time.monotonic() - entry['fetched_at'], 3)}
+            for scope, entry in card_cache.items()
+        }
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_ratio'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+    return stats
+
+# 전체 텍스트 검색 (search_mode=fulltext)
+# add_search_function_migration.sql의 search_edutech_cards RPC가 idx_edutech_cards_search GIN 인덱스를 사용합니다.
+SEARCH_MAX_RESULTS = 100
+
+def search_cards_fulltext(search, admin_view, max_results=SEARCH_MAX_RESULTS):
+    """순위가 매겨진 검색 결과를 반환합니다. RPC가 없으면 예외 발생"""
+    return card_repo.search_fulltext(search, include_hidden=admin_view, max_results=max_results)
+
+# 카드 검색 인덱스 (워커별 인메모리 역색인, GET /api/search)
+# 제목/요약/교과목/키워드를 소문자로 바꾼 뒤 글자 1-gram과 2-gram으로 색인합니다.
+# 한글은 띄어쓰기 없이 붙여 쓰는 경우가 많아 2-gram 후보를 찾은 뒤 부분 문자열로 확인하면
+# view.js filterCards()와 같은 결과를 DB 왕복 없이 얻을 수 있습니다.
+SEARCH_INDEX_FIELDS = (
+    ('webpage_name', 3.0),
+    ('keyword', 2.0),
+    ('useful_subjects', 2.0),
+    ('user_summary', 1.0),
+)
+SEARCH_WORD_RE = re.compile(r'\w+')
+
+search_index_lock = threading.Lock()
+search_index = {
+    'docs': {},       # card_id -> {'view', 'sort_order', 'fields': {field: text}, 'text', 'grams'}
+    'postings': {},   # gram -> set(card_id)
+    'built_at': None,
+}
+search_index_stats = {'builds': 0, 'upserts': 0, 'queries': 0}
+
+def search_grams(text):
+    """텍스트에서 글자 1-gram, 2-gram 집합을 만듭니다."""
+    grams = set()
+    for word in SEARCH_WORD_RE.findall(text):
+        grams.update(word)
+        grams.update(word[i:i + 2] for i in range(len(word) - 1))
+    return grams
+
+def search_field_text(value):
+    if value is None:
+        return ''
+    if isinstance(value, (list, tuple)):
+        return ' '.join(str(item) for item in value if item).lower()
+    return str(value).lower()
+
+def search_index_add(card):
+    """색인에 카드를 추가하거나 교체합니다. search_index_lock을 잡은 상태에서 호출"""
+    card_id = card.get('id')
+    if card_id is None:
+        return
+    search_index_remove(card_id)
+
+    fields = {field: search_field_text(card.get(field)) for field, _ in SEARCH_INDEX_FIELDS}
+    text = ' '.join(fields.values())
+    grams = search_grams(text)
+    search_index['docs'][card_id] = {
+        'view': card.get('view'),
+        'sort_order': card.get('sort_order') or 0,
+        'fields': fields,
+        'text': text,
+        'grams': grams,
+    }
+    postings = search_index['postings']
+    for gram in grams:
+        postings.setdefault(gram, set()).add(card_id)
+
+def search_index_remove(card_id):
+    doc = search_index['docs'].pop(card_id, None)
+    if doc is None:
+        return
+    postings = search_index['postings']
+    for gram in doc['grams']:
+        ids = postings.get(gram)
+        if ids is not None:
+            ids.discard(card_id)
+            if not ids:
+                del postings[gram]
+
+def rebuild_search_index():
+    rows, _ = get_cached_catalog(True)
+    with search_index_lock:
+        search_index['docs'] = {}
+        search_index['postings'] = {}
+        for card in rows:
+            search_index_add(card)
+        search_index['built_at'] = time.monotonic()
+        search_index_stats['builds'] += 1
+
+def ensure_search_index():
+    """색인이 없거나 TTL이 지났으면 (다른 워커의 쓰기 반영) 전체 목록으로 다시 만듭니다."""
+    built_at = search_index['built_at']
+    if built_at is None or time.monotonic() - built_at >= CARD_CACHE_TTL:
+        rebuild_search_index()
+
+def search_index_upsert(card):
+    """이 워커에서 생성/수정된 카드를 색인에 바로 반영합니다."""
+    if not card or search_index['built_at'] is None:
+        return
+    with search_index_lock:
+        search_index_add(card)
+        search_index_stats['upserts'] += 1
+
+def search_index_patch(card_id, **values):
+    """view, sort_order처럼 검색 텍스트와 무관한 값만 바뀐 경우 문서 정보만 갱신합니다."""
+    with search_index_lock:
+        doc = search_index['docs'].get(card_id)
+        if doc is not None:
+            doc.update(values)
+            search_index_stats['upserts'] += 1
+
+@timed('search')
+def search_index_query(query, admin_view=False):
+    """검색어를 공백으로 나눠 모든 단어가 포함된 카드 ID를 점수순으로 반환합니다."""
+    terms = [term for term in query.lower().split() if term]
+    if not terms:
+        return []
+
+    with search_index_lock:
+        docs = search_index['docs']
+        postings = search_index['postings']
+        candidates = None
+        for term in terms:
+            grams = search_grams(term)
+            # 가장 긴 gram(2-gram)만 교집합에 사용, 1글자 검색어는 1-gram 사용
+            grams = {gram for gram in grams if len(gram) == 2} or grams
+            if not grams:
+                continue
+            for gram in sorted(grams, key=lambda g: len(postings.get(g, ()))):
+                ids = postings.get(gram, set())
+                candidates = set(ids) if candidates is None else candidates & ids
+                if not candidates:
+                    return []
+        if candidates is None:
+            candidates = set(docs)
+
+        scored = []
+        for card_id in candidates:
+            doc = docs[card_id]
+            if not admin_view and doc['view'] != 1:
+                continue
+            if not all(term in doc['text'] for term in terms):
+                continue
+            score = 0.0
+            for field, weight in SEARCH_INDEX_FIELDS:
+                value = doc['fields'][field]
+                for term in terms:
+                    if term in value:
+                        score += weight * (2 if value.startswith(term) else 1)
+            scored.append((-score, doc['sort_order'], -card_id))
+        search_index_stats['queries'] += 1
+
+    scored.sort()
+    return [-neg_id for _, _, neg_id in scored]
+
+def get_search_index_stats():
+    with search_index_lock:
+        stats = dict(search_index_stats)
+        stats['documents'] = len(search_index['docs'])
+        stats['grams'] = len(search_index['postings'])
+    return stats
+
+# URL 중복 확인 색인 (워커별 인메모리 해시 색인)
+# url ILIKE '%domain%'는 앞쪽 와일드카드 때문에 인덱스를 쓰지 못하고 도메인 문자열을 포함한 다른 URL까지 찾으므로,
+# 정규화한 URL과 도메인으로 카드 ID를 바로 찾습니다. 검색 색인과 같이 캐시된 전체 목록으로 만들고
+# 이 워커의 쓰기는 즉시, 다른 워커의 쓰기는 CARD_CACHE_TTL이 지나면 반영됩니다. (DB의 UNIQUE(url)은 그대로 유지)
+URL_TRACKING_PARAMS = frozenset(('fbclid', 'gclid', 'dclid', 'msclkid', 'yclid', 'igshid', 'mc_cid', 'mc_eid', '_ga', 'ref_src'))
+URL_TRACKING_PREFIXES = ('utm_',)
+
+url_index_lock = threading.Lock()
+url_index = {
+    'cards': {},    # card_id -> {'id', 'webpage_name', 'url', 'view', 'normalized_url', 'domain'}
+    'urls': {},     # normalized_url -> set(card_id)
+    'domains': {},  # domain -> set(card_id)
+    'built_at': None,
+}
+url_index_stats = {'builds': 0, 'upserts': 0, 'lookups': 0, 'rejected': 0}
+
+def normalize_url(url):
+    """중복 확인용 (정규화 URL, 도메인)을 반환합니다. 호스트가 없으면 ValueError
+
+    스킴(http/https), 호스트 대소문자, www., 기본 포트, 추적 파라미터(utm_* 등), 파라미터 순서,
+    끝의 슬래시와 #fragment만 다른 URL은 같은 페이지로 봅니다. 경로의 대소문자는 유지합니다.
+    """
+    url = (url or '').strip()
+    if '://' not in url:
+        url = 'http://' + url
+    parts = urlsplit(url)
+    host = (parts.hostname or '').rstrip('.')
+    if host.startswith('www.'):
+        host = host[4:]
+    if not host:
+        raise ValueError('URL has no host')
+    port = parts.port
+    netloc = host if port in (None, 80, 443) else f'{host}:{port}'
+    params = sorted(
+        (name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if name.lower() not in URL_TRACKING_PARAMS and not name.lower().startswith(URL_TRACKING_PREFIXES)
+    )
+    query = urlencode(params)
+    return netloc + parts.path.rstrip('/') + (f'?{query}' if query else ''), host
+
+def url_index_add(card):
+    """색인에 카드를 추가하거나 교체합니다. url_index_lock을 잡은 상태에서 호출"""
+    card_id = card.get('id')
+    if card_id is None:
+        return
+    url_index_remove(card_id)
+    try:
+        normalized_url, domain = normalize_url(card.get('url'))
+    except ValueError:
+        return
+    url_index['cards'][card_id] = {
+        'id': card_id,
+        'webpage_name': card.get('webpage_name'),
+        'url': card.get('url'),
+        'view': card.get('view'),
+        'normalized_url': normalized_url,
+        'domain': domain,
+    }
+    url_index['urls'].setdefault(normalized_url, set()).add(card_id)
+    url_index['domains'].setdefault(domain, set()).add(card_id)
+
+def url_index_remove(card_id):
+    entry = url_index['cards'].pop(card_id, None)
+    if entry is None:
+        return
+    for table, key in ((url_index['urls'], entry['normalized_url']), (url_index['domains'], entry['domain'])):
+        ids = table.get(key)
+        if ids is not None:
+            ids.discard(card_id)
+            if not ids:
+                del table[key]
+
+def rebuild_url_index():
+    rows, _ = get_cached_catalog(True)
+    with url_index_lock:
+        url_index['cards'] = {}
+        url_index['urls'] = {}
+        url_index['domains'] = {}
+        for card in rows:
+            url_index_add(card)
+        url_index['built_at'] = time.monotonic()
+        url_index_stats['builds'] += 1
+
+def ensure_url_index():
+    """색인이 없거나 TTL이 지났으면 (다른 워커의 쓰기 반영) 전체 목록으로 다시 만듭니다."""
+    built_at = url_index['built_at']
+    if built_at is None or time.monotonic() - built_at >= CARD_CACHE_TTL:
+        rebuild_url_index()
+
+def url_index_upsert(card):
+    """이 워커에서 생성/수정된 카드를 색인에 바로 반영합니다."""
+    if not card or url_index['built_at'] is None:
+        return
+    with url_index_lock:
+        url_index_add(card)
+        url_index_stats['upserts'] += 1
+
+def url_index_patch(card_id, **values):
+    """view처럼 URL과 무관한 값만 바뀐 경우 항목 정보만 갱신합니다."""
+    with url_index_lock:
+        entry = url_index['cards'].get(card_id)
+        if entry is not None:
+            entry.update(values)
+            url_index_stats['upserts'] += 1
+
+def find_url_duplicates(url, exclude_id=None, limit=5, include_domain=True):
+    """정규화 URL이 같은 카드(match='exact', 숨김 포함)와 도메인이 같은 승인된 카드(match='domain')를 반환합니다.
+
+    url이 올바르지 않으면 ValueError
+    """
+    normalized_url, domain = normalize_url(url)
+    ensure_url_index()
+    with url_index_lock:
+        cards = url_index['cards']
+        exact_ids = url_index['urls'].get(normalized_url, set()) - {exclude_id}
+        matches = [dict(cards[card_id], match='exact') for card_id in sorted(exact_ids, reverse=True)]
+        if include_domain:
+            domain_ids = url_index['domains'].get(domain, set()) - exact_ids - {exclude_id}
+            matches += [dict(cards[card_id], match='domain') for card_id in sorted(domain_ids, reverse=True)
+                        if cards[card_id]['view'] == 1]
+        url_index_stats['lookups'] += 1
+    return [{field: match[field] for field in ('id', 'webpage_name', 'url', 'match')} for match in matches[:limit]]
+
+def reject_duplicate_url(url, exclude_id=None):
+    """저장 전에 정규화 URL이 같은 카드가 있으면 409 응답을, 없으면 None을 반환합니다.
+
+    워커별 색인으로 확인하므로 최선의 노력(best-effort) 검사입니다: 서로 다른 워커에서 거의 동시에(또는
+    CARD_CACHE_TTL 안에) 저장한 표기만 다른 같은 URL은 둘 다 통과할 수 있습니다. 글자까지 같은 URL만
+    DB의 UNIQUE(url) 제약이 항상 막습니다. (DuplicateCardError -> 409)
+    """
+    duplicates = find_url_duplicates(url, exclude_id=exclude_id, limit=1, include_domain=False)
+    if not duplicates:
+        return None
+    with url_index_lock:
+        url_index_stats['rejected'] += 1
+    return jsonify({'error': 'URL already exists', 'duplicate': duplicates[0]}), 409
+
+def get_url_index_stats():
+    with url_index_lock:
+        stats = dict(url_index_stats)
+        stats['cards'] = len(url_index['cards'])
+        stats['domains'] = len(url_index['domains'])
+    return stats
+
+# 페이지네이션 설정 (keyset: sort_order ASC, created_at DESC, id DESC)
+# idx_edutech_cards_sort_order 인덱스와 같은 순서로 다음 페이지를 찾습니다.
+PAGE_DEFAULT_LIMIT = 50
+PAGE_MAX_LIMIT = 200
+CARD_FIELDS = {
+    'id', 'url', 'webpage_name', 'user_summary', 'useful_subjects', 'educational_meaning',
+    'ai_summary', 'ai_keywords', 'ai_category', 'thumbnail_url', 'thumbnail_variants', 'keyword', 'view',
+    'sort_order', 'created_at', 'updated_at',
+}
+CURSOR_FIELDS = ('id', 'sort_order', 'created_at')  # 커서 생성에 항상 필요한 필드
+
+def encode_cursor(card):
+    raw = json.dumps([card.get('sort_order'), card.get('created_at'), card.get('id')], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """커서 문자열을 (sort_order, created_at, id)로 복원합니다. 잘못된 값이면 ValueError"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        sort_order, created_at, card_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if not isinstance(created_at, str) or not isinstance(card_id, int):
+            raise ValueError('invalid cursor values')
+        return sort_order, created_at, card_id
+    except Exception as e:
+        raise ValueError(f'invalid cursor: {e}')
+
+def parse_fields(fields_param):
+    """fields= 파라미터를 검증하고 select에 사용할 컬럼 목록을 반환합니다."""
+    if not fields_param:
+        return None
+    fields = [f.strip() for f in fields_param.split(',') if f.strip()]
+    unknown = [f for f in fields if f not in CARD_FIELDS]
+    if unknown:
+        raise ValueError(f"unknown fields: {', '.join(unknown)}")
+    for required in CURSOR_FIELDS:
+        if required not in fields:
+            fields.append(required)
+    return fields
+
+def is_after_cursor(card, cursor):
+    sort_order, created_at, card_id = cursor
+    card_sort = card.get('sort_order')
+    if card_sort != sort_order:
+        return (card_sort or 0) > (sort_order or 0)
+    card_created = card.get('created_at') or ''
+    if card_created != created_at:
+        return card_created < created_at
+    return card.get('id', 0) < card_id
+
+def fetch_card_page(admin_view, limit, cursor=None, fields=None, category='', subject='', with_total=True):
+    """한 페이지의 카드와 전체 개수를 반환합니다. (items, total, has_more) 튜플
+
+    캐시된 목록이 있으면 메모리에서 잘라내고, 없으면 keyset 조건으로
+    필요한 행만 DB에서 가져옵니다. with_total=False면 개수 계산을 생략합니다. (total=None)
+    """
+    rows = peek_cached_catalog(admin_view)
+    if rows is not None:
+        if category:
+            rows = [card for card in rows if card.get('ai_category') == category]
+        if subject:
+            rows = [card for card in rows if subject in (card.get('useful_subjects') or [])]
+        total = len(rows)
+        if cursor:
+            rows = [card for card in rows if is_after_cursor(card, cursor)]
+        page = rows[:limit]
+        if fields:
+            page = [{field: card.get(field) for field in fields} for card in page]
+        return page, total, len(rows) > limit
+
+    return card_repo.page_cards(admin_view, limit, cursor, fields, category, subject, with_total)
+
 @app.route('/')
 def index():
     return render_template('view.html')
@@ -99,39 +1589,259 @@ def index():
 def admin():
     return render_template('admin.html')
 
-# Health check endpoint for Railway
+# 백그라운드 준비 상태 확인 (readiness)
+# import 시 실행하던 Supabase 연결 테스트를 워커별 백그라운드 스레드로 옮겼습니다.
+# 첫 요청이 들어올 때 시작하므로 gunicorn --preload의 마스터 프로세스는 DB에 연결하지 않습니다.
+# /readyz와 /health는 마지막 확인 결과만 읽으므로 헬스 체크가 DB 부하를 만들거나 DB 지연에 묶이지 않습니다.
+READINESS_PROBE_INTERVAL = float(os.getenv('READINESS_PROBE_INTERVAL', '15'))  # 초
+READINESS_MAX_AGE = READINESS_PROBE_INTERVAL * 3  # 마지막 확인이 이보다 오래되면 (확인 스레드 멈춤) 준비 안 됨
+
+readiness_lock = threading.Lock()
+readiness_refresh_lock = threading.Lock()
+readiness = {'ready': False, 'checked_at': None, 'checks': {}}
+readiness_probe_enabled = False
+readiness_probe_pid = None
+
+def probe_database():
+    if not card_repo:
+        raise RuntimeError('card repository not configured')
+    card_repo.ping()
+    return True
+
+def probe_storage():
+    """Storage 버킷 목록을 1개만 조회합니다. Supabase가 설정되지 않았으면 None (확인 생략)"""
+    storage_client = supabase_admin if supabase_admin else supabase
+    if storage_client is None:
+        return None
+    with timed('storage'):
+        storage_client.storage.from_(BUCKET_NAME).list(options={'limit': 1})
+    return True
+
+def run_probe_check(check):
+    """확인 함수를 실행해 {'ok', 'error', 'latency_ms'}를 반환합니다. 확인 대상이 없으면(None 반환) None"""
+    started = time.perf_counter()
+    try:
+        if check() is None:
+            return None
+        result = {'ok': True, 'error': None}
+    except Exception as e:
+        result = {'ok': False, 'error': str(e)}
+    result['latency_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+def run_readiness_probe():
+    """DB/Storage를 확인해 결과를 저장합니다. 준비 여부는 DB 기준 (Storage 장애는 업로드만 실패하므로 degraded로 표시)"""
+    checks = {'database': run_probe_check(probe_database), 'storage': run_probe_check(probe_storage)}
+    
+    with readiness_lock:
+        previous = readiness['checks']
+        readiness.update(ready=checks['database']['ok'], checked_at=time.time(), checks=checks)
+    for name, check in checks.items():
+        if check is None or (previous.get(name) or {}).get('ok') == check['ok']:
+            continue
+        if check['ok']:
+            logger.info("✅ %s 연결 확인 (%sms)", name, check['latency_ms'])
+        else:
+            logger.error("❌ %s 연결 실패: %s", name, check['error'])
+
+def readiness_probe_loop():
+    while True:
+        run_readiness_probe()
+        time.sleep(READINESS_PROBE_INTERVAL)
+
+@app.before_request
+def ensure_readiness_probe():
+    """create_app()으로 활성화된 경우 프로세스(워커)마다 한 번 확인 스레드를 시작합니다."""
+    global readiness_probe_pid
+    if not readiness_probe_enabled or readiness_probe_pid == os.getpid():
+        return
+    with readiness_lock:
+        if readiness_probe_pid == os.getpid():
+            return
+        readiness_probe_pid = os.getpid()
+    threading.Thread(target=readiness_probe_loop, name='readiness-probe', daemon=True).start()
+
+def refresh_readiness_if_stale():
+    """확인 스레드가 없으면 (run_app.py 등 app.run 직접 실행) 오래된 결과를 요청 중에 한 번만 갱신합니다."""
+    if readiness_probe_enabled:
+        return
+    checked_at = readiness['checked_at']
+    if checked_at is not None and time.time() - checked_at < READINESS_PROBE_INTERVAL:
+        return
+    if readiness_refresh_lock.acquire(blocking=False):
+        try:
+            run_readiness_probe()
+        finally:
+            readiness_refresh_lock.release()
+
+def get_readiness():
+    with readiness_lock:
+        result = dict(readiness)
+    age = round(time.time() - result['checked_at'], 1) if result['checked_at'] else None
+    result['age_seconds'] = age
+    storage = result['checks'].get('storage')
+    result['degraded'] = bool(storage) and not storage['ok']
+    if age is None:
+        result['error'] = 'not checked yet'
+    elif age > READINESS_MAX_AGE:
+        result['ready'] = False
+        result['error'] = f'last check is {age}s old'
+    return result
+
+def get_worker_saturation():
+    """이 워커의 처리 중 요청 수와 내보내기 스레드 풀 사용량"""
+    with metrics_lock:
+        stats = dict(worker_stats)
+    stats['event_streams'] = len(event_subscribers)
+    # 이 헬스 체크 요청과 연결을 유지 중인 이벤트 스트림 제외
+    stats['requests_in_flight'] = max(stats['requests_in_flight'] - 1 - stats['event_streams'], 0)
+    stats['export_workers'] = EXPORT_WORKERS
+    stats['export_saturation'] = round(stats['exports_running'] / EXPORT_WORKERS, 2)
+    return stats
+
+# 생존 확인 (liveness): 프로세스가 요청을 처리할 수 있는지만 확인, DB/락/디스크 접근 없음
+@app.route('/healthz')
+def liveness_check():
+    return {'status': 'ok'}
+
+# 준비 상태 (readiness): 백그라운드에서 갱신한 DB/Storage 확인 결과와 워커 포화도, 캐시 상태
+# Railway 헬스 체크 경로로 사용 (준비되지 않았으면 503)
+@app.route('/readyz')
+def readiness_check():
+    refresh_readiness_if_stale()
+    status = get_readiness()
+    body = {
+        'status': 'ready' if status['ready'] else 'not_ready',
+        **status,
+        'pid': os.getpid(),
+        'workers': get_worker_saturation(),
+        'http_pool': get_http_pool_stats(),
+        'caches': {
+            'card_cache': get_card_cache_stats(),
+            'search_index': get_search_index_stats(),
+            'url_index': get_url_index_stats(),
+            'thumb_cache': get_thumb_cache_stats(),
+        },
+    }
+    return jsonify(body), 200 if status['ready'] else 503
+
+# Health check endpoint for Railway (진단용 상세 정보, DB는 직접 조회하지 않고 마지막 확인 결과 사용)
 @app.route('/health')
 def health_check():
+    refresh_readiness_if_stale()
+    status = get_readiness()
+    database = status['checks'].get('database')
     health_status = {
         'status': 'healthy',
         'supabase_connected': supabase is not None,
+        'card_repository': card_repo.backend if card_repo else None,
         'timestamp': os.environ.get('RAILWAY_DEPLOYMENT_ID', 'local'),
         'environment': 'railway' if os.environ.get('RAILWAY_ENVIRONMENT') else 'local',
         'python_version': sys.version.split()[0]
     }
     
-    # Supabase 연결 상태 확인
-    if supabase:
-        try:
-            test_result = supabase.table('edutech_cards').select('id').eq('view', 1).limit(1).execute()
-            health_status['database_test'] = 'success'
-            health_status['total_cards'] = len(test_result.data) if test_result.data else 0
-        except Exception as e:
-            health_status['database_test'] = f'failed: {str(e)}'
-            logger.error(f"Health check database test failed: {e}")
-    else:
+    # 저장소 연결 상태 (백그라운드 확인 결과)
+    if not card_repo:
         health_status['database_test'] = 'no_connection'
+    elif database is None:
+        health_status['database_test'] = 'pending'
+    else:
+        health_status['database_test'] = 'success' if database['ok'] else f"failed: {database['error']}"
+    
+    health_status['readiness'] = status
+    health_status['workers'] = get_worker_saturation()
+    health_status['http_pool'] = get_http_pool_stats()
+    health_status['card_cache'] = get_card_cache_stats()
+    health_status['search_index'] = get_search_index_stats()
+    health_status['url_index'] = get_url_index_stats()
+    health_status['thumbnail_dedupe'] = get_thumbnail_dedupe_stats()
+    health_status['thumb_cache'] = get_thumb_cache_stats()
+    health_status['events'] = get_event_stats()
     
     return health_status
 
+def prometheus_labels(**labels):
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in labels.values())
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + '}'
+
+def prometheus_summary(lines, name, help_text, table, label_names):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} summary")
+    with metrics_lock:
+        entries = [(key, sorted(entry['samples']), entry['count'], entry['sum']) for key, entry in table.items()]
+    for key, samples, count, total in sorted(entries):
+        labels = dict(zip(label_names, key))
+        for quantile in METRICS_QUANTILES:
+            value = samples[min(len(samples) - 1, int(quantile * len(samples)))]
+            lines.append(f"{name}{prometheus_labels(**labels, quantile=quantile)} {value:.6f}")
+        lines.append(f"{name}_sum{prometheus_labels(**labels)} {total:.6f}")
+        lines.append(f"{name}_count{prometheus_labels(**labels)} {count}")
+
+@app.route('/metrics')
+def metrics():
+    """경로별 지연시간 분위수와 구간별 소요 시간 (Prometheus text format, 워커 프로세스별 값)"""
+    lines = []
+    prometheus_summary(lines, 'edutech_http_request_duration_seconds',
+                       f'Request latency by route (quantiles over the last {METRICS_WINDOW} requests)',
+                       request_metrics, ('route', 'method'))
+    prometheus_summary(lines, 'edutech_request_phase_duration_seconds',
+                       'Time spent per request in db, storage, image, serialize, xlsx and search phases',
+                       phase_metrics, ('route', 'phase'))
+    
+    lines.append("# HELP edutech_http_requests_total Requests by route, method and status")
+    lines.append("# TYPE edutech_http_requests_total counter")
+    with metrics_lock:
+        counts = sorted(request_counts.items())
+    for (route, method, status), count in counts:
+        lines.append(f"edutech_http_requests_total{prometheus_labels(route=route, method=method, status=status)} {count}")
+    
+    cache_stats = get_card_cache_stats()
+    lines.append("# TYPE edutech_card_cache_hits_total counter")
+    lines.append(f"edutech_card_cache_hits_total {cache_stats['hits']}")
+    lines.append("# TYPE edutech_card_cache_misses_total counter")
+    lines.append(f"edutech_card_cache_misses_total {cache_stats['misses']}")
+    lines.append("# TYPE edutech_log_records_dropped_total counter")
+    lines.append(f"edutech_log_records_dropped_total {log_queue_handler.dropped}")
+    
+    lines.append("# HELP edutech_requests_in_flight Requests currently being handled by this worker")
+    lines.append("# TYPE edutech_requests_in_flight gauge")
+    lines.append(f"edutech_requests_in_flight {get_worker_saturation()['requests_in_flight']}")
+    event_stats_snapshot = get_event_stats()
+    lines.append("# HELP edutech_event_subscribers Open /api/events streams on this worker")
+    lines.append("# TYPE edutech_event_subscribers gauge")
+    lines.append(f"edutech_event_subscribers {event_stats_snapshot['subscribers']}")
+    for name, help_text in (('published', 'Card change events published to subscribers'),
+                            ('overflowed', 'Subscribers disconnected with resync because their queue was full'),
+                            ('rejected', 'Event stream requests rejected because the worker was at capacity')):
+        lines.append(f"# HELP edutech_events_{name}_total {help_text}")
+        lines.append(f"# TYPE edutech_events_{name}_total counter")
+        lines.append(f"edutech_events_{name}_total {event_stats_snapshot[name]}")
+    lines.append("# HELP edutech_ready Last background readiness probe result (1 = database reachable)")
+    lines.append("# TYPE edutech_ready gauge")
+    lines.append(f"edutech_ready {int(get_readiness()['ready'])}")
+    
+    pool_stats = get_http_pool_stats()
+    for name, help_text in (('requests', 'Requests sent through the shared Supabase HTTP pool'),
+                            ('retries', 'Retried attempts after transient connection errors or 502/503/504'),
+                            ('errors', 'Requests that failed after all retries'),
+                            ('connections_opened', 'New TCP connections opened by the pool'),
+                            ('tls_handshakes', 'TLS handshakes performed by the pool')):
+        lines.append(f"# HELP edutech_http_pool_{name}_total {help_text}")
+        lines.append(f"# TYPE edutech_http_pool_{name}_total counter")
+        lines.append(f"edutech_http_pool_{name}_total {pool_stats[name]}")
+    lines.append("# HELP edutech_http_pool_connections Open connections in the shared Supabase HTTP pool")
+    lines.append("# TYPE edutech_http_pool_connections gauge")
+    lines.append(f"edutech_http_pool_connections{prometheus_labels(state='idle')} {pool_stats['idle_connections']}")
+    lines.append(f"edutech_http_pool_connections{prometheus_labels(state='active')} {pool_stats['active_connections']}")
+    
+    return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
+
 @app.route('/api/cards', methods=['GET', 'POST'])
 def cards():
     if request.method == 'GET':
         try:
-            print("=== API /api/cards GET 요청 받음 ===")
-            
-            if not supabase:
-                print("ERROR: Supabase 연결 없음")
+            if not card_repo:
+                logger.error("카드 조회 실패: 저장소 연결 없음")
                 return jsonify({'error': 'Database not configured'}), 500
                 
             search = request.args.get('search', '')
@@ -139,49 +1849,86 @@ def cards():
             subject = request.args.get('subject', '')
             admin_view = request.args.get('admin', '')  # Admin can see all cards
             
-            print(f"검색 조건 - search: '{search}', category: '{category}', subject: '{subject}', admin: '{admin_view}'")
-            
-            # Admin can see all cards, regular users only see approved ones
-            if admin_view == 'true':
-                query = supabase.table('edutech_cards').select('*')
-            else:
-                query = supabase.table('edutech_cards').select('*').eq('view', 1)
-            
-            if search:
-                query = query.or_(f"webpage_name.ilike.%{search}%,user_summary.ilike.%{search}%,ai_summary.ilike.%{search}%")
-            
-            if category:
-                query = query.eq('ai_category', category)
-            
-            if subject:
-                query = query.contains('useful_subjects', [subject])
+            logger.debug("검색 조건 - search: %r, category: %r, subject: %r, admin: %r", search, category, subject, admin_view)
             
-            # sort_order 필드가 있으면 우선 정렬, 없으면 created_at으로만 정렬
-            try:
-                query = query.order('sort_order', desc=False).order('created_at', desc=True)
-            except Exception as sort_error:
-                print(f"sort_order 필드 정렬 실패, created_at으로 대체: {sort_error}")
-                query = query.order('created_at', desc=True)
+            # 검색어가 없으면 캐시된 목록에서 바로 응답 (Supabase 왕복 없음)
+            # limit/cursor가 있으면 페이지 단위로 응답
+            if request.args.get('limit') or request.args.get('cursor'):
+                try:
+                    limit = request.args.get('limit', str(PAGE_DEFAULT_LIMIT))
+                    if not limit.isdigit() or int(limit) < 1:
+                        raise ValueError('limit must be a positive integer')
+                    limit = int(limit)
+                    limit = min(limit, PAGE_MAX_LIMIT)
+                    cursor = decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+                    fields = parse_fields(request.args.get('fields', ''))
+                except ValueError as e:
+                    return jsonify({'error': str(e)}), 400
+                
+                if search:
+                    return jsonify({'error': 'search cannot be combined with limit/cursor'}), 400
+                
+                items, total, has_more = fetch_card_page(admin_view == 'true', limit, cursor, fields, category, subject)
+                return jsonify({
+                    'items': items,
+                    'total': total,
+                    'limit': limit,
+                    'next_cursor': encode_cursor(items[-1]) if has_more and items else None,
+                })
             
-            print("데이터베이스 쿼리 실행 중...")
-            result = query.execute()
+            if not search:
+                # 필터가 없는 기본 목록은 미리 직렬화/압축된 본문과 ETag로 응답
+                if not category and not subject:
+                    payload, cache_hit = get_catalog_payload(admin_view == 'true')
+                    return catalog_response(payload, cache_hit)
+                
+                rows, cache_hit = get_cached_catalog(admin_view == 'true')
+                
+                if category:
+                    rows = [card for card in rows if card.get('ai_category') == category]
+                
+                if subject:
+                    rows = [card for card in rows if subject in (card.get('useful_subjects') or [])]
+                
+                logger.debug("조회된 카드 수: %d (cache %s)", len(rows), 'HIT' if cache_hit else 'MISS')
+                
+                response = jsonify(rows)
+                response.headers['X-Cache'] = 'HIT' if cache_hit else 'MISS'
+                return response
             
-            card_count = len(result.data) if result.data else 0
-            print(f"조회된 카드 수: {card_count}")
+            if request.args.get('search_mode') == 'fulltext':
+                try:
+                    rows = search_cards_fulltext(search, admin_view == 'true')
+                    
+                    if category:
+                        rows = [card for card in rows if card.get('ai_category') == category]
+                    
+                    if subject:
+                        rows = [card for card in rows if subject in (card.get('useful_subjects') or [])]
+                    
+                    logger.debug("전체 텍스트 검색 결과 수: %d", len(rows))
+                    response = jsonify(rows)
+                    response.headers['X-Search-Mode'] = 'fulltext'
+                    return response
+                except Exception as fts_error:
+                    # RPC가 아직 배포되지 않은 경우 기존 ILIKE 검색으로 대체
+                    logger.warning("전체 텍스트 검색 실패, ILIKE 검색으로 대체: %s", fts_error)
             
-            if card_count > 0:
-                print(f"첫 번째 카드: {result.data[0].get('webpage_name', 'Unknown')}")
+            # Admin can see all cards, regular users only see approved ones
+            rows = card_repo.search_cards(search, admin_view == 'true', category, subject)
+            logger.debug("조회된 카드 수: %d", len(rows))
             
-            return jsonify(result.data or [])
+            return jsonify(rows)
             
         except Exception as e:
-            print(f"ERROR: 카드 조회 실패 - {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("카드 조회 실패: %s", e)
             return jsonify({'error': 'Failed to fetch cards'}), 500
     
     elif request.method == 'POST':
         try:
+            if not card_repo:
+                return jsonify({'error': 'Database not configured'}), 500
+            
             data = request.json
             url = data.get('url')
             webpage_name = data.get('webpage_name')
@@ -196,12 +1943,17 @@ def cards():
             if not url or not webpage_name:
                 return jsonify({'error': 'URL and webpage_name are required'}), 400
             
-            # 썸네일 URL 처리
+            # 정규화한 URL이 같은 카드가 있으면 insert 왕복 없이 거절
+            try:
+                duplicate_response = reject_duplicate_url(url)
+            except ValueError:
+                return jsonify({'error': 'Invalid URL'}), 400
+            if duplicate_response:
+                return duplicate_response
+            
+            # 썸네일 URL 처리 (없으면 비워 두고, /thumb/<id>/<size>가 제목으로 대체 이미지를 만듭니다)
             thumbnail_url = data.get('thumbnail_url', '')
-            print(f"받은 썸네일 URL: '{thumbnail_url}'")  # 디버깅용
-            if not thumbnail_url:
-                thumbnail_url = f"https://via.placeholder.com/400x300?text={webpage_name}"
-                print(f"기본 썸네일 URL 설정: '{thumbnail_url}'")  # 디버깅용
+            logger.debug("받은 썸네일 URL: %r", thumbnail_url)
             
             new_card = {
                 'url': url,
@@ -214,29 +1966,274 @@ def cards():
                 'view': data.get('view', 1),  # 요청에서 view 값 가져오기, 기본값은 1 (admin에서 직접 추가시)
             }
             
-            # sort_order 필드가 존재하는지 확인하고 설정
+            # 새 카드는 맨 앞에 추가 (순서 변경으로 맨 앞 카드가 0 아래로 내려갔을 수 있으므로 최솟값 - 1)
             try:
-                # 새 카드의 sort_order는 0으로 설정 (맨 앞에 추가)
-                new_card['sort_order'] = 0
-                print(f"sort_order 설정: 0 (맨 앞에 배치)")
+                new_card['sort_order'] = new_card_sort_order()
+                logger.debug("sort_order 설정: %s (맨 앞에 배치)", new_card['sort_order'])
             except Exception as sort_error:
-                print(f"sort_order 필드 설정 실패, 건너뜀: {sort_error}")
-                # sort_order 필드가 없으면 그냥 추가하지 않음
+                logger.warning("맨 앞 sort_order 조회 실패, 0 사용: %s", sort_error)
+                new_card['sort_order'] = 0
+            
+            # 업로드 시 생성된 크기별 썸네일 변형 (add_thumbnail_variants_migration.sql 필요)
+            thumbnail_variants = parse_thumbnail_variants(data.get('thumbnail_variants'))
+            if thumbnail_variants:
+                new_card['thumbnail_variants'] = thumbnail_variants
             
-            print(f"데이터베이스에 저장할 카드: {new_card}")  # 디버깅용
-            result = supabase.table('edutech_cards').insert(new_card).execute()
-            print(f"저장된 카드: {result.data[0] if result.data else 'None'}")  # 디버깅용
-            return jsonify(result.data[0]), 201
+            logger.debug("데이터베이스에 저장할 카드: %s", new_card)
+            created_card = write_card_values(card_repo.create_card, new_card)
+            invalidate_card_cache('card created')
+            search_index_upsert(created_card)
+            url_index_upsert(created_card)
+            publish_card_event('created', [created_card['id']], view=created_card.get('view'))
+            logger.debug("저장된 카드: %s", created_card)
+            return jsonify(created_card), 201
             
+        except DuplicateCardError:
+            return jsonify({'error': 'URL already exists'}), 409
         except Exception as e:
-            print(f"Error creating card: {e}")
-            if 'duplicate key' in str(e):
-                return jsonify({'error': 'URL already exists'}), 409
+            logger.exception("Error creating card: %s", e)
             return jsonify({'error': 'Failed to create card'}), 500
 
+# 변경분 동기화 (delta sync)
+# 카탈로그 버전은 updated_at의 최댓값(UTC 기준 마이크로초 정수)입니다. 생성/수정/숨김/순서 변경이 모두 updated_at을
+# 갱신하므로, 클라이언트는 마지막으로 받은 버전 이후에 바뀐 카드와 숨겨진 카드 ID(tombstone)만 받아 로컬 목록에 적용합니다.
+CHANGES_MAX_ROWS = 500  # 이보다 많이 바뀌었으면 전체 목록으로 응답
+CHANGES_OVERLAP_US = 5_000_000  # now()는 트랜잭션 시작 시각이라 늦게 커밋된 행을 놓치지 않도록 5초를 겹쳐 조회
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+def card_version(card):
+    """카드의 updated_at을 버전(마이크로초 정수)으로 변환합니다."""
+    value = card.get('updated_at') or card.get('created_at')
+    if not value:
+        return 0
+    try:
+        moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return 0
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return (moment - EPOCH) // timedelta(microseconds=1)
+
+def version_timestamp(version):
+    return (EPOCH + timedelta(microseconds=version)).isoformat(timespec='microseconds')
+
+def get_cached_card_versions():
+    """캐시된 전체 목록(숨김 포함)의 (최신 버전, [(버전, 카드)] 최신순)을 캐시 항목마다 한 번만 계산합니다."""
+    rows, _ = get_cached_catalog(True)
+    with card_cache_lock:
+        entry = card_cache.get('admin')
+        if entry is not None and entry['rows'] is rows and 'versions' in entry:
+            return entry['versions']
+
+    versioned = sorted(((card_version(card), card) for card in rows), key=lambda item: item[0], reverse=True)
+    versions = (versioned[0][0] if versioned else 0, versioned)
+
+    with card_cache_lock:
+        entry = card_cache.get('admin')
+        if entry is not None and entry['rows'] is rows:
+            entry['versions'] = versions
+    return versions
+
+@app.route('/api/cards/changes')
+def card_changes():
+    """since 버전 이후 바뀐 카드만 반환합니다: {version, full, cards, deleted}
+
+    since가 없거나 0이면 (또는 변경이 CHANGES_MAX_ROWS보다 많으면) full=true와 전체 목록을 반환하며
+    클라이언트는 로컬 목록을 통째로 교체합니다. 일반 모드에서 숨겨진(view != 1) 카드는 deleted로 전달됩니다.
+    워커의 카드 목록 캐시가 since 이후 버전이면 캐시에서 변경분을 골라 응답하고 (DB 조회 없음),
+    클라이언트가 캐시보다 앞서 있을 때만 DB에서 조회합니다. 전체 목록은 /api/cards처럼 ETag/압축 본문으로 응답합니다.
+    """
+    try:
+        if not card_repo:
+            return jsonify({'error': 'Database not configured'}), 500
+
+        admin_view = request.args.get('admin', '') == 'true'
+        since = request.args.get('since', '0')
+        if not since.isdigit():
+            return jsonify({'error': 'since must be a version number'}), 400
+        since = int(since)
+
+        if since:
+            threshold = since - CHANGES_OVERLAP_US
+            cached_version, versioned = get_cached_card_versions()
+            if cached_version >= since:
+                # 숨김 포함 목록이라 일반 모드의 tombstone도 캐시에서 구할 수 있음 (최신순이므로 threshold에서 멈춤)
+                rows = []
+                for version, card in versioned:
+                    if version <= threshold or len(rows) > CHANGES_MAX_ROWS:
+                        break
+                    rows.append(card)
+            else:
+                rows = card_repo.list_changes(version_timestamp(max(threshold, 0)), CHANGES_MAX_ROWS + 1)
+            if len(rows) <= CHANGES_MAX_ROWS:
+                return jsonify({
+                    'version': max([since] + [card_version(card) for card in rows]),
+                    'full': False,
+                    'cards': [card for card in rows if admin_view or card.get('view') == 1],
+                    'deleted': [card['id'] for card in rows if not admin_view and card.get('view') != 1],
+                })
+
+        # 전체 목록의 버전은 그 목록 자체에서 계산 (캐시가 오래됐어도 다음 동기화에서 나머지를 받음)
+        payload, cache_hit = get_catalog_payload(admin_view, changes=True)
+        return catalog_response(payload, cache_hit)
+
+    except Exception as e:
+        logger.exception("변경분 조회 실패: %s", e)
+        return jsonify({'error': 'Failed to fetch card changes'}), 500
+
+# 실시간 변경 알림 (Server-Sent Events)
+# 카드 생성/수정/승인/숨김/순서 변경을 /api/events 구독자에게 바로 보냅니다. 메시지에는 종류와 카드 ID만 담고
+# 클라이언트는 이를 받아 /api/cards/changes로 변경분을 가져옵니다. (재연결 사이에 놓친 변경도 버전으로 채워짐)
+# 구독자마다 크기가 제한된 큐를 두어 느린 구독자가 발행을 막지 않게 하고, 큐가 가득 차면 resync를 보내고 끊습니다.
+# 구독자 목록은 워커 프로세스별이라 다른 워커에서 일어난 변경은 다음 동기화(재연결, 폴링) 때 반영됩니다.
+EVENT_QUEUE_SIZE = 64
+EVENT_HEARTBEAT_SECONDS = 15  # 프록시가 유휴 연결을 끊지 않도록, 끊긴 클라이언트를 알아채도록 보내는 주석 줄 간격
+EVENT_STREAM_MAX_SECONDS = 240  # gunicorn --timeout(300)보다 짧게 끝내고 브라우저가 자동으로 재연결
+EVENT_RETRY_MS = 3000
+
+event_lock = threading.Lock()
+event_subscribers = {}  # 구독 번호 -> {'queue', 'overflowed'}
+event_stats = {'published': 0, 'delivered': 0, 'overflowed': 0, 'rejected': 0}
+event_sequence = 0
+event_capacity = None
+
+def get_event_capacity():
+    """워커당 동시 구독자 수 (EVENT_MAX_SUBSCRIBERS로 지정하지 않으면 워커 종류에 따라 결정)
+
+    스트림 하나가 연결 내내 워커 하나를 차지하므로 sync 워커(gunicorn 기본)에서는 받지 않고(0)
+    클라이언트가 주기적 변경분 동기화로 대신합니다. gevent 워커나 스레드 개발 서버에서만 연결을 유지합니다.
+    """
+    global event_capacity
+    if event_capacity is None:
+        configured = os.getenv('EVENT_MAX_SUBSCRIBERS', '')
+        gevent_monkey = sys.modules.get('gevent.monkey')
+        if configured.isdigit():
+            event_capacity = int(configured)
+        elif gevent_monkey is not None and gevent_monkey.is_module_patched('socket'):
+            event_capacity = 100
+        elif 'gunicorn.workers.sync' in sys.modules:
+            event_capacity = 0
+        else:
+            event_capacity = 10
+    return event_capacity
+
+def publish_card_event(kind, card_ids, **fields):
+    """카드 변경을 이 워커의 모든 구독자 큐에 넣습니다. (큐가 가득 찬 구독자는 건너뛰고 resync 대상으로 표시)"""
+    if not event_subscribers:
+        return
+    message = json.dumps({'type': kind, 'ids': list(card_ids), **fields}, ensure_ascii=False, separators=(',', ':'))
+    with event_lock:
+        event_stats['published'] += 1
+        for subscriber in event_subscribers.values():
+            if subscriber['overflowed']:
+                continue
+            try:
+                subscriber['queue'].put_nowait((kind, message))
+                event_stats['delivered'] += 1
+            except queue.Full:
+                subscriber['overflowed'] = True
+                event_stats['overflowed'] += 1
+
+def get_event_stats():
+    with event_lock:
+        stats = dict(event_stats)
+        stats['subscribers'] = len(event_subscribers)
+    stats['capacity'] = get_event_capacity()
+    return stats
+
+@app.route('/api/events')
+def card_events():
+    """카드 변경 이벤트 스트림 (text/event-stream)
+
+    이벤트 종류: created, updated, approved, hidden, reordered, resync
+    data는 {"type", "ids", ...} JSON이며, resync를 받거나 재연결하면 클라이언트가 변경분을 다시 동기화합니다.
+    """
+    global event_sequence
+    subscriber = {'queue': queue.Queue(maxsize=EVENT_QUEUE_SIZE), 'overflowed': False}
+    with event_lock:
+        if len(event_subscribers) >= get_event_capacity():
+            event_stats['rejected'] += 1
+            return jsonify({'error': 'Event stream not available on this worker',
+                            'capacity': get_event_capacity()}), 503
+        event_sequence += 1
+        subscriber_id = event_sequence
+        event_subscribers[subscriber_id] = subscriber
+
+    def stream():
+        yield f"retry: {EVENT_RETRY_MS}\n: connected\n\n"
+        deadline = time.monotonic() + EVENT_STREAM_MAX_SECONDS
+        while time.monotonic() < deadline:
+            try:
+                kind, message = subscriber['queue'].get(timeout=EVENT_HEARTBEAT_SECONDS)
+            except queue.Empty:
+                yield ": keepalive\n\n"
+                continue
+            if subscriber['overflowed']:
+                yield "event: resync\ndata: {}\n\n"
+                return
+            yield f"event: {kind}\ndata: {message}\n\n"
+
+    def unsubscribe():
+        with event_lock:
+            event_subscribers.pop(subscriber_id, None)
+
+    response = Response(stream(), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response.call_on_close(unsubscribe)
+    return response
+
+@app.route('/api/search')
+def search_cards():
+    try:
+        if not card_repo:
+            return jsonify({'error': 'Database not configured'}), 500
+        
+        query = request.args.get('q', '').strip()
+        admin_view = request.args.get('admin', '') == 'true'
+        limit = request.args.get('limit', '')
+        limit = min(int(limit), 1000) if limit.isdigit() else None
+        
+        ensure_search_index()
+        started = time.perf_counter()
+        ids = search_index_query(query, admin_view)
+        took_us = round((time.perf_counter() - started) * 1_000_000)
+        
+        return jsonify({
+            'ids': ids[:limit] if limit else ids,
+            'total': len(ids),
+            'took_us': took_us,
+        })
+        
+    except Exception as e:
+        logger.exception("검색 색인 조회 실패: %s", e)
+        return jsonify({'error': 'Failed to search cards'}), 500
+
+# 낙관적 동시성 제어: 클라이언트가 받은 카드의 updated_at을 보내면 그 사이 다른 수정이 있었는지 확인합니다.
+# If-Match 헤더로 보내면 412, 본문의 updated_at으로 보내면 409로 거절하고 현재 카드를 함께 돌려줍니다.
+def requested_card_version(data):
+    """요청이 기대하는 카드 버전. (updated_at 또는 None, 충돌 시 상태 코드) 튜플"""
+    if_match = request.headers.get('If-Match', '').strip()
+    if if_match and if_match != '*':
+        return if_match.removeprefix('W/').strip('"'), 412
+    updated_at = data.get('updated_at')
+    if updated_at:
+        return str(updated_at), 409
+    return None, None
+
+def stale_card_response(error, status):
+    return jsonify({
+        'error': '다른 곳에서 먼저 수정된 카드입니다. 최신 내용을 확인한 뒤 다시 시도하세요',
+        'current': error.current,
+    }), status
+
+def with_card_etag(response, card):
+    if card.get('updated_at'):
+        response.headers['ETag'] = f'"{card["updated_at"]}"'
+    return response
+
 @app.route('/api/cards/<int:card_id>', methods=['PUT', 'DELETE'])
 def card_operations(card_id):
-    if not supabase:
+    if not card_repo:
         return jsonify({'error': 'Database not configured'}), 500
         
     if request.method == 'PUT':
@@ -262,6 +2259,13 @@ def card_operations(card_id):
             if not url or not webpage_name:
                 return jsonify({'error': 'URL and webpage_name are required'}), 400
             
+            try:
+                duplicate_response = reject_duplicate_url(url, exclude_id=card_id)
+            except ValueError:
+                return jsonify({'error': 'Invalid URL'}), 400
+            if duplicate_response:
+                return duplicate_response
+            
             update_data = {
                 'url': url,
                 'webpage_name': webpage_name,
@@ -269,30 +2273,52 @@ def card_operations(card_id):
                 'useful_subjects': useful_subjects,
                 'educational_meaning': educational_meaning,
                 'keyword': keyword,
-                'updated_at': 'now()'
             }
             
             # 썸네일 URL이 제공되면 업데이트
             thumbnail_url = data.get('thumbnail_url')
             if thumbnail_url is not None:
                 update_data['thumbnail_url'] = thumbnail_url
+                # 새 썸네일과 함께 온 변형으로 교체 (이전 이미지의 변형이 남지 않도록)
+                thumbnail_variants = parse_thumbnail_variants(data.get('thumbnail_variants'))
+                if thumbnail_variants is not None:
+                    update_data['thumbnail_variants'] = thumbnail_variants
             
             # view 필드 처리 (관리자 승인/거부)
             view_status = data.get('view')
             if view_status is not None:
                 update_data['view'] = int(view_status)
             
-            # 먼저 카드가 존재하는지 확인 (view 상태와 무관하게)
-            check_result = supabase.table('edutech_cards').select('id').eq('id', card_id).execute()
-            if not check_result.data:
-                return jsonify({'error': 'Card not found'}), 404
+            # 승인/숨김 알림 구분용 이전 view (중복 확인 때 채워진 URL 색인에서 읽음)
+            with url_index_lock:
+                previous = url_index['cards'].get(card_id)
+                previous_view = previous.get('view') if previous else None
             
-            result = supabase.table('edutech_cards').update(update_data).eq('id', card_id).execute()
+            # 존재 확인 없이 조건부 UPDATE 한 번 (없는 카드면 None, 버전이 다르면 StaleCardError)
+            expected_updated_at, conflict_status = requested_card_version(data)
+            try:
+                updated_card = write_card_values(
+                    lambda values: card_repo.update_card(card_id, values, expected_updated_at=expected_updated_at),
+                    update_data)
+            except StaleCardError as e:
+                return stale_card_response(e, conflict_status)
+            if not updated_card:
+                return jsonify({'error': 'Card not found'}), 404
+            invalidate_card_cache(f'card {card_id} updated')
+            search_index_upsert(updated_card)
+            url_index_upsert(updated_card)
+            view = updated_card.get('view')  # 조건부 UPDATE가 반환한 실제 값
+            if 'view' in update_data and previous_view is not None and view != previous_view:
+                publish_card_event('approved' if view == 1 else 'hidden', [card_id], view=view)
+            else:
+                publish_card_event('updated', [card_id])
                 
-            return jsonify(result.data[0] if result.data else {'message': 'Updated successfully'})
+            return with_card_etag(jsonify(updated_card), updated_card)
             
+        except DuplicateCardError:
+            return jsonify({'error': 'URL already exists'}), 409
         except Exception as e:
-            print(f"Error updating card: {e}")
+            logger.exception("Error updating card: %s", e)
             return jsonify({'error': 'Failed to update card'}), 500
     
     elif request.method == 'DELETE':
@@ -306,40 +2332,125 @@ def card_operations(card_id):
             if password != ADMIN_PASSWORD:
                 return jsonify({'error': '비밀번호가 일치하지 않습니다'}), 401
             
-            # 먼저 카드가 존재하는지 확인 (view 상태와 무관하게)
-            check_result = supabase.table('edutech_cards').select('id, view').eq('id', card_id).execute()
-            if not check_result.data:
+            # 카드를 숨기기 (view=0으로 설정, 존재 확인 없이 조건부 UPDATE 한 번)
+            expected_updated_at, conflict_status = requested_card_version(data)
+            try:
+                hidden_card = card_repo.soft_delete_card(card_id, expected_updated_at=expected_updated_at)
+            except StaleCardError as e:
+                return stale_card_response(e, conflict_status)
+            if not hidden_card:
                 return jsonify({'error': 'Card not found'}), 404
+            invalidate_card_cache(f'card {card_id} hidden')
+            search_index_patch(card_id, view=0)
+            url_index_patch(card_id, view=0)
+            publish_card_event('hidden', [card_id], view=0)
             
-            # 카드를 숨기기 (view=0으로 설정)
-            result = supabase.table('edutech_cards').update({'view': 0}).eq('id', card_id).execute()
-            
-            return jsonify({'message': 'Card deleted successfully'})
+            return with_card_etag(jsonify({'message': 'Card deleted successfully'}), hidden_card)
             
         except Exception as e:
-            print(f"Error deleting card: {e}")
+            logger.exception("Error deleting card: %s", e)
             return jsonify({'error': 'Failed to delete card'}), 500
 
 
+# 일괄 승인/대기 전환 (관리자)
+BULK_MODERATION_MAX_IDS = 500  # 한 요청에서 바꿀 수 있는 카드 수 (Supabase in.() 필터가 URL에 들어감)
+
+@app.route('/api/cards/moderate', methods=['POST'])
+def moderate_cards():
+    """여러 카드의 승인 상태(view)를 한 번에 바꿉니다: {password, ids, view}
+
+    조회 한 번으로 ID와 현재 상태를 확인하고, 바꿀 카드만 UPDATE 한 번으로 적용한 뒤
+    ID별 결과(updated / unchanged / not_found)를 반환합니다.
+    """
+    try:
+        if not card_repo:
+            return jsonify({'error': 'Database not configured'}), 500
+        
+        data = request.json or {}
+        password = data.get('password', '')
+        
+        # 비밀번호 확인 (관리자 비밀번호 사용)
+        ADMIN_PASSWORD = "admin"
+        
+        if password != ADMIN_PASSWORD:
+            return jsonify({'error': '비밀번호가 일치하지 않습니다'}), 401
+        
+        try:
+            view = int(data.get('view'))
+            card_ids = list(dict.fromkeys(int(card_id) for card_id in data.get('ids') or []))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'ids는 카드 ID 목록, view는 0 또는 1이어야 합니다'}), 400
+        if view not in (0, 1):
+            return jsonify({'error': 'view는 0(대기) 또는 1(승인)이어야 합니다'}), 400
+        if not card_ids:
+            return jsonify({'error': '카드 ID 목록이 필요합니다'}), 400
+        if len(card_ids) > BULK_MODERATION_MAX_IDS:
+            return jsonify({'error': f'한 번에 최대 {BULK_MODERATION_MAX_IDS}개까지 변경할 수 있습니다'}), 400
+        
+        started = time.perf_counter()
+        
+        current_views = {card['id']: card.get('view') for card in card_repo.get_cards(card_ids, 'id, view')}
+        to_change = [card_id for card_id in card_ids if card_id in current_views and current_views[card_id] != view]
+        changed = {card['id']: card for card in card_repo.set_view(to_change, view)} if to_change else {}
+        
+        results = []
+        for card_id in card_ids:
+            if card_id in changed:
+                results.append({'id': card_id, 'status': 'updated', 'updated_at': changed[card_id].get('updated_at')})
+            elif card_id in current_views and card_id not in to_change:
+                results.append({'id': card_id, 'status': 'unchanged'})
+            else:
+                results.append({'id': card_id, 'status': 'not_found'})
+        
+        if changed:
+            invalidate_card_cache(f'{len(changed)} cards moderated')
+            for card_id in changed:
+                search_index_patch(card_id, view=view)
+                url_index_patch(card_id, view=view)
+            publish_card_event('approved' if view == 1 else 'hidden', list(changed), view=view)
+        
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 2)
+        logger.info("카드 일괄 상태 변경: %d개 중 %d개 view=%d (%sms)", len(card_ids), len(changed), view, elapsed_ms)
+        
+        return jsonify({
+            'view': view,
+            'requested': len(card_ids),
+            'updated': len(changed),
+            'results': results,
+            'elapsed_ms': elapsed_ms,
+        })
+        
+    except Exception as e:
+        # 일부만 반영되었을 수 있으므로 캐시를 비움
+        invalidate_card_cache('cards moderation failed')
+        logger.exception("카드 일괄 상태 변경 오류: %s", e)
+        return jsonify({'error': '카드 상태 변경 중 오류가 발생했습니다'}), 500
+
+
 # OpenAI 분석 기능 제거됨
 
 @app.route('/api/duplicate-check', methods=['POST'])
 def duplicate_check():
     try:
+        if not card_repo:
+            return jsonify({'error': 'Database not configured'}), 500
+        
         data = request.json
         url = data.get('url')
         
         if not url:
             return jsonify({'error': 'URL is required'}), 400
         
-        domain = urlparse(url).hostname
-        
-        result = supabase.table('edutech_cards').select('id, webpage_name, url').eq('view', 1).ilike('url', f'%{domain}%').limit(5).execute()
+        # 같은 URL(정규화 후)은 match='exact', 같은 도메인의 승인된 카드는 match='domain'
+        try:
+            duplicates = find_url_duplicates(url, limit=5)
+        except ValueError:
+            return jsonify({'error': 'Invalid URL'}), 400
         
-        return jsonify({'duplicates': result.data or []})
+        return jsonify({'duplicates': duplicates})
         
     except Exception as e:
-        print(f"Error checking duplicates: {e}")
+        logger.exception("Error checking duplicates: %s", e)
         return jsonify({'error': 'Failed to check duplicates'}), 500
 
 # 웹페이지 내용 추출 함수 제거됨 (OpenAI 분석 관련)
@@ -347,79 +2458,696 @@ def duplicate_check():
 # Supabase Storage 설정
 BUCKET_NAME = 'edutech-thumbnails'
 
+# 썸네일 변환 설정
+# 업로드 시 이미지를 한 번만 디코딩해 너비별 WebP 변형을 만들고, 카드 목록은 가장 작은 변형을 사용합니다.
+# (AVIF는 인코딩이 WebP보다 훨씬 느려 업로드 지연이 커지므로 만들지 않습니다)
+THUMBNAIL_WIDTHS = (80, 240, 480)
+THUMBNAIL_QUALITY = 80
+THUMBNAIL_CONTENT_TYPE = 'image/webp'
+THUMBNAIL_MAX_PIXELS = 40 * 1000 * 1000  # 압축 폭탄 방지
+
+def encode_thumbnail(image):
+    # encoderinfo에 exif/icc_profile을 넘기지 않으므로 메타데이터는 저장되지 않습니다.
+    buffer = io.BytesIO()
+    image.save(buffer, 'WEBP', quality=THUMBNAIL_QUALITY, method=4)
+    return buffer.getvalue()
+
+@timed('image')
+def build_thumbnail_variants(fileobj, widths=THUMBNAIL_WIDTHS):
+    """이미지 파일 객체를 한 번 디코딩해 {너비: WebP bytes} 변형을 만듭니다.
+
+    EXIF 방향은 픽셀에 반영하고, 원본보다 큰 너비는 만들지 않습니다
+    (원본이 더 작으면 원본 크기 변형 하나가 가장 큰 변형이 됩니다).
+    """
+    Image, ImageOps = load_pillow()
+    with Image.open(fileobj) as source:
+        if source.width * source.height > THUMBNAIL_MAX_PIXELS:
+            raise ValueError(f'image too large: {source.width}x{source.height}')
+        largest = max(widths)
+        source.draft('RGB', (largest, largest))  # JPEG은 필요한 크기까지만 축소 디코딩
+        image = ImageOps.exif_transpose(source)
+        has_alpha = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+
+    variants = {}
+    for width in sorted(widths):
+        if width >= image.width:
+            variants[image.width] = encode_thumbnail(image)  # srcset의 w 값이 실제 너비와 맞도록
+            break
+        height = max(1, round(image.height * width / image.width))
+        variants[width] = encode_thumbnail(image.resize((width, height), Image.LANCZOS, reducing_gap=3.0))
+    return variants
+
+def parse_thumbnail_variants(value):
+    """요청 본문의 thumbnail_variants를 {"너비": URL} 형태로 정리합니다. (형식이 맞지 않으면 None)"""
+    if not isinstance(value, dict):
+        return None
+    return {str(width): url for width, url in value.items() if str(width).isdigit() and isinstance(url, str)}
+
+def is_missing_column_error(error, column):
+    """마이그레이션 전 DB에 없는 컬럼을 쓰려다 난 오류인지 (PostgREST PGRST204, Postgres 42703)"""
+    message = str(error)
+    return column in message and any(marker in message for marker in ('PGRST204', '42703', 'column'))
+
+def write_card_values(write, values):
+    """write(values)로 카드를 저장하고, thumbnail_variants 컬럼이 없으면 그 필드만 빼고 다시 저장합니다."""
+    try:
+        return write(values)
+    except (DuplicateCardError, StaleCardError):
+        raise
+    except Exception as e:
+        if 'thumbnail_variants' not in values or not is_missing_column_error(e, 'thumbnail_variants'):
+            raise
+        logger.warning("thumbnail_variants 컬럼 없음, 변형 없이 저장 (add_thumbnail_variants_migration.sql 필요): %s", e)
+        return write({field: value for field, value in values.items() if field != 'thumbnail_variants'})
+
+# 썸네일 중복 제거 (콘텐츠 주소 저장)
+# 업로드 원본 바이트의 SHA-256을 객체 이름으로 사용하므로, 카드를 편집하면서 같은 이미지를 다시 올리면
+# 변환과 업로드 없이 기존 객체의 URL을 돌려줍니다. 같은 이름의 객체 내용은 바뀌지 않으므로
+# 긴 캐시 기간(1년)을 안전하게 지정할 수 있습니다.
+THUMBNAIL_CACHE_MAX_AGE = '31536000'  # Storage가 Cache-Control: max-age=<값>으로 제공
+THUMBNAIL_HASH_INDEX_SIZE = 4096
+thumbnail_hash_index = {}  # sha256 -> {'filename', 'url', 'variants'} (삽입 순서대로 오래된 항목부터 제거)
+thumbnail_hash_lock = threading.Lock()
+thumbnail_hash_stats = {'index_hits': 0, 'storage_hits': 0, 'uploads': 0}
+
+def lookup_thumbnail(digest):
+    with thumbnail_hash_lock:
+        result = thumbnail_hash_index.get(digest)
+        if result:
+            thumbnail_hash_stats['index_hits'] += 1
+        return result
+
+def remember_thumbnail(digest, result):
+    with thumbnail_hash_lock:
+        thumbnail_hash_index.pop(digest, None)
+        thumbnail_hash_index[digest] = result
+        while len(thumbnail_hash_index) > THUMBNAIL_HASH_INDEX_SIZE:
+            thumbnail_hash_index.pop(next(iter(thumbnail_hash_index)))
+
+def is_duplicate_object_error(error):
+    message = str(error).lower()
+    return 'duplicate' in message or 'already exists' in message
+
+@timed('storage')
+def store_thumbnail_objects(bucket, objects, source_size=None):
+    """[(파일명, 내용, content-type, 너비)]를 업로드하고 (결과, 이미 있었는지)를 반환합니다.
+
+    내용이 bytes가 아니라 파일 객체(원본 임시 파일)이면 Storage REST API로 스트리밍합니다.
+    가장 큰 변형을 마지막에 올리므로, 마지막 객체가 있으면(HEAD) 앞의 변형도 모두 있는 것으로 봅니다.
+    """
+    try:
+        stored = bucket.exists(objects[-1][0])
+    except Exception:
+        stored = False
+    
+    if not stored:
+        for filename, content, content_type, width in objects:
+            if not isinstance(content, bytes):
+                logger.debug("업로드 시도 (스트리밍): %s, 크기: %s bytes", filename, source_size)
+                stream_to_storage(filename, content, source_size, content_type)
+                continue
+            logger.debug("업로드 시도: %s, 크기: %d bytes", filename, len(content))
+            try:
+                bucket.upload(path=filename, file=content, file_options={
+                    "content-type": content_type,
+                    "cache-control": THUMBNAIL_CACHE_MAX_AGE,
+                })
+            except Exception as upload_error:
+                # 다른 워커가 같은 이미지를 먼저 올린 경우 (내용이 같으므로 그대로 사용)
+                if not is_duplicate_object_error(upload_error):
+                    raise
+    
+    with thumbnail_hash_lock:
+        thumbnail_hash_stats['storage_hits' if stored else 'uploads'] += 1
+    
+    variant_urls = {}
+    for filename, content, content_type, width in objects:
+        public_url = bucket.get_public_url(filename)
+        if width is not None:
+            variant_urls[str(width)] = public_url
+    
+    # 가장 큰 변형을 기본 썸네일(thumbnail_url)로 사용
+    return {'filename': filename, 'url': public_url, 'variants': variant_urls}, stored
+
+def get_thumbnail_dedupe_stats():
+    with thumbnail_hash_lock:
+        return dict(thumbnail_hash_stats, indexed=len(thumbnail_hash_index))
+
+class UploadRejected(Exception):
+    """업로드 검증 실패 (메시지를 그대로 status_code 응답으로 돌려줍니다: 크기 초과 413, 그 외 400)"""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+def spool_upload(stream):
+    """업로드 스트림을 청크 단위로 읽어 임시 파일에 저장합니다.
+
+    읽는 동안 크기 제한을 적용하고, 첫 청크로 이미지 형식을 판별하며 SHA-256을 함께 계산합니다.
+    반환값은 (임시 파일, 크기, sha256, (확장자, content-type)) 입니다.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=THUMBNAIL_UPLOAD_CHUNK_SIZE)
+    hasher = hashlib.sha256()
+    size = 0
+    image_type = None
+    head = b''
+    try:
+        while True:
+            chunk = stream.read(THUMBNAIL_UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > THUMBNAIL_MAX_BYTES:
+                raise UploadRejected('File size must be less than 1MB', 413)
+            if image_type is None and len(head) < IMAGE_SNIFF_BYTES:
+                head += chunk[:IMAGE_SNIFF_BYTES]
+                if len(head) >= IMAGE_SNIFF_BYTES:
+                    image_type = sniff_image_type(head)
+                    if image_type is None:
+                        raise UploadRejected('Invalid file type. Only PNG, JPG, GIF, WebP allowed')
+            hasher.update(chunk)
+            spool.write(chunk)
+        
+        if size == 0:
+            raise UploadRejected('No file selected')
+        if image_type is None:
+            image_type = sniff_image_type(head)
+            if image_type is None:
+                raise UploadRejected('Invalid file type. Only PNG, JPG, GIF, WebP allowed')
+    except BaseException:
+        spool.close()
+        raise
+    
+    spool.seek(0)
+    return spool, size, hasher.hexdigest(), image_type
+
+def iter_file_chunks(fileobj, chunk_size=THUMBNAIL_UPLOAD_CHUNK_SIZE):
+    while True:
+        chunk = fileobj.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+def stream_to_storage(filename, fileobj, size, content_type):
+    """임시 파일을 청크 단위로 Storage REST API에 업로드합니다. (전체 내용을 메모리에 올리지 않음)"""
+    storage_key = supabase_service_key or supabase_key
+    response = get_http_session().post(
+        f"{supabase_url}/storage/v1/object/{BUCKET_NAME}/{filename}",
+        content=iter_file_chunks(fileobj),
+        headers={
+            'Authorization': f'Bearer {storage_key}',
+            'apikey': storage_key,
+            'Content-Type': content_type,
+            'Content-Length': str(size),
+            'Cache-Control': f'max-age={THUMBNAIL_CACHE_MAX_AGE}',
+            'x-upsert': 'false',
+        },
+        timeout=30,
+    )
+    if response.status_code >= 400 and not is_duplicate_object_error(response.text):
+        raise Exception(f'Storage upload failed ({response.status_code}): {response.text}')
+
 @app.route('/api/upload-thumbnail', methods=['POST'])
 def upload_thumbnail():
+    """썸네일 업로드
+
+    - 스트리밍 모드: 요청 본문이 이미지 자체인 경우 (Content-Type: image/* 또는 application/octet-stream)
+      본문 수신/형식 판별/해시는 청크 단위로 임시 파일에 기록하면서 처리합니다.
+    - multipart 모드: 기존 폼 업로드 (thumbnail 필드)
+
+    Pillow가 있으면 크기별 변형을 만들기 위해 원본(최대 1MB)을 메모리에서 디코딩/인코딩하므로,
+    Storage까지 원본을 그대로 스트리밍하는 것은 Pillow가 없을 때뿐입니다.
+    """
+    spool = None
     try:
-        if 'thumbnail' not in request.files:
-            return jsonify({'error': 'No file selected'}), 400
+        if request.mimetype == 'multipart/form-data':
+            if 'thumbnail' not in request.files or request.files['thumbnail'].filename == '':
+                return jsonify({'error': 'No file selected'}), 400
+            upload_stream = request.files['thumbnail'].stream
+        else:
+            if request.content_length and request.content_length > THUMBNAIL_MAX_BYTES:
+                return jsonify({'error': 'File size must be less than 1MB'}), 413
+            upload_stream = request.stream
+        
+        try:
+            spool, file_size, file_stem, (file_extension, content_type) = spool_upload(upload_stream)
+        except UploadRejected as rejected:
+            return jsonify({'error': str(rejected)}), rejected.status_code
+        
+        # 같은 이미지는 같은 이름으로 저장 (SHA-256)
+        existing = lookup_thumbnail(file_stem)
+        if existing:
+            logger.debug("썸네일 중복 업로드, 기존 객체 사용: %s", existing['filename'])
+            return jsonify(dict(existing, success=True, deduplicated=True))
         
-        file = request.files['thumbnail']
-        if file.filename == '':
-            return jsonify({'error': 'No file selected'}), 400
+        # 업로드할 객체 목록: [(파일명, 내용, content-type, 너비)]
+        pillow = load_pillow()
+        if pillow is not None:
+            try:
+                variants = build_thumbnail_variants(spool)
+            except (OSError, ValueError, pillow[0].DecompressionBombError) as image_error:
+                logger.warning("이미지 디코딩 실패: %s", image_error)
+                return jsonify({'error': 'Invalid image file'}), 400
+            objects = [
+                (secure_filename(f"{file_stem}-{width}.webp"), content, THUMBNAIL_CONTENT_TYPE, width)
+                for width, content in variants.items()
+            ]
+        else:
+            # Pillow가 없으면 원본을 그대로 저장 (변형 없음, 임시 파일에서 바로 스트리밍)
+            objects = [(secure_filename(f"{file_stem}.{file_extension}"), spool, content_type, None)]
         
-        if file and allowed_file(file.filename):
-            # 파일 크기 체크 (1MB 제한)
-            file.seek(0, 2)  # 파일 끝으로 이동
-            file_size = file.tell()
-            file.seek(0)  # 파일 시작으로 돌아가기
+        try:
+            # Supabase Storage에 파일 업로드 (관리자 권한 사용)
+            storage_client = supabase_admin if supabase_admin else supabase
+            bucket = storage_client.storage.from_(BUCKET_NAME)
             
-            if file_size > 1 * 1024 * 1024:  # 1MB
-                return jsonify({'error': 'File size must be less than 1MB'}), 400
+            result, stored = store_thumbnail_objects(bucket, objects, file_size)
+            remember_thumbnail(file_stem, result)
+            logger.info("썸네일 업로드: %s (기존 객체: %s)", result['url'], stored)
             
-            # 고유한 파일명 생성
-            file_extension = file.filename.rsplit('.', 1)[1].lower()
-            unique_filename = f"{uuid.uuid4().hex}.{file_extension}"
-            filename = secure_filename(unique_filename)
+            return jsonify(dict(result, success=True, deduplicated=stored))
             
-            # Supabase Storage에 업로드
-            file_content = file.read()
+        except Exception as storage_error:
+            logger.error("Supabase Storage 오류: %s", storage_error)
+            return jsonify({'error': f'Storage upload failed: {str(storage_error)}'}), 500
             
+    except RequestEntityTooLarge:
+        # Content-Length 없이(chunked) MAX_CONTENT_LENGTH를 넘긴 본문은 읽는 도중에 발생
+        return jsonify({'error': 'File size must be less than 1MB'}), 413
+    except Exception as e:
+        logger.exception("Error uploading thumbnail: %s", e)
+        return jsonify({'error': 'Failed to upload thumbnail'}), 500
+    finally:
+        if spool is not None:
+            spool.close()
+
+# 썸네일 프록시 (/thumb/<id>/<size>)
+# Storage의 썸네일을 크기별로 디스크에 캐시해 제공하고, 이미지가 없는 카드는 제목으로 SVG 대체 이미지를 만듭니다.
+# 클라이언트는 URL에 썸네일 내용 버전(?v=Storage 파일명의 SHA-256 앞 16자)을 붙이므로 같은 URL의 내용은 바뀌지 않아
+# immutable로 캐시할 수 있습니다. 카드 수정/승인/순서 변경(updated_at)으로는 URL이 바뀌지 않고, 이미지가 바뀔 때만 바뀝니다.
+THUMB_CACHE_DIR = os.getenv('THUMB_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'edutech_thumbs'))
+THUMB_CACHE_MAX_BYTES = int(os.getenv('THUMB_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+THUMB_FETCH_TIMEOUT = 10
+THUMB_FETCH_MAX_BYTES = 5 * 1024 * 1024
+THUMB_CONTENT_TYPES = {
+    'webp': 'image/webp',
+    'svg': 'image/svg+xml',
+    'png': 'image/png',
+    'jpg': 'image/jpeg',
+    'gif': 'image/gif',
+}
+THUMB_IMMUTABLE = 'public, max-age=31536000, immutable'
+THUMB_UNVERSIONED = 'public, max-age=3600'
+LEGACY_PLACEHOLDER_HOST = 'via.placeholder.com'
+THUMB_VERSION_RE = re.compile(r'[0-9a-f]{64}')  # 업로드 파일명 (내용의 SHA-256)
+
+# 디스크 LRU: key -> (경로, content-type, 크기). dict 삽입 순서를 사용 순서로 유지합니다.
+# 워커 프로세스마다 색인을 따로 가지므로 용량 계산은 워커 기준 근사치입니다.
+thumb_cache_index = None
+thumb_cache_lock = threading.Lock()
+thumb_cache_stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'bytes': 0}
+
+def load_thumb_cache_index():
+    """처음 사용할 때 캐시 디렉터리를 훑어 수정 시각 순으로 LRU 색인을 만듭니다. (lock 안에서 호출)"""
+    global thumb_cache_index
+    if thumb_cache_index is not None:
+        return
+    thumb_cache_index = {}
+    os.makedirs(THUMB_CACHE_DIR, exist_ok=True)
+    entries = []
+    for name in os.listdir(THUMB_CACHE_DIR):
+        key, _, extension = name.rpartition('.')
+        if extension not in THUMB_CONTENT_TYPES:
+            continue
+        path = os.path.join(THUMB_CACHE_DIR, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, key, path, THUMB_CONTENT_TYPES[extension], stat.st_size))
+    for _, key, path, content_type, size in sorted(entries):
+        thumb_cache_index[key] = (path, content_type, size)
+        thumb_cache_stats['bytes'] += size
+
+def thumb_cache_get(key):
+    with thumb_cache_lock:
+        load_thumb_cache_index()
+        entry = thumb_cache_index.pop(key, None)
+        if entry and os.path.exists(entry[0]):
+            thumb_cache_index[key] = entry  # 가장 최근 사용으로 이동
+            thumb_cache_stats['hits'] += 1
+            return entry
+        if entry:
+            thumb_cache_stats['bytes'] -= entry[2]  # 다른 워커가 지운 파일
+        thumb_cache_stats['misses'] += 1
+        return None
+
+def thumb_cache_put(key, content, extension):
+    path = os.path.join(THUMB_CACHE_DIR, f"{key}.{extension}")
+    with thumb_cache_lock:
+        load_thumb_cache_index()
+    temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(content)
+    os.replace(temp_path, path)
+    
+    entry = (path, THUMB_CONTENT_TYPES[extension], len(content))
+    with thumb_cache_lock:
+        previous = thumb_cache_index.pop(key, None)
+        if previous:
+            thumb_cache_stats['bytes'] -= previous[2]
+        thumb_cache_index[key] = entry
+        thumb_cache_stats['bytes'] += entry[2]
+        
+        # 용량을 넘으면 가장 오래 쓰지 않은 파일부터 지웁니다.
+        while thumb_cache_stats['bytes'] > THUMB_CACHE_MAX_BYTES and len(thumb_cache_index) > 1:
+            old_key = next(iter(thumb_cache_index))
+            old_path, _, old_size = thumb_cache_index.pop(old_key)
+            thumb_cache_stats['bytes'] -= old_size
+            thumb_cache_stats['evictions'] += 1
             try:
-                # Supabase Storage에 파일 업로드 (관리자 권한 사용)
-                storage_client = supabase_admin if supabase_admin else supabase
-                
-                print(f"업로드 시도: {filename}, 크기: {len(file_content)} bytes")
-                
-                # 파일 업로드
-                upload_result = storage_client.storage.from_(BUCKET_NAME).upload(
-                    path=filename,
-                    file=file_content,
-                    file_options={"content-type": file.content_type}
-                )
-                
-                print(f"업로드 결과 타입: {type(upload_result)}")
-                print(f"업로드 결과: {upload_result}")
-                
-                # 업로드 성공 시 공개 URL 생성
-                public_url = storage_client.storage.from_(BUCKET_NAME).get_public_url(filename)
-                
-                print(f"공개 URL: {public_url}")
-                
-                return jsonify({
-                    'success': True,
-                    'filename': filename,
-                    'url': public_url
-                })
-                
-            except Exception as storage_error:
-                print(f"Supabase Storage 오류: {storage_error}")
-                return jsonify({'error': f'Storage upload failed: {str(storage_error)}'}), 500
-        else:
-            return jsonify({'error': 'Invalid file type. Only PNG, JPG, JPEG, GIF, WebP allowed'}), 400
+                os.remove(old_path)
+            except OSError:
+                pass
+    return entry
+
+def get_thumb_cache_stats():
+    with thumb_cache_lock:
+        return dict(thumb_cache_stats, entries=len(thumb_cache_index or {}), max_bytes=THUMB_CACHE_MAX_BYTES)
+
+def thumb_cache_key(*parts):
+    return hashlib.sha256(':'.join(str(part) for part in parts).encode('utf-8')).hexdigest()[:32]
+
+def render_placeholder_svg(title, width):
+    """제목으로 4:3 SVG 대체 이미지를 만듭니다. (색상은 제목에 따라 고정)"""
+    height = width * 3 // 4
+    font_size = max(10, width // 8)
+    max_chars = max(2, int(width * 0.9 / font_size))
+    text = title if len(title) <= max_chars else title[:max_chars - 1] + '…'
+    hue = int(hashlib.sha256(title.encode('utf-8')).hexdigest()[:4], 16) % 360
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" viewBox="0 0 {width} {height}">'
+        f'<rect width="100%" height="100%" fill="hsl({hue},45%,90%)"/>'
+        f'<text x="50%" y="50%" dominant-baseline="middle" text-anchor="middle" font-family="sans-serif" '
+        f'font-size="{font_size}" fill="hsl({hue},35%,30%)">{html.escape(text)}</text></svg>'
+    ).encode('utf-8')
+
+def placeholder_thumbnail(title, size):
+    """제목별로 캐시되는 대체 이미지 (같은 제목의 카드는 같은 파일을 사용)"""
+    key = 'ph-' + thumb_cache_key(title, size)
+    return thumb_cache_get(key) or thumb_cache_put(key, render_placeholder_svg(title, size), 'svg')
+
+def thumbnail_version(card):
+    """썸네일 내용 버전: thumbnail_url/변형 URL의 SHA-256 파일명 앞 16자 (업로드한 이미지가 아니면 빈 문자열)"""
+    sources = [card.get('thumbnail_url') or ''] + list((card.get('thumbnail_variants') or {}).values())
+    for source in sources:
+        match = THUMB_VERSION_RE.search(str(source))
+        if match:
+            return match.group()[:16]
+    return ''
+
+def is_storage_url(url):
+    return bool(supabase_url) and url.startswith(f"{supabase_url}/storage/v1/object/public/{BUCKET_NAME}/")
+
+def find_thumbnail_card(card_id):
+    # 따뜻한 목록 캐시에 있으면 DB를 조회하지 않습니다.
+    rows = peek_cached_catalog(True)
+    if rows is not None:
+        return next((card for card in rows if card.get('id') == card_id), None)
+    return card_repo.get_card(card_id) if card_repo else None
+
+@timed('storage')
+def fetch_storage_thumbnail(url, size, resize):
+    """Storage에서 썸네일을 받아 (내용, 확장자)를 반환합니다. resize면 요청 너비의 WebP로 줄입니다."""
+    with get_http_session().stream('GET', url, timeout=THUMB_FETCH_TIMEOUT) as response:
+        response.raise_for_status()
+        chunks = []
+        total = 0
+        for chunk in response.iter_bytes():
+            total += len(chunk)
+            if total > THUMB_FETCH_MAX_BYTES:
+                raise ValueError('thumbnail too large')
+            chunks.append(chunk)
+    content = b''.join(chunks)
+    
+    image_type = sniff_image_type(content[:IMAGE_SNIFF_BYTES])
+    if image_type is None:
+        raise ValueError('not an image')
+    if resize and load_pillow() is not None:
+        return next(iter(build_thumbnail_variants(io.BytesIO(content), widths=(size,)).values())), 'webp'
+    return content, image_type[0]
+
+def build_card_thumbnail(card, size):
+    """카드의 썸네일을 (내용, 확장자) 또는 ('redirect', URL)로 반환합니다. 없으면 None"""
+    variants = card.get('thumbnail_variants') or {}
+    widths = sorted(int(width) for width in variants if str(width).isdigit())
+    if widths:
+        # 요청 너비 이상인 가장 작은 변형 (원본이 작으면 가장 큰 변형)
+        fit = next((width for width in widths if width >= size), widths[-1])
+        url = variants[str(fit)]
+        if is_storage_url(url):
+            return fetch_storage_thumbnail(url, size, resize=fit > size)
+    
+    url = card.get('thumbnail_url') or ''
+    if not url or LEGACY_PLACEHOLDER_HOST in url:
+        return None
+    if is_storage_url(url):
+        return fetch_storage_thumbnail(url, size, resize=True)
+    if url.startswith(('http://', 'https://')):
+        # 외부 이미지는 서버에서 받아 오지 않습니다 (임의 URL 요청 방지)
+        return 'redirect', url
+    return None
+
+def thumb_response(entry, etag, cache_control):
+    path, content_type, _ = entry
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = send_file(path, mimetype=content_type, conditional=False, etag=False)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = cache_control
+    return response
+
+@app.route('/thumb/<int:card_id>/<int:size>')
+def thumbnail_proxy(card_id, size):
+    if size not in THUMBNAIL_WIDTHS:
+        return jsonify({'error': f'size must be one of {list(THUMBNAIL_WIDTHS)}'}), 404
+    
+    requested_version = request.args.get('v', '')
+    force_placeholder = request.args.get('placeholder') == '1'
+    
+    # 디스크 캐시에는 카드에서 계산한 버전으로만 저장하므로, 요청 버전으로 찾은 항목은 그 내용이 맞음 (카드 조회 불필요)
+    if requested_version and not force_placeholder:
+        key = thumb_cache_key(card_id, size, requested_version)
+        entry = thumb_cache_get(key)
+        if entry:
+            return thumb_response(entry, key, THUMB_IMMUTABLE)
+    
+    card = find_thumbnail_card(card_id)
+    if not card:
+        return jsonify({'error': 'Card not found'}), 404
+    
+    # 요청 버전이 현재 내용과 다르면 (오래된 목록, 임의 값) immutable로 캐시하지 않음
+    version = thumbnail_version(card)
+    cache_control = THUMB_IMMUTABLE if version and requested_version == version and not force_placeholder else THUMB_UNVERSIONED
+    key = thumb_cache_key(card_id, size, version or card.get('thumbnail_url') or '')
+    entry = None if force_placeholder else thumb_cache_get(key)
+    if entry:
+        return thumb_response(entry, key, cache_control)
+    
+    title = card.get('webpage_name') or ''
+    if not force_placeholder:
+        try:
+            thumbnail = build_card_thumbnail(card, size)
+        except Exception as e:
+            # Storage 오류는 대체 이미지로 응답하되 짧게만 캐시합니다.
+            logger.warning("썸네일 프록시 오류 (card %s): %s", card_id, e)
+            return thumb_response(placeholder_thumbnail(title, size), 'ph-' + thumb_cache_key(title, size), 'no-cache')
+        if thumbnail and thumbnail[0] == 'redirect':
+            return Response(status=302, headers={'Location': thumbnail[1], 'Cache-Control': THUMB_UNVERSIONED})
+        if thumbnail:
+            return thumb_response(thumb_cache_put(key, *thumbnail), key, cache_control)
+    
+    return thumb_response(placeholder_thumbnail(title, size), 'ph-' + thumb_cache_key(title, size), cache_control)
+
+# 카드 내보내기 (Excel/CSV/JSON Lines)
+# 전체 목록을 메모리에 올리지 않고 keyset 페이지 단위로 읽어 바로 기록합니다.
+EXPORT_PAGE_SIZE = 500
+EXPORT_CHUNK_SIZE = 64 * 1024
+EXPORT_HEADERS = [
+    'ID', '웹페이지 이름', 'URL', '간단 요약', '유용한 교과목',
+    '키워드', '교육적 의미', '생성일', '수정일', '정렬순서'
+]
+EXPORT_FORMATS = {
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx'),
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'jsonl': ('application/x-ndjson; charset=utf-8', 'jsonl'),
+}
+EXPORT_MAX_COLUMN_WIDTH = 50
+
+# 배열 필드를 안전하게 처리하는 함수
+def safe_join(value):
+    try:
+        if value is None:
+            return ''
             
+        # 문자열인 경우 먼저 처리
+        if isinstance(value, str):
+            return value.strip()
+        
+        # 리스트, 튜플 등 순회 가능한 객체인지 확인
+        try:
+            # hasattr로 __iter__ 확인하고 string은 제외
+            if hasattr(value, '__iter__') and not isinstance(value, (str, bytes)):
+                # 실제로 순회해서 확인
+                filtered_items = []
+                for item in value:
+                    if item is not None:
+                        item_str = str(item).strip()
+                        if item_str:  # 빈 문자열이 아닌 경우만 추가
+                            filtered_items.append(item_str)
+                return ', '.join(filtered_items)
+        except TypeError:
+            # 순회 불가능한 객체인 경우
+            pass
+        
+        # 기타 타입은 문자열로 변환
+        return str(value).strip() if value else ''
+        
     except Exception as e:
-        print(f"Error uploading thumbnail: {e}")
-        return jsonify({'error': 'Failed to upload thumbnail'}), 500
+        logger.warning("safe_join 오류: %s, value: %r", e, value)
+        return ''
+
+def export_row_values(card):
+    """카드 하나를 EXPORT_HEADERS 순서의 값 목록으로 변환합니다."""
+    return [
+        card.get('id'),
+        card.get('webpage_name', ''),
+        card.get('url', ''),
+        card.get('user_summary', ''),
+        safe_join(card.get('useful_subjects')),
+        safe_join(card.get('keyword')),
+        card.get('educational_meaning', ''),
+        card.get('created_at', ''),
+        card.get('updated_at', ''),
+        card.get('sort_order', ''),
+    ]
+
+def iter_export_pages(first_page=None, first_has_more=True):
+    """승인된 카드를 keyset 페이지 단위로 순회합니다."""
+    page, has_more = first_page, first_has_more
+    if page is None:
+        page, _, has_more = fetch_card_page(False, EXPORT_PAGE_SIZE, with_total=False)
+    while page:
+        yield page
+        if not has_more:
+            break
+        last = page[-1]
+        cursor = (last.get('sort_order'), last.get('created_at'), last.get('id'))
+        page, _, has_more = fetch_card_page(False, EXPORT_PAGE_SIZE, cursor=cursor, with_total=False)
+
+@timed('xlsx')
+def write_xlsx_export(fileobj, pages):
+    """openpyxl write-only 모드로 행을 기록합니다. (셀 객체를 메모리에 유지하지 않음)
+
+    write-only 모드는 첫 행을 쓰기 전에 열 너비(<cols>)를 기록하므로 행을 쓴 뒤에는 너비를 바꿀 수 없습니다.
+    그래서 페이지를 읽으면서 행을 임시 파일(JSON Lines)에 옮기고 열마다 최대 너비를 구한 뒤 워크북을 씁니다.
+    (DB는 한 번만 읽고, 메모리에는 한 페이지만 유지)
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font, PatternFill, Alignment
+    from openpyxl.utils import get_column_letter
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("에듀테크 카드")
+
+    # 헤더 스타일
+    header_font = Font(bold=True, color="FFFFFF")
+    header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+    header_alignment = Alignment(horizontal="center", vertical="center")
+
+    widths = [len(header) for header in EXPORT_HEADERS]
+    with tempfile.TemporaryFile(mode='w+', encoding='utf-8') as spool:
+        for page in pages:
+            for card in page:
+                try:
+                    values = export_row_values(card)
+                except Exception as row_error:
+                    # 오류가 발생한 행은 건너뛰고 계속 진행
+                    logger.warning("Row 처리 오류: %s, card id: %s", row_error, card.get('id'))
+                    continue
+                for index, value in enumerate(values):
+                    widths[index] = max(widths[index], len(str(value)) if value is not None else 0)
+                spool.write(json.dumps(values, ensure_ascii=False, default=str) + '\n')
+
+        for index, width in enumerate(widths, 1):
+            ws.column_dimensions[get_column_letter(index)].width = min(width + 2, EXPORT_MAX_COLUMN_WIDTH)
+
+        header_cells = []
+        for header in EXPORT_HEADERS:
+            cell = WriteOnlyCell(ws, value=header)
+            cell.font = header_font
+            cell.fill = header_fill
+            cell.alignment = header_alignment
+            header_cells.append(cell)
+        ws.append(header_cells)
+
+        spool.seek(0)
+        for line in spool:
+            ws.append(json.loads(line))
+
+    wb.save(fileobj)
+
+def stream_xlsx_export(pages):
+    """xlsx는 zip 형식이라 끝까지 써야 완성되므로 임시 파일에 기록한 뒤 조각 단위로 전송합니다."""
+    output = tempfile.TemporaryFile()
+    try:
+        write_xlsx_export(output, pages)
+        output.seek(0)
+        while True:
+            chunk = output.read(EXPORT_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        output.close()
 
-# Excel 다운로드 엔드포인트
+def stream_csv_export(pages):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # Excel에서 한글이 깨지지 않도록 BOM 추가
+    yield '\ufeff'.encode('utf-8')
+    writer.writerow(EXPORT_HEADERS)
+    for page in pages:
+        for card in page:
+            writer.writerow(['' if value is None else value for value in export_row_values(card)])
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate(0)
+    yield buffer.getvalue().encode('utf-8')
+
+def stream_jsonl_export(pages):
+    for page in pages:
+        yield ''.join(json.dumps(card, ensure_ascii=False, default=str) + '\n' for card in page).encode('utf-8')
+
+EXPORT_STREAMERS = {
+    'xlsx': stream_xlsx_export,
+    'csv': stream_csv_export,
+    'jsonl': stream_jsonl_export,
+}
+
+# Excel 다운로드 엔드포인트 (format: xlsx | csv | jsonl)
 @app.route('/api/download-excel', methods=['POST'])
 def download_excel():
     try:
-        if not supabase:
+        if not card_repo:
             return jsonify({'error': 'Database not configured'}), 500
             
         data = request.json or {}
         password = data.get('password', '')
+        export_format = data.get('format', 'xlsx')
         
         # 비밀번호 확인 (관리자 비밀번호 사용)
         ADMIN_PASSWORD = "admin"
@@ -427,172 +3155,568 @@ def download_excel():
         if password != ADMIN_PASSWORD:
             return jsonify({'error': '비밀번호가 일치하지 않습니다'}), 401
         
-        # 모든 visible 카드 데이터 가져오기
-        result = supabase.table('edutech_cards').select('*').eq('view', 1).order('sort_order', desc=False).order('created_at', desc=True).execute()
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({'error': f'지원하지 않는 형식입니다: {export_format}'}), 400
         
-        if not result.data:
+        # 첫 페이지를 미리 읽어 데이터가 없으면 스트리밍을 시작하기 전에 404 응답
+        first_page, _, has_more = fetch_card_page(False, EXPORT_PAGE_SIZE, with_total=False)
+        if not first_page:
             return jsonify({'error': '다운로드할 데이터가 없습니다'}), 404
         
-        # Excel 파일 생성
-        from openpyxl import Workbook
-        from openpyxl.styles import Font, PatternFill, Alignment
-        from flask import Response
-        import io
-        
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "에듀테크 카드"
-        
-        # 헤더 설정
-        headers = [
-            'ID', '웹페이지 이름', 'URL', '간단 요약', '유용한 교과목', 
-            '키워드', '교육적 의미', '생성일', '수정일', '정렬순서'
-        ]
-        
-        # 헤더 스타일
-        header_font = Font(bold=True, color="FFFFFF")
-        header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        header_alignment = Alignment(horizontal="center", vertical="center")
-        
-        # 헤더 작성
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = header_alignment
+        content_type, extension = EXPORT_FORMATS[export_format]
+        pages = iter_export_pages(first_page, has_more)
+        body = EXPORT_STREAMERS[export_format](pages)
+        
+        return Response(
+            stream_with_context(body),
+            headers={
+                'Content-Type': content_type,
+                'Content-Disposition': f'attachment; filename=edutech_cards_{datetime.now().strftime("%Y%m%d")}.{extension}'
+            }
+        )
+        
+    except Exception as e:
+        logger.exception("Excel 다운로드 오류: %s", e)
+        return jsonify({'error': 'Excel 다운로드 중 오류가 발생했습니다'}), 500
+
+# 백그라운드 내보내기 작업
+# 내보내기 파일은 워커 스레드에서 만들고, DB에서 읽은 카탈로그 버전(승인된 카드 수 + 최근 updated_at)과 형식을 키로
+# 디스크에 캐시합니다. 버전을 먼저 읽고 작업이 그 뒤에 페이지를 읽으므로 파일 내용은 항상 키의 버전 이후 상태입니다.
+# 작업 정보와 결과 파일이 모두 디스크에 있으므로 어느 gunicorn 워커로 요청이 가도 조회/다운로드할 수 있습니다.
+EXPORT_CACHE_DIR = os.getenv('EXPORT_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'edutech_exports'))
+EXPORT_CACHE_MAX_AGE = int(os.getenv('EXPORT_CACHE_MAX_AGE', str(24 * 60 * 60)))  # 초
+EXPORT_BUILD_TIMEOUT = 600  # 이 시간보다 오래된 진행 표시는 중단된 작업으로 간주
+EXPORT_WORKERS = int(os.getenv('EXPORT_WORKERS', '1'))
+
+def create_export_executor():
+    """내보내기 작업용 스레드 풀을 만듭니다.
+
+    gevent 워커(wsgi_gevent.py)에서는 threading이 greenlet으로 바뀌어 openpyxl 작업이
+    이벤트 루프를 막으므로 gevent의 실제 OS 스레드 풀을 사용합니다.
+    """
+    max_workers = EXPORT_WORKERS
+    # wsgi_gevent.py가 먼저 패치하므로 gevent가 이미 import된 경우만 확인 (불필요한 gevent import 방지)
+    monkey = sys.modules.get('gevent.monkey')
+    if monkey is not None and monkey.is_module_patched('threading'):
+        from gevent.threadpool import ThreadPoolExecutor as GeventThreadPoolExecutor
+        return GeventThreadPoolExecutor(max_workers=max_workers)
+    return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='export')
+
+export_executor = create_export_executor()
+
+def export_path(name):
+    return os.path.join(EXPORT_CACHE_DIR, name)
+
+def write_json_atomic(path, data):
+    temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(temp_path, path)
+
+def read_json_file(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def export_artifact_name(key, export_format):
+    return f"{key}.{EXPORT_FORMATS[export_format][1]}"
+
+def build_export_artifact(key, export_format):
+    """내보내기 파일을 만들어 캐시 디렉토리에 저장합니다. (export_executor에서 실행)"""
+    artifact_path = export_path(export_artifact_name(key, export_format))
+    building_path = export_path(f"{key}.building")
+    error_path = export_path(f"{key}.error")
+    temp_path = f"{artifact_path}.{uuid.uuid4().hex}.tmp"
+    started = time.perf_counter()
+    with metrics_lock:
+        worker_stats['exports_queued'] -= 1
+        worker_stats['exports_running'] += 1
+    try:
+        with open(temp_path, 'wb') as output:
+            if export_format == 'xlsx':
+                write_xlsx_export(output, iter_export_pages())
+            else:
+                for chunk in EXPORT_STREAMERS[export_format](iter_export_pages()):
+                    output.write(chunk)
+        os.replace(temp_path, artifact_path)
+        logger.info(f"내보내기 파일 생성 완료: {artifact_path} ({time.perf_counter() - started:.2f}s)")
+    except Exception as e:
+        logger.error(f"내보내기 파일 생성 실패: {e}")
+        write_json_atomic(error_path, {'error': str(e), 'failed_at': time.time()})
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    finally:
+        if os.path.exists(building_path):
+            os.remove(building_path)
+        with metrics_lock:
+            worker_stats['exports_running'] -= 1
+
+def prune_export_cache():
+    """EXPORT_CACHE_MAX_AGE보다 오래된 작업 정보와 파일을 삭제합니다."""
+    cutoff = time.time() - EXPORT_CACHE_MAX_AGE
+    for name in os.listdir(EXPORT_CACHE_DIR):
+        path = export_path(name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
+
+def get_export_job_status(job):
+    """작업 키에 해당하는 파일 상태로 작업 상태를 계산합니다."""
+    key, export_format = job['key'], job['format']
+    artifact_path = export_path(export_artifact_name(key, export_format))
+    if os.path.exists(artifact_path):
+        return {'status': 'done', 'size': os.path.getsize(artifact_path)}
+    error = read_json_file(export_path(f"{key}.error"))
+    if error:
+        return {'status': 'failed', 'error': error.get('error')}
+    building_path = export_path(f"{key}.building")
+    if os.path.exists(building_path):
+        if time.time() - os.path.getmtime(building_path) > EXPORT_BUILD_TIMEOUT:
+            return {'status': 'failed', 'error': 'export timed out'}
+        return {'status': 'running'}
+    return {'status': 'failed', 'error': 'export was interrupted'}
+
+def export_job_response(job, status_code=200):
+    status = get_export_job_status(job)
+    body = {
+        'job_id': job['job_id'],
+        'format': job['format'],
+        'catalog_version': job['key'].split('-', 1)[1],
+        'created_at': job['created_at'],
+        **status,
+    }
+    if status['status'] == 'done':
+        body['download_url'] = f"/api/export-jobs/{job['job_id']}/download"
+    return jsonify(body), status_code
+
+@app.route('/api/export-jobs', methods=['POST'])
+def create_export_job():
+    try:
+        if not card_repo:
+            return jsonify({'error': 'Database not configured'}), 500
+        
+        data = request.json or {}
+        password = data.get('password', '')
+        export_format = data.get('format', 'xlsx')
+        
+        # 비밀번호 확인 (관리자 비밀번호 사용)
+        ADMIN_PASSWORD = "admin"
         
-        # 배열 필드를 안전하게 처리하는 함수
-        def safe_join(value):
+        if password != ADMIN_PASSWORD:
+            return jsonify({'error': '비밀번호가 일치하지 않습니다'}), 401
+        
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({'error': f'지원하지 않는 형식입니다: {export_format}'}), 400
+        
+        os.makedirs(EXPORT_CACHE_DIR, exist_ok=True)
+        prune_export_cache()
+        
+        # 승인된 카드 목록의 버전이 같으면 같은 파일을 재사용 (워커 캐시가 아니라 DB에서 바로 읽은 버전)
+        count, max_updated_at = card_repo.catalog_version()
+        key = f"{export_format}-{count}-{re.sub(r'[^0-9A-Za-z]', '', max_updated_at)}"
+        
+        job = {
+            'job_id': uuid.uuid4().hex,
+            'key': key,
+            'format': export_format,
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+        }
+        write_json_atomic(export_path(f"job-{job['job_id']}.json"), job)
+        
+        artifact_path = export_path(export_artifact_name(key, export_format))
+        building_path = export_path(f"{key}.building")
+        if os.path.exists(artifact_path):
+            return export_job_response(job, 200)
+        
+        # 같은 버전을 다른 요청이 이미 만들고 있으면 그 결과를 기다림
+        building_is_fresh = (os.path.exists(building_path)
+                             and time.time() - os.path.getmtime(building_path) <= EXPORT_BUILD_TIMEOUT)
+        if not building_is_fresh:
+            error_path = export_path(f"{key}.error")
+            if os.path.exists(error_path):
+                os.remove(error_path)
+            with open(building_path, 'w') as f:
+                f.write(job['job_id'])
+            with metrics_lock:
+                worker_stats['exports_queued'] += 1
+            export_executor.submit(build_export_artifact, key, export_format)
+        
+        return export_job_response(job, 202)
+        
+    except Exception as e:
+        logger.exception("내보내기 작업 생성 오류: %s", e)
+        return jsonify({'error': '내보내기 작업을 시작하지 못했습니다'}), 500
+
+@app.route('/api/export-jobs/<job_id>', methods=['GET'])
+def export_job_status(job_id):
+    job = read_json_file(export_path(f"job-{secure_filename(job_id)}.json"))
+    if not job:
+        return jsonify({'error': 'Export job not found'}), 404
+    return export_job_response(job)
+
+@app.route('/api/export-jobs/<job_id>/download', methods=['GET'])
+def download_export_job(job_id):
+    job = read_json_file(export_path(f"job-{secure_filename(job_id)}.json"))
+    if not job:
+        return jsonify({'error': 'Export job not found'}), 404
+    
+    artifact_path = export_path(export_artifact_name(job['key'], job['format']))
+    if not os.path.exists(artifact_path):
+        return jsonify({'error': '내보내기 파일이 아직 준비되지 않았습니다'}), 409
+    
+    content_type, extension = EXPORT_FORMATS[job['format']]
+    return send_file(
+        artifact_path,
+        mimetype=content_type,
+        as_attachment=True,
+        download_name=f'edutech_cards_{datetime.now().strftime("%Y%m%d")}.{extension}',
+        max_age=0,
+    )
+
+# 카드 가져오기 (Excel/CSV/JSON Lines)
+# 내보내기와 같은 열 구성(EXPORT_HEADERS, JSON Lines는 카드 필드 이름)의 파일을 한 행씩 읽어
+# URL을 정규화해 메모리에서 중복을 걸러낸 뒤 IMPORT_BATCH_SIZE개씩 url 기준 upsert 한 번으로 기록합니다.
+# 배치마다 DB에서 기존 URL을 조회해 추가/수정을 나누고, 이미 등록된 카드는 내용만 수정하므로 view와 순서는 그대로 유지됩니다.
+IMPORT_BATCH_SIZE = 500
+IMPORT_LOOKUP_CHUNK = 100  # 배치의 기존 URL 조회 한 번에 넣는 URL 수 (Supabase in.() 필터가 URL에 들어감)
+IMPORT_MAX_REPORTED_SKIPS = 100  # 보고서에 행 번호와 사유를 남길 건너뛴 행 수
+IMPORT_FIELDS = {  # 열 이름 -> 카드 필드 (ID, 생성일, 수정일 열은 무시)
+    '웹페이지 이름': 'webpage_name',
+    'URL': 'url',
+    '간단 요약': 'user_summary',
+    '유용한 교과목': 'useful_subjects',
+    '키워드': 'keyword',
+    '교육적 의미': 'educational_meaning',
+    '정렬순서': 'sort_order',
+}
+IMPORT_FIELDS.update({field: field for field in list(IMPORT_FIELDS.values())})  # 카드 필드 이름 열도 허용
+
+class ImportFormatError(ValueError):
+    """가져올 파일을 읽을 수 없는 경우 (헤더 없음, 형식 오류)"""
+
+def map_import_rows(rows):
+    """첫 행을 헤더로 보고 나머지 행을 (행 번호, {카드 필드: 값})으로 바꿉니다."""
+    columns = None
+    for row_number, values in enumerate(rows, 1):
+        if columns is None:
+            columns = [IMPORT_FIELDS.get(str(value).strip()) if value is not None else None for value in values]
+            if 'url' not in columns:
+                raise ImportFormatError('URL 열이 없습니다 (내보내기 파일과 같은 헤더가 필요합니다)')
+            continue
+        if all(value is None or value == '' for value in values):
+            continue
+        yield row_number, {field: value for field, value in zip(columns, values) if field}
+
+def iter_import_records(fileobj, import_format):
+    """파일을 한 행씩 읽어 (행 번호, {카드 필드: 값}) 를 반환합니다. 읽을 수 없는 JSON 행은 값이 None"""
+    try:
+        if import_format == 'xlsx':
+            # read-only 모드: 시트 전체를 메모리에 올리지 않고 행 단위로 읽음
+            from openpyxl import load_workbook
+            workbook = load_workbook(fileobj, read_only=True, data_only=True)
             try:
-                print(f"safe_join 처리 중 - value: {value}, type: {type(value)}, repr: {repr(value)}")
-                
-                if value is None:
-                    return ''
-                    
-                # 문자열인 경우 먼저 처리
-                if isinstance(value, str):
-                    return value.strip()
-                
-                # 리스트, 튜플 등 순회 가능한 객체인지 확인
+                yield from map_import_rows(workbook.worksheets[0].iter_rows(values_only=True))
+            finally:
+                workbook.close()
+        elif import_format == 'csv':
+            yield from map_import_rows(csv.reader(io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')))
+        elif import_format == 'jsonl':
+            for line_number, line in enumerate(io.TextIOWrapper(fileobj, encoding='utf-8-sig'), 1):
+                if not line.strip():
+                    continue
                 try:
-                    # hasattr로 __iter__ 확인하고 string은 제외
-                    if hasattr(value, '__iter__') and not isinstance(value, (str, bytes)):
-                        # 실제로 순회해서 확인
-                        filtered_items = []
-                        for item in value:
-                            if item is not None:
-                                item_str = str(item).strip()
-                                if item_str:  # 빈 문자열이 아닌 경우만 추가
-                                    filtered_items.append(item_str)
-                        return ', '.join(filtered_items)
-                except TypeError:
-                    # 순회 불가능한 객체인 경우
-                    pass
-                
-                # 기타 타입은 문자열로 변환
-                return str(value).strip() if value else ''
-                
-            except Exception as e:
-                print(f"safe_join 오류: {e}, value: {value}, type: {type(value)}")
-                return ''
-        
-        # 첫 번째 카드의 데이터 구조 디버깅
-        if result.data:
-            first_card = result.data[0]
-            print(f"첫 번째 카드 디버깅:")
-            print(f"  - useful_subjects: {first_card.get('useful_subjects')} (type: {type(first_card.get('useful_subjects'))})")
-            print(f"  - keyword: {first_card.get('keyword')} (type: {type(first_card.get('keyword'))})")
-            print(f"  - 전체 키: {first_card.keys()}")
-        
-        # 데이터 작성
-        for row, card in enumerate(result.data, 2):
+                    record = json.loads(line)
+                except ValueError:
+                    record = None
+                if isinstance(record, dict):
+                    record = {IMPORT_FIELDS[key]: value for key, value in record.items() if key in IMPORT_FIELDS}
+                yield line_number, record if isinstance(record, dict) else None
+        else:
+            raise ImportFormatError(f'지원하지 않는 형식입니다: {import_format}')
+    except ImportFormatError:
+        raise
+    except Exception as e:
+        raise ImportFormatError(f'{import_format} 파일을 읽을 수 없습니다: {e}') from e
+
+def import_card_values(record):
+    """가져온 행을 카드 필드로 정리합니다. 필수 값이 없거나 값이 올바르지 않으면 ValueError"""
+    card = {}
+    for field in ('url', 'webpage_name', 'user_summary', 'educational_meaning'):
+        value = record.get(field)
+        card[field] = '' if value is None else str(value).strip()
+    for field in ('useful_subjects', 'keyword'):
+        value = record.get(field)
+        if isinstance(value, str):
+            value = value.split(',')  # 내보내기는 ', '로 이어 붙임
+        elif not isinstance(value, (list, tuple)):
+            value = [] if value is None else [value]
+        card[field] = [str(item).strip() for item in value if item is not None and str(item).strip()]
+    sort_order = record.get('sort_order')
+    if sort_order is not None and sort_order != '':
+        try:
+            card['sort_order'] = float(sort_order)
+        except (TypeError, ValueError):
+            raise ValueError('정렬순서가 숫자가 아닙니다')
+    if not card['url'] or not card['webpage_name']:
+        raise ValueError('URL과 웹페이지 이름이 필요합니다')
+    return card
+
+def import_cards(records, on_duplicate='update', view=1):
+    """행들을 정리/중복 제거해 배치 upsert로 기록하고 결과 보고서를 반환합니다.
+
+    on_duplicate: 이미 등록된 URL을 'update'(내용 수정) 또는 'skip'(건너뜀)
+    view: 새로 추가되는 카드의 승인 상태 (1 승인, 0 대기)
+    보고서: {rows, inserted, updated, skipped, batches, skipped_rows: [{row, reason}], elapsed_ms}
+    파일을 읽다가 실패하면 ImportFormatError (이미 기록한 배치는 유지)
+
+    추가/수정 구분은 배치마다 DB에서 url IN (...)으로 다시 확인해 정합니다.
+    워커별 URL 색인(다른 워커의 쓰기는 최대 CARD_CACHE_TTL 지연)은 정규화된 같은 URL을 저장된 URL로 맞추는 데만 씁니다.
+    """
+    started = time.perf_counter()
+    report = {'rows': 0, 'inserted': 0, 'updated': 0, 'skipped': 0, 'batches': 0, 'skipped_rows': []}
+    pending = []  # (행 번호, 카드)
+    seen_urls = set()
+
+    def skip(row_number, reason):
+        report['skipped'] += 1
+        if len(report['skipped_rows']) < IMPORT_MAX_REPORTED_SKIPS:
+            report['skipped_rows'].append({'row': row_number, 'reason': reason})
+
+    def write(kind, batch):
+        # 새 카드는 ON CONFLICT DO NOTHING: 조회 뒤 다른 요청이 같은 URL을 먼저 등록해도 그 카드를 덮어쓰지 않음
+        written = card_repo.upsert_cards([card for _, card in batch], ignore_duplicates=(kind == 'inserted'))
+        report['batches'] += 1
+        report[kind] += len(written)
+        if kind == 'inserted' and len(written) < len(batch):
+            written_urls = {card['url'] for card in written}
+            for row_number, card in batch:
+                if card['url'] not in written_urls:
+                    skip(row_number, '가져오는 중 다른 요청이 먼저 등록한 URL')
+        for card in written:
+            search_index_upsert(card)
+            url_index_upsert(card)
+        if written:
+            publish_card_event('created' if kind == 'inserted' else 'updated', [card['id'] for card in written])
+
+    def flush():
+        if not pending:
+            return
+        urls = [card['url'] for _, card in pending]
+        existing_urls = set()
+        for start in range(0, len(urls), IMPORT_LOOKUP_CHUNK):
+            existing_urls.update(card['url'] for card in card_repo.get_cards_by_url(urls[start:start + IMPORT_LOOKUP_CHUNK], 'url'))
+
+        batches = {'inserted': [], 'updated': []}
+        head_order = None
+        for row_number, card in pending:
+            if card['url'] in existing_urls:
+                if on_duplicate == 'skip':
+                    skip(row_number, '이미 등록된 URL')
+                    continue
+                # 기존 카드의 승인 상태/순서는 유지 (같은 배치의 행은 같은 필드를 가져야 하므로 순서는 모두 제외)
+                card.pop('sort_order', None)
+                batches['updated'].append((row_number, card))
+            else:
+                if 'sort_order' not in card:
+                    # 새 카드는 POST /api/cards와 같이 맨 앞에 배치 (배치마다 한 번만 조회)
+                    if head_order is None:
+                        head_order = new_card_sort_order()
+                    card['sort_order'] = head_order
+                card['view'] = view
+                batches['inserted'].append((row_number, card))
+        pending.clear()
+        for kind, batch in batches.items():
+            if batch:
+                write(kind, batch)
+
+    ensure_url_index()
+    try:
+        for row_number, record in records:
+            report['rows'] += 1
+            if record is None:
+                skip(row_number, '행을 읽을 수 없습니다')
+                continue
             try:
-                ws.cell(row=row, column=1, value=card.get('id'))
-                ws.cell(row=row, column=2, value=card.get('webpage_name', ''))
-                ws.cell(row=row, column=3, value=card.get('url', ''))
-                ws.cell(row=row, column=4, value=card.get('user_summary', ''))
-                
-                # 안전하게 배열 필드 처리 - 직접 구현
-                useful_subjects = card.get('useful_subjects')
-                if useful_subjects is None:
-                    subjects_str = ''
-                elif isinstance(useful_subjects, str):
-                    subjects_str = useful_subjects
-                elif hasattr(useful_subjects, '__len__') and len(useful_subjects) > 0:
-                    try:
-                        subjects_str = ', '.join([str(x) for x in useful_subjects if x])
-                    except:
-                        subjects_str = str(useful_subjects)
-                else:
-                    subjects_str = str(useful_subjects) if useful_subjects else ''
-                ws.cell(row=row, column=5, value=subjects_str)
-                
-                keyword = card.get('keyword')
-                if keyword is None:
-                    keyword_str = ''
-                elif isinstance(keyword, str):
-                    keyword_str = keyword
-                elif hasattr(keyword, '__len__') and len(keyword) > 0:
-                    try:
-                        keyword_str = ', '.join([str(x) for x in keyword if x])
-                    except:
-                        keyword_str = str(keyword)
-                else:
-                    keyword_str = str(keyword) if keyword else ''
-                ws.cell(row=row, column=6, value=keyword_str)
-                
-                ws.cell(row=row, column=7, value=card.get('educational_meaning', ''))
-                ws.cell(row=row, column=8, value=card.get('created_at', ''))
-                ws.cell(row=row, column=9, value=card.get('updated_at', ''))
-                ws.cell(row=row, column=10, value=card.get('sort_order', ''))
-            except Exception as row_error:
-                print(f"Row {row} 처리 오류: {row_error}")
-                print(f"Card data: {card}")
-                # 오류가 발생한 행은 건너뛰고 계속 진행
+                card = import_card_values(record)
+            except ValueError as e:
+                skip(row_number, str(e))
+                continue
+            try:
+                normalized_url, _ = normalize_url(card['url'])
+            except ValueError:
+                skip(row_number, 'URL 형식이 올바르지 않습니다')
+                continue
+            if normalized_url in seen_urls:
+                skip(row_number, '파일 안에서 중복된 URL')
                 continue
+            seen_urls.add(normalized_url)
+
+            with url_index_lock:
+                existing_ids = url_index['urls'].get(normalized_url)
+                existing = url_index['cards'].get(min(existing_ids)) if existing_ids else None
+            if existing:
+                # 표기만 다른 같은 URL이면 저장된 URL로 맞춰 url 충돌로 찾아지게 함 (추가/수정 판단은 flush에서 DB로)
+                card['url'] = existing['url']
+            pending.append((row_number, card))
+            if len(pending) >= IMPORT_BATCH_SIZE:
+                flush()
+        flush()
+    finally:
+        if report['inserted'] or report['updated']:
+            invalidate_card_cache('cards imported')
+
+    report['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 2)
+    logger.info("카드 가져오기: %d행 중 추가 %d, 수정 %d, 건너뜀 %d (%d개 배치, %sms)", report['rows'],
+                report['inserted'], report['updated'], report['skipped'], report['batches'], report['elapsed_ms'])
+    return report
+
+# 카드 가져오기 엔드포인트 (multipart: file, password, format, on_duplicate, view)
+@app.route('/api/cards/import', methods=['POST'])
+def import_card_file():
+    try:
+        if not card_repo:
+            return jsonify({'error': 'Database not configured'}), 500
         
-        # 열 너비 자동 조정
-        for column in ws.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)
-            ws.column_dimensions[column_letter].width = adjusted_width
-        
-        # 바이너리 데이터로 변환
-        output = io.BytesIO()
-        wb.save(output)
-        output.seek(0)
+        password = request.form.get('password', '')
         
-        response = Response(
-            output.getvalue(),
-            headers={
-                'Content-Type': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-                'Content-Disposition': f'attachment; filename=edutech_cards_{datetime.now().strftime("%Y%m%d")}.xlsx'
-            }
-        )
-        return response
+        # 비밀번호 확인 (관리자 비밀번호 사용)
+        ADMIN_PASSWORD = "admin"
+        
+        if password != ADMIN_PASSWORD:
+            return jsonify({'error': '비밀번호가 일치하지 않습니다'}), 401
+        
+        upload = request.files.get('file')
+        if not upload or not upload.filename:
+            return jsonify({'error': '가져올 파일이 필요합니다'}), 400
+        
+        # 형식을 지정하지 않으면 파일 확장자로 판단
+        import_format = request.form.get('format') or upload.filename.rsplit('.', 1)[-1].lower()
+        if import_format not in EXPORT_FORMATS:
+            return jsonify({'error': f'지원하지 않는 형식입니다: {import_format}'}), 400
+        on_duplicate = request.form.get('on_duplicate', 'update')
+        if on_duplicate not in ('update', 'skip'):
+            return jsonify({'error': 'on_duplicate는 update 또는 skip이어야 합니다'}), 400
+        view = request.form.get('view', '1')
+        if view not in ('0', '1'):
+            return jsonify({'error': 'view는 0(대기) 또는 1(승인)이어야 합니다'}), 400
+        
+        try:
+            report = import_cards(iter_import_records(upload.stream, import_format), on_duplicate, int(view))
+        except ImportFormatError as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify(report)
         
     except Exception as e:
-        print(f"Excel 다운로드 오류: {e}")
-        import traceback
-        traceback.print_exc()
-        return jsonify({'error': 'Excel 다운로드 중 오류가 발생했습니다'}), 500
+        logger.exception("카드 가져오기 오류: %s", e)
+        return jsonify({'error': '카드 가져오기 중 오류가 발생했습니다'}), 500
+
+# 카드 순서 계산 (희소/소수 정렬)
+# 새 순서에서 기존 sort_order가 이미 증가하는 가장 긴 부분 수열(LIS)은 그대로 두고,
+# 나머지 카드만 이웃 값 사이의 소수 값으로 옮깁니다. 카드 하나를 옮기면 한 행만 바뀝니다.
+SORT_ORDER_MIN_GAP = 1e-9
+
+def longest_increasing_positions(values):
+    """values에서 순증가하는 가장 긴 부분 수열의 위치 집합을 반환합니다."""
+    tails = []          # 길이별 마지막 값의 위치
+    previous = [-1] * len(values)
+    for index, value in enumerate(values):
+        low, high = 0, len(tails)
+        while low < high:
+            middle = (low + high) // 2
+            if values[tails[middle]] < value:
+                low = middle + 1
+            else:
+                high = middle
+        if low > 0:
+            previous[index] = tails[low - 1]
+        if low == len(tails):
+            tails.append(index)
+        else:
+            tails[low] = index
+
+    positions = set()
+    index = tails[-1] if tails else -1
+    while index != -1:
+        positions.add(index)
+        index = previous[index]
+    return positions
+
+def plan_sparse_reorder(card_ids, current_orders):
+    """새 카드 순서(card_ids)에 맞게 바뀌어야 하는 {id: sort_order}만 계산합니다."""
+    values = [current_orders.get(card_id) for card_id in card_ids]
+    if any(value is None for value in values):
+        # 순서 값을 모르는 카드가 있으면 전체를 다시 번호 매김
+        return {card_id: float(index + 1) for index, card_id in enumerate(card_ids)}
+
+    keep = longest_increasing_positions(values)
+    new_orders = {}
+    index = 0
+    while index < len(card_ids):
+        if index in keep:
+            index += 1
+            continue
+        # 옮겨야 하는 연속 구간 [index, run_end)와 양쪽의 고정 값
+        run_end = index
+        while run_end < len(card_ids) and run_end not in keep:
+            run_end += 1
+        low = values[index - 1] if index > 0 else None
+        high = values[run_end] if run_end < len(card_ids) else None
+        count = run_end - index
+
+        for offset in range(count):
+            if low is None and high is None:
+                value = float(offset + 1)
+            elif low is None:
+                value = high - (count - offset)
+            elif high is None:
+                value = low + offset + 1
+            else:
+                value = low + (high - low) * (offset + 1) / (count + 1)
+            new_orders[card_ids[index + offset]] = value
+
+        if low is not None and high is not None and (high - low) / (count + 1) < SORT_ORDER_MIN_GAP:
+            # 소수 간격이 너무 작아지면 전체를 다시 번호 매김
+            return {card_id: float(i + 1) for i, card_id in enumerate(card_ids)
+                    if current_orders.get(card_id) != float(i + 1)}
+        index = run_end
+
+    return new_orders
+
+def new_card_sort_order():
+    """새 카드를 맨 앞에 두는 sort_order: 현재 최솟값 - 1 (카드가 없으면 0)
+
+    순서 변경은 맨 앞으로 옮긴 카드에 다음 카드보다 작은 값(0 이하 포함)을 주므로 고정값 0으로는 맨 앞이 보장되지 않습니다.
+    """
+    head = card_repo.head_sort_order()
+    return 0 if head is None else min(float(head) - 1, 0)
+
+REORDER_READ_CHUNK = 500  # 현재 순서 조회 한 번에 넣는 ID 수 (Supabase in.() 필터가 URL에 들어감)
+
+def fetch_sort_orders(card_ids):
+    """카드들의 현재 sort_order를 DB에서 바로 읽습니다. {id: sort_order}"""
+    current_orders = {}
+    for start in range(0, len(card_ids), REORDER_READ_CHUNK):
+        chunk = card_ids[start:start + REORDER_READ_CHUNK]
+        for card in card_repo.get_cards(chunk, 'id, sort_order'):
+            current_orders[card['id']] = card.get('sort_order')
+    return current_orders
 
 # 카드 순서 업데이트 엔드포인트
+# - card_ids: 화면에 보이는 새 순서의 카드 ID 목록 (바뀐 카드만 계산해서 기록)
+# - card_orders: [{id, sort_order}] 직접 지정 (기존 방식, 값이 같은 카드는 건너뜀)
 @app.route('/api/cards/reorder', methods=['POST'])
 def reorder_cards():
     try:
-        if not supabase:
+        if not card_repo:
             return jsonify({'error': 'Database not configured'}), 500
             
         data = request.json or {}
         password = data.get('password', '')
+        card_ids = data.get('card_ids', [])
         card_orders = data.get('card_orders', [])
         
         # 비밀번호 확인 (관리자 비밀번호 사용)
@@ -601,25 +3725,61 @@ def reorder_cards():
         if password != ADMIN_PASSWORD:
             return jsonify({'error': '비밀번호가 일치하지 않습니다'}), 401
         
-        if not card_orders:
+        if not card_ids and not card_orders:
             return jsonify({'error': '카드 순서 정보가 필요합니다'}), 400
         
-        # 각 카드의 순서 업데이트
-        for order_info in card_orders:
-            card_id = order_info.get('id')
-            sort_order = order_info.get('sort_order')
-            
-            if card_id and sort_order is not None:
-                result = supabase.table('edutech_cards').update({
-                    'sort_order': sort_order
-                }).eq('id', card_id).execute()
+        started = time.perf_counter()
+        
+        try:
+            if card_ids:
+                card_ids = [int(card_id) for card_id in card_ids]
+                requested_ids = card_ids
+            else:
+                # 본문의 ID는 문자열일 수 있으므로 DB에서 읽은 값(int 키)과 비교하기 전에 변환
+                card_orders = [(int(order_info['id']), order_info.get('sort_order'))
+                               for order_info in card_orders if order_info.get('id')]
+                requested_ids = [card_id for card_id, _ in card_orders]
+        except (TypeError, ValueError, KeyError, AttributeError):
+            return jsonify({'error': '카드 ID 형식이 올바르지 않습니다'}), 400
         
-        return jsonify({'message': '카드 순서가 성공적으로 업데이트되었습니다'})
+        # 계획은 DB에서 방금 읽은 값으로 세움 (워커별 캐시는 다른 워커의 변경을 TTL 동안 모르므로
+        # 캐시 값과 같다는 이유로 쓰기를 건너뛰면 순서 변경이 사라질 수 있음)
+        current_orders = fetch_sort_orders(requested_ids)
+        
+        if card_ids:
+            orders = plan_sparse_reorder(card_ids, current_orders)
+            dense_orders = {card_id: index + 1 for index, card_id in enumerate(card_ids)
+                            if current_orders.get(card_id) != index + 1}
+        else:
+            orders = {}
+            dense_orders = None
+            for card_id, sort_order in card_orders:
+                if sort_order is not None and current_orders.get(card_id) != sort_order:
+                    orders[card_id] = sort_order
+        
+        rows_written, mode = card_repo.reorder_cards(orders, dense_orders) if orders else (0, 'noop')
+        
+        if orders:
+            invalidate_card_cache('cards reordered')
+            applied = dense_orders if mode == 'per_row' and dense_orders is not None else orders
+            for card_id, sort_order in applied.items():
+                search_index_patch(card_id, sort_order=sort_order)
+            publish_card_event('reordered', list(applied))
+        
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 2)
+        logger.info("카드 순서 업데이트: %d개 행 기록 (%s, %sms)", rows_written, mode, elapsed_ms)
+        
+        return jsonify({
+            'message': '카드 순서가 성공적으로 업데이트되었습니다',
+            'rows_written': rows_written,
+            'mode': mode,
+            'elapsed_ms': elapsed_ms,
+        })
         
     except Exception as e:
-        print(f"카드 순서 업데이트 오류: {e}")
-        import traceback
-        traceback.print_exc()
+        # 일부 카드만 업데이트되었을 수 있으므로 캐시를 비움
+        invalidate_card_cache('cards reorder failed')
+        logger.exception("카드 순서 업데이트 오류: %s", e)
         return jsonify({'error': '카드 순서 업데이트 중 오류가 발생했습니다'}), 500
 
 # 로컬 파일 서빙 라우트 제거 (Supabase Storage 전용으로 변경)
@@ -635,12 +3795,23 @@ if is_railway:
 # Startup summary
 logger.info("=== 앱 초기화 완료 요약 ===")
 logger.info(f"✅ Flask 앱: {app.name}")
-logger.info(f"✅ Supabase 연결: {'성공' if supabase else '실패'}")
+logger.info(f"✅ Supabase 설정: {'있음 (첫 사용 시 연결)' if supabase else '없음'}")
 logger.info(f"✅ Supabase Storage 버킷: {BUCKET_NAME}")
 logger.info(f"✅ 환경: {'Railway' if is_railway else '로컬'}")
 
+def create_app(readiness_probe=True):
+    """WSGI 서버용 앱 팩토리 (wsgi.py, gunicorn 'app:create_app()')
+
+    모듈 import는 네트워크 연결 없이 라우트와 설정만 준비합니다.
+    readiness_probe=True면 각 워커의 첫 요청 때 백그라운드 연결 확인을 시작합니다.
+    """
+    global readiness_probe_enabled
+    readiness_probe_enabled = readiness_probe
+    return app
+
 if __name__ == '__main__':
     # 로컬 개발환경
+    create_app()
     port = int(os.environ.get('PORT', 5000))
     debug = os.environ.get('FLASK_ENV') == 'development'
     logger.info(f"🚀 로컬 서버 시작: 포트 {port}, 디버그 {debug}")
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+시작 시간 벤치마크 스크립트
+
+새 파이썬 프로세스에서 앱을 import하는 시간, create_app() 시간, 첫 요청 응답 시간을 여러 번 측정하고
+-X importtime 결과로 import 비용이 큰 모듈을 보여줍니다.
+워커 부팅 시간이 DB 지연과 무관한지 확인하거나, 다른 체크아웃(--path)과 비교할 때 사용합니다.
+
+사용 예:
+    python bench_startup.py --runs 5
+    python bench_startup.py --runs 5 --path ../edutech-old      # 다른 체크아웃과 비교
+    CARD_REPOSITORY=sqlite SQLITE_DATABASE_PATH=:memory: python bench_startup.py --request /api/cards
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+MEASURE_SCRIPT = r"""
+import json, resource, sys, time
+sys.path.insert(0, {path!r})
+started = time.perf_counter()
+import app as app_module
+imported = time.perf_counter()
+flask_app = app_module.create_app() if hasattr(app_module, 'create_app') else app_module.app
+created = time.perf_counter()
+response = flask_app.test_client().get({request_path!r})
+responded = time.perf_counter()
+print(json.dumps({{
+    'import_ms': (imported - started) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'first_request_ms': (responded - created) * 1000,
+    'status': response.status_code,
+    'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'supabase_imported': 'supabase' in sys.modules,
+    'openpyxl_imported': 'openpyxl' in sys.modules,
+    'pil_imported': 'PIL.Image' in sys.modules,
+}}))
+"""
+
+
+def run_once(path, request_path):
+    script = MEASURE_SCRIPT.format(path=path, request_path=request_path)
+    result = subprocess.run([sys.executable, '-c', script], cwd=path, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'failed')
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def import_breakdown(path, top):
+    """-X importtime 출력에서 누적 import 시간이 큰 최상위 모듈을 반환합니다."""
+    script = f"import sys; sys.path.insert(0, {path!r}); import app"
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', script], cwd=path, capture_output=True, text=True)
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        parts = line[len('import time:'):].split('|')
+        try:
+            cumulative = int(parts[1])
+        except ValueError:
+            continue
+        name = parts[2]
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth <= 1:  # app 자신과 app이 직접 import한 모듈
+            modules.append((cumulative / 1000, name.strip()))
+    return sorted(modules, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='에듀테크 컬렉터 시작 시간 벤치마크')
+    parser.add_argument('--runs', type=int, default=5, help='측정 횟수 (프로세스를 매번 새로 시작)')
+    parser.add_argument('--path', default=os.path.dirname(os.path.abspath(__file__)), help='app.py가 있는 디렉토리')
+    parser.add_argument('--request', default='/', help='첫 요청 경로')
+    parser.add_argument('--top', type=int, default=10, help='표시할 import 비용 상위 모듈 수')
+    args = parser.parse_args()
+
+    path = os.path.abspath(args.path)
+    samples = [run_once(path, args.request) for _ in range(args.runs)]
+
+    print(f"[{path}] {args.runs}회 측정 (중앙값)")
+    for key, label in (('import_ms', 'import app'), ('create_app_ms', 'create_app()'),
+                       ('first_request_ms', f'첫 요청 {args.request}')):
+        values = [sample[key] for sample in samples]
+        print(f"    {label}: {statistics.median(values):.1f}ms (최소 {min(values):.1f} / 최대 {max(values):.1f})")
+    last = samples[-1]
+    print(f"    첫 요청 상태 코드: {last['status']}, 최대 RSS: {last['max_rss_mb']:.1f}MB")
+    print(f"    첫 요청 후 import된 모듈: supabase={last['supabase_imported']}, "
+          f"openpyxl={last['openpyxl_imported']}, PIL={last['pil_imported']}")
+
+    print(f"\nimport 비용 상위 {args.top}개 (누적 ms)")
+    for milliseconds, name in import_breakdown(path, args.top):
+        print(f"    {milliseconds:8.1f}  {name}")
+
+
+if __name__ == '__main__':
+    main()
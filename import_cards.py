@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+카드 일괄 가져오기 스크립트
+
+내보내기(/api/download-excel)와 같은 열 구성의 XLSX/CSV/JSON Lines 파일을 읽어 카드를 추가하거나 수정합니다.
+URL을 정규화해 파일 안의 중복과 이미 등록된 카드를 걸러내고, 500개씩 url 기준 upsert로 기록한 뒤 결과를 출력합니다.
+
+기본적으로 이 프로세스에서 바로 저장소(.env의 Supabase 설정 또는 CARD_REPOSITORY=sqlite)에 기록합니다.
+--server를 주면 실행 중인 서버의 POST /api/cards/import로 파일을 보냅니다. (서버 워커의 캐시/색인도 바로 갱신)
+
+사용 예:
+    python import_cards.py tools.xlsx
+    python import_cards.py tools.csv --on-duplicate skip --pending
+    python import_cards.py tools.jsonl --server https://example.up.railway.app --password admin
+"""
+import argparse
+import json
+import os
+import sys
+import urllib.error
+import urllib.request
+import uuid
+
+FORMATS = ('xlsx', 'csv', 'jsonl')
+
+
+def import_locally(path, import_format, on_duplicate, view):
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import app as app_module
+
+    if not app_module.card_repo:
+        raise RuntimeError('카드 저장소가 설정되지 않았습니다 (.env의 Supabase 설정 또는 CARD_REPOSITORY=sqlite)')
+    with open(path, 'rb') as fileobj:
+        return app_module.import_cards(app_module.iter_import_records(fileobj, import_format), on_duplicate, view)
+
+
+def import_via_server(path, import_format, on_duplicate, view, server, password, timeout):
+    boundary = uuid.uuid4().hex
+    fields = {'password': password, 'format': import_format, 'on_duplicate': on_duplicate, 'view': str(view)}
+    body = b''.join(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode('utf-8')
+        for name, value in fields.items()
+    )
+    with open(path, 'rb') as fileobj:
+        body += (
+            f'--{boundary}\r\n'
+            f'Content-Disposition: form-data; name="file"; filename="{os.path.basename(path)}"\r\n'
+            f'Content-Type: application/octet-stream\r\n\r\n'
+        ).encode('utf-8') + fileobj.read() + f'\r\n--{boundary}--\r\n'.encode('utf-8')
+
+    request = urllib.request.Request(
+        f"{server.rstrip('/')}/api/cards/import",
+        data=body,
+        headers={'Content-Type': f'multipart/form-data; boundary={boundary}'},
+        method='POST',
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        error = json.loads(e.read() or b'{}').get('error', e.reason)
+        raise RuntimeError(f'HTTP {e.code}: {error}') from e
+
+
+def print_report(report, max_skipped):
+    print(f"{report['rows']}행 처리 ({report['batches']}개 배치, {report['elapsed_ms'] / 1000:.2f}s)")
+    print(f"    추가: {report['inserted']}")
+    print(f"    수정: {report['updated']}")
+    print(f"    건너뜀: {report['skipped']}")
+    for skipped in report['skipped_rows'][:max_skipped]:
+        print(f"        {skipped['row']}행: {skipped['reason']}")
+    if report['skipped'] > max_skipped:
+        print(f"        ... 외 {report['skipped'] - max_skipped}행")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='에듀테크 카드 일괄 가져오기')
+    parser.add_argument('path', help='가져올 파일 (.xlsx, .csv, .jsonl)')
+    parser.add_argument('--format', choices=FORMATS, help='파일 형식 (생략하면 확장자로 판단)')
+    parser.add_argument('--on-duplicate', choices=['update', 'skip'], default='update',
+                        help='이미 등록된 URL의 카드를 수정할지 건너뛸지')
+    parser.add_argument('--pending', action='store_true', help='새 카드를 대기(view=0) 상태로 추가')
+    parser.add_argument('--server', help='실행 중인 서버 주소 (지정하면 POST /api/cards/import 사용)')
+    parser.add_argument('--password', default='admin', help='--server 사용 시 관리자 비밀번호')
+    parser.add_argument('--timeout', type=float, default=300, help='--server 사용 시 요청 타임아웃(초)')
+    parser.add_argument('--show-skipped', type=int, default=20, help='출력할 건너뛴 행 수')
+    args = parser.parse_args()
+
+    import_format = args.format or os.path.splitext(args.path)[1].lstrip('.').lower()
+    if import_format not in FORMATS:
+        parser.error(f'지원하지 않는 형식입니다: {import_format} (--format으로 지정)')
+    view = 0 if args.pending else 1
+
+    try:
+        if args.server:
+            report = import_via_server(args.path, import_format, args.on_duplicate, view,
+                                       args.server, args.password, args.timeout)
+        else:
+            report = import_locally(args.path, import_format, args.on_duplicate, view)
+    except (RuntimeError, ValueError, OSError) as e:
+        print(f"❌ 가져오기 실패: {e}")
+        sys.exit(1)
+    print_report(report, args.show_skipped)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+부하 테스트 스크립트
+
+실행 중인 서버에 동시 요청을 보내 처리량(req/s)과 지연시간(p50/p95/p99)을 측정합니다.
+--compare 옵션을 주면 sync 워커와 gevent 워커로 gunicorn을 차례로 띄워 같은 부하를 보내고 결과를 비교합니다.
+
+사용 예:
+    python load_test.py --url http://127.0.0.1:5000 --target cards --concurrency 20 --requests 400
+    python load_test.py --compare --target cards-db --concurrency 20 --requests 400
+
+대상(--target):
+    cards     GET /api/cards (캐시/ETag 경로)
+    cards-db  GET /api/cards?search=... (매 요청 Supabase 조회)
+    upload    POST /api/upload-thumbnail (Supabase Storage 업로드, 실제 버킷에 파일이 생성됩니다)
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+import uuid
+import zlib
+import struct
+from concurrent.futures import ThreadPoolExecutor
+
+
+def make_png(width=8, height=8):
+    """업로드 테스트용 작은 PNG 이미지를 만듭니다. (매번 다른 내용)"""
+    def chunk(kind, data):
+        body = kind + data
+        return struct.pack('>I', len(data)) + body + struct.pack('>I', zlib.crc32(body) & 0xffffffff)
+
+    seed = uuid.uuid4().bytes
+    rows = b''.join(b'\x00' + bytes((seed[(x + y) % 16] for x in range(width * 3))) for y in range(height))
+    return (b'\x89PNG\r\n\x1a\n'
+            + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(rows))
+            + chunk(b'IEND', b''))
+
+
+def build_request(base_url, target):
+    if target == 'cards':
+        return urllib.request.Request(f"{base_url}/api/cards")
+    if target == 'cards-db':
+        return urllib.request.Request(f"{base_url}/api/cards?search={uuid.uuid4().hex[:2]}")
+    if target == 'upload':
+        boundary = uuid.uuid4().hex
+        body = (
+            f'--{boundary}\r\n'
+            f'Content-Disposition: form-data; name="thumbnail"; filename="load_test.png"\r\n'
+            f'Content-Type: image/png\r\n\r\n'
+        ).encode('utf-8') + make_png() + f'\r\n--{boundary}--\r\n'.encode('utf-8')
+        return urllib.request.Request(
+            f"{base_url}/api/upload-thumbnail",
+            data=body,
+            headers={'Content-Type': f'multipart/form-data; boundary={boundary}'},
+            method='POST',
+        )
+    raise ValueError(f'unknown target: {target}')
+
+
+def send_one(base_url, target, timeout):
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(build_request(base_url, target), timeout=timeout) as response:
+            response.read()
+            ok = 200 <= response.status < 400
+    except urllib.error.HTTPError as e:
+        ok = e.code == 304
+    except Exception:
+        ok = False
+    return ok, time.perf_counter() - started
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_load(base_url, target, concurrency, total_requests, timeout):
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda _: send_one(base_url, target, timeout), range(total_requests)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for ok, latency in results if ok)
+    errors = sum(1 for ok, _ in results if not ok)
+    return {
+        'requests': total_requests,
+        'errors': errors,
+        'elapsed': elapsed,
+        'throughput': (total_requests - errors) / elapsed if elapsed else 0.0,
+        'p50': percentile(latencies, 0.50) * 1000,
+        'p95': percentile(latencies, 0.95) * 1000,
+        'p99': percentile(latencies, 0.99) * 1000,
+        'mean': (statistics.fmean(latencies) * 1000) if latencies else 0.0,
+    }
+
+
+def print_result(label, result):
+    print(f"[{label}] {result['requests']}개 요청, 오류 {result['errors']}개, {result['elapsed']:.2f}s")
+    print(f"    처리량: {result['throughput']:.1f} req/s")
+    print(f"    지연시간(ms): mean {result['mean']:.1f} / p50 {result['p50']:.1f} / "
+          f"p95 {result['p95']:.1f} / p99 {result['p99']:.1f}")
+
+
+def wait_for_server(base_url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"{base_url}/health", timeout=2):
+                return True
+        except Exception:
+            time.sleep(0.5)
+    return False
+
+
+def start_gunicorn(module, worker_class, port, workers):
+    command = [
+        sys.executable, '-m', 'gunicorn', f'{module}:app',
+        '--bind', f'127.0.0.1:{port}',
+        '--workers', str(workers),
+        '--worker-class', worker_class,
+        '--timeout', '300',
+        '--log-level', 'warning',
+    ]
+    if worker_class == 'gevent':
+        command += ['--worker-connections', '100']
+    return subprocess.Popen(command, cwd=os.path.dirname(os.path.abspath(__file__)),
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def compare_modes(args):
+    modes = [('sync', 'wsgi', 'sync'), ('gevent', 'wsgi_gevent', 'gevent')]
+    results = {}
+    for label, module, worker_class in modes:
+        port = args.port
+        print(f"\n=== {label} 워커로 gunicorn 시작 (포트 {port}, 워커 {args.workers}) ===")
+        server = start_gunicorn(module, worker_class, port, args.workers)
+        try:
+            base_url = f"http://127.0.0.1:{port}"
+            if not wait_for_server(base_url):
+                print(f"❌ {label} 서버가 시작되지 않았습니다")
+                continue
+            run_load(base_url, args.target, min(args.concurrency, 4), min(args.requests, 20), args.timeout)  # 워밍업
+            results[label] = run_load(base_url, args.target, args.concurrency, args.requests, args.timeout)
+            print_result(label, results[label])
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+    if 'sync' in results and 'gevent' in results and results['sync']['throughput']:
+        ratio = results['gevent']['throughput'] / results['sync']['throughput']
+        print(f"\n처리량 비교 (gevent / sync): {ratio:.2f}배")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='에듀테크 컬렉터 부하 테스트')
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help='테스트할 서버 주소')
+    parser.add_argument('--target', default='cards', choices=['cards', 'cards-db', 'upload'])
+    parser.add_argument('--concurrency', type=int, default=20, help='동시 요청 수')
+    parser.add_argument('--requests', type=int, default=400, help='전체 요청 수')
+    parser.add_argument('--timeout', type=float, default=60, help='요청 타임아웃(초)')
+    parser.add_argument('--compare', action='store_true', help='sync/gevent 워커를 직접 띄워 비교')
+    parser.add_argument('--port', type=int, default=5055, help='--compare 사용 시 gunicorn 포트')
+    parser.add_argument('--workers', type=int, default=2, help='--compare 사용 시 gunicorn 워커 수')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare_modes(args)
+    else:
+        print_result(args.target, run_load(args.url.rstrip('/'), args.target, args.concurrency, args.requests, args.timeout))
+
+
+if __name__ == '__main__':
+    main()
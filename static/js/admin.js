@@ -4,6 +4,12 @@ let filteredCards = [];
 let searchQuery = '';
 let sortable = null;
 let isDragModeEnabled = false;
+let catalogVersion = 0;  // 마지막으로 동기화한 카탈로그 버전 (0이면 전체 목록 요청)
+let cardEvents = null;  // /api/events 연결 (EventSource)
+let cardSyncTimer = null;
+let pendingCardSync = false;  // 드래그 모드 중에 도착한 변경 알림
+const CARD_EVENT_TYPES = ['created', 'updated', 'approved', 'hidden', 'reordered', 'resync'];
+const FALLBACK_SYNC_INTERVAL_MS = 5000;  // 이벤트 스트림을 쓸 수 없을 때(sync 워커) 변경분 확인 간격 (워커 캐시에서 응답)
 
 // DOM 요소
 const cardsGrid = document.getElementById('cardsGrid');
@@ -18,11 +24,14 @@ const downloadModal = document.getElementById('downloadModal');
 const downloadExcelButton = document.getElementById('downloadExcelButton');
 const dragModeToggle = document.getElementById('dragModeToggle');
 const saveOrderButton = document.getElementById('saveOrderButton');
+const approvePendingButton = document.getElementById('approvePendingButton');
+const BULK_MODERATION_BATCH = 500;  // 서버의 한 요청당 최대 카드 수 (BULK_MODERATION_MAX_IDS)
 
 // 이벤트 리스너 설정
 document.addEventListener('DOMContentLoaded', function() {
     initializeEventListeners();
     fetchCards();
+    connectCardEvents();
 });
 
 function initializeEventListeners() {
@@ -51,6 +60,7 @@ function initializeEventListeners() {
     // 드래그 모드 관련
     dragModeToggle.addEventListener('change', toggleDragMode);
     saveOrderButton.addEventListener('click', handleSaveOrder);
+    approvePendingButton.addEventListener('click', handleApprovePending);
     
     // 모달 외부 클릭시 닫기
     addModal.addEventListener('click', function(e) {
@@ -74,11 +84,11 @@ function initializeEventListeners() {
     });
 }
 
-// 카드 데이터 가져오기
+// 카드 데이터 가져오기 (처음에는 전체 목록, 이후에는 마지막 버전 이후 바뀐 카드만)
 async function fetchCards() {
     try {
         console.log('=== 카드 데이터 요청 시작 ===');
-        const response = await fetch('/api/cards?admin=true');
+        const response = await fetch(`/api/cards/changes?admin=true&since=${catalogVersion}`);
         console.log('응답 상태:', response.status);
         
         if (!response.ok) {
@@ -86,15 +96,17 @@ async function fetchCards() {
         }
         
         const data = await response.json();
-        console.log('받은 데이터:', data);
-        console.log('카드 수:', Array.isArray(data) ? data.length : 0);
+        console.log(`받은 변경분: ${data.cards.length}개 (전체 목록: ${data.full}, 버전: ${data.version})`);
         
         // Admin can see all cards (view=0 and view=1)
-        cards = Array.isArray(data) ? data : [];
+        cards = applyCardChanges(data.full ? [] : cards, data);
+        catalogVersion = data.version;
+        console.log('카드 수:', cards.length);
         filterCards();
     } catch (error) {
         console.error('ERROR: 카드 가져오기 실패:', error);
         cards = [];
+        catalogVersion = 0;
         filterCards();
         
         // 사용자에게 오류 알림
@@ -113,6 +125,79 @@ async function fetchCards() {
     }
 }
 
+// 변경분을 로컬 목록에 적용 (바뀐 카드는 교체, deleted의 카드는 제거)
+function applyCardChanges(currentCards, changes) {
+    const cardsById = new Map(currentCards.map(card => [card.id, card]));
+    changes.cards.forEach(card => cardsById.set(card.id, card));
+    changes.deleted.forEach(id => cardsById.delete(id));
+    return Array.from(cardsById.values()).sort(compareCards);
+}
+
+// 서버 목록과 같은 순서: sort_order ASC, created_at DESC, id DESC
+function compareCards(a, b) {
+    return (a.sort_order || 0) - (b.sort_order || 0)
+        || String(b.created_at || '').localeCompare(String(a.created_at || ''))
+        || b.id - a.id;
+}
+
+// 서버 변경 알림 구독: 알림이 오면 변경분만 가져옴
+function connectCardEvents() {
+    if (!window.EventSource) {
+        startFallbackSync();
+        return;
+    }
+    cardEvents = new EventSource('/api/events');
+    // 연결/재연결 직후: 끊겨 있던 동안의 변경분 확인
+    cardEvents.addEventListener('open', scheduleCardSync);
+    CARD_EVENT_TYPES.forEach(type => cardEvents.addEventListener(type, handleCardEvent));
+    cardEvents.addEventListener('error', () => {
+        // 일시적인 끊김은 브라우저가 자동 재연결, 서버가 스트림을 받지 않으면(503) 주기적 확인으로 전환
+        if (cardEvents.readyState === EventSource.CLOSED) {
+            console.log('변경 알림을 사용할 수 없어 주기적으로 변경분을 확인합니다');
+            cardEvents = null;
+            startFallbackSync();
+        }
+    });
+}
+
+// 주기적 변경분 확인 (기본 배포인 sync 워커는 스트림을 열지 않음), 탭이 보이지 않는 동안은 건너뜀
+function startFallbackSync() {
+    setInterval(() => {
+        if (!document.hidden) scheduleCardSync();
+    }, FALLBACK_SYNC_INTERVAL_MS);
+    document.addEventListener('visibilitychange', () => {
+        if (!document.hidden) scheduleCardSync();
+    });
+}
+
+function handleCardEvent(event) {
+    const data = JSON.parse(event.data || '{}');
+    console.log(`변경 알림: ${event.type}`, data.ids || []);
+    if (event.type === 'created' && data.view === 0) {
+        console.log('새 추가요청이 도착했습니다');
+    }
+    scheduleCardSync();
+}
+
+// 연달아 오는 알림을 한 번의 변경분 요청으로 묶음 (드래그 중에는 순서가 바뀌지 않도록 끝난 뒤 반영)
+function scheduleCardSync() {
+    if (isDragModeEnabled) {
+        pendingCardSync = true;
+        return;
+    }
+    clearTimeout(cardSyncTimer);
+    cardSyncTimer = setTimeout(fetchCards, 200);
+}
+
+// 모달을 열 때의 카드 버전(updated_at)을 If-Match로 보내 그 사이 다른 수정이 있으면 412를 받음
+function cardRequestHeaders(updatedAt) {
+    const headers = { 'Content-Type': 'application/json' };
+    if (updatedAt) {
+        headers['If-Match'] = `"${updatedAt}"`;
+    }
+    return headers;
+}
+
 // 검색 처리
 function handleSearch() {
     searchQuery = searchInput.value.trim();
@@ -134,9 +219,17 @@ function filterCards() {
     }
     
     filteredCards = filtered;
+    updatePendingCount();
     renderCards();
 }
 
+// 검색 결과 중 대기중 카드 수 표시
+function updatePendingCount() {
+    const pendingCount = filteredCards.filter(card => card.view !== 1).length;
+    document.getElementById('pendingCount').textContent = pendingCount;
+    approvePendingButton.disabled = pendingCount === 0;
+}
+
 // 카드 렌더링
 function renderCards() {
     if (filteredCards.length === 0) {
@@ -166,9 +259,36 @@ function renderCards() {
     }
 }
 
+// 썸네일은 서버의 /thumb/<id>/<너비> 프록시로 받습니다. (크기별 디스크 캐시, 이미지가 없으면 제목으로 대체 이미지 생성)
+// URL에 썸네일 버전(아래 thumbnailVersion)을 붙여 브라우저가 immutable로 캐시하고, 이미지가 바뀔 때만 새 URL로 받습니다.
+const THUMBNAIL_WIDTHS = [80, 240, 480];
+
+// 썸네일 버전: 업로드 파일명(내용의 SHA-256) 앞 16자 (카드를 수정/승인해도 이미지가 같으면 URL이 그대로)
+function thumbnailVersion(card) {
+    const sources = [card.thumbnail_url || '', ...Object.values(card.thumbnail_variants || {})];
+    for (const source of sources) {
+        const match = /[0-9a-f]{64}/.exec(String(source));
+        if (match) return match[0].slice(0, 16);
+    }
+    return '';
+}
+
+function thumbnailSrc(card, width, placeholder = false) {
+    const params = new URLSearchParams();
+    const version = thumbnailVersion(card);
+    if (version) params.set('v', version);
+    if (placeholder) params.set('placeholder', '1');
+    const query = params.toString();
+    return `/thumb/${card.id}/${width}${query ? `?${query}` : ''}`;
+}
+
+function thumbnailSrcset(card) {
+    return THUMBNAIL_WIDTHS.map(width => `${thumbnailSrc(card, width)} ${width}w`).join(', ');
+}
+
 // 카드 HTML 생성 (관리자 기능 포함)
 function createCardHTML(card) {
-    const thumbnailUrl = card.thumbnail_url || `https://via.placeholder.com/80x60?text=${encodeURIComponent(card.webpage_name)}`;
+    const thumbnailUrl = thumbnailSrc(card, 80);
     const subjects = Array.isArray(card.useful_subjects) ? card.useful_subjects : [];
     const keywords = Array.isArray(card.keyword) ? card.keyword : [];
     
@@ -216,9 +336,11 @@ function createCardHTML(card) {
                     <div class="flex-shrink-0">
                         <img 
                             src="${thumbnailUrl}" 
+                            srcset="${thumbnailSrcset(card)}"
+                            sizes="64px"
                             alt="${card.webpage_name}"
                             class="w-16 h-12 object-cover rounded-md"
-                            onerror="this.src='https://via.placeholder.com/80x60?text=${encodeURIComponent(card.webpage_name)}'"
+                            onerror="this.onerror = null; this.removeAttribute('srcset'); this.src='${thumbnailSrc(card, 80, true)}'"
                         />
                     </div>
                     <div class="flex-1 min-w-0">
@@ -257,7 +379,7 @@ function openDetailModal(cardId) {
 
     const subjects = Array.isArray(card.useful_subjects) ? card.useful_subjects : [];
     const keywords = Array.isArray(card.keyword) ? card.keyword : [];
-    const thumbnailUrl = card.thumbnail_url || `https://via.placeholder.com/400x300?text=${encodeURIComponent(card.webpage_name)}`;
+    const thumbnailUrl = thumbnailSrc(card, 480);
 
     const detailModalContainer = document.getElementById('detailModal').querySelector('.modal-content');
     
@@ -302,9 +424,11 @@ function openDetailModal(cardId) {
             <div class="text-center">
                 <img 
                     src="${thumbnailUrl}" 
+                    srcset="${thumbnailSrcset(card)}"
+                    sizes="(max-width: 480px) 100vw, 480px"
                     alt="${card.webpage_name}"
                     class="mx-auto rounded-lg shadow-md max-w-full h-48 object-cover"
-                    onerror="this.src='https://via.placeholder.com/400x300?text=${encodeURIComponent(card.webpage_name)}'"
+                    onerror="this.onerror = null; this.removeAttribute('srcset'); this.src='${thumbnailSrc(card, 480, true)}'"
                 />
             </div>
             
@@ -377,6 +501,7 @@ function openEditModal(cardId) {
     if (!card) return;
     
     document.getElementById('editCardId').value = card.id;
+    document.getElementById('editCardId').dataset.updatedAt = card.updated_at || '';  // 수정 충돌 확인용 (If-Match)
     document.getElementById('editCardUrl').value = card.url || '';
     document.getElementById('editCardName').value = card.webpage_name || '';
     document.getElementById('editCardSummary').value = card.user_summary || '';
@@ -409,7 +534,9 @@ function openEditModal(cardId) {
 
 // 삭제 모달 열기
 function openDeleteModal(cardId) {
+    const card = cards.find(c => c.id === cardId);
     document.getElementById('deleteCardId').value = cardId;
+    document.getElementById('deleteCardId').dataset.updatedAt = (card && card.updated_at) || '';
     document.getElementById('deletePassword').value = '';
     deleteModal.classList.remove('hidden');
 }
@@ -458,9 +585,10 @@ async function handleAddCard(e) {
         // 새로운 썸네일이 업로드된 경우 먼저 업로드
         const fileInput = document.getElementById('addThumbnailFile');
         if (fileInput.files && fileInput.files[0]) {
-            const thumbnailUrl = await uploadThumbnail(fileInput.files[0]);
-            if (thumbnailUrl) {
-                cardData.thumbnail_url = thumbnailUrl;
+            const uploaded = await uploadThumbnail(fileInput.files[0]);
+            if (uploaded) {
+                cardData.thumbnail_url = uploaded.url;
+                cardData.thumbnail_variants = uploaded.variants || {};
             }
         }
         
@@ -489,6 +617,7 @@ async function handleEditCard(e) {
     e.preventDefault();
     
     const cardId = document.getElementById('editCardId').value;
+    const updatedAt = document.getElementById('editCardId').dataset.updatedAt;
     const password = document.getElementById('editPassword').value;
     
     // 승인 상태 가져오기
@@ -510,15 +639,16 @@ async function handleEditCard(e) {
         // 새로운 썸네일이 업로드된 경우 먼저 업로드
         const fileInput = document.getElementById('editThumbnailFile');
         if (fileInput.files && fileInput.files[0]) {
-            const thumbnailUrl = await uploadThumbnail(fileInput.files[0]);
-            if (thumbnailUrl) {
-                cardData.thumbnail_url = thumbnailUrl;
+            const uploaded = await uploadThumbnail(fileInput.files[0]);
+            if (uploaded) {
+                cardData.thumbnail_url = uploaded.url;
+                cardData.thumbnail_variants = uploaded.variants || {};
             }
         }
         
         const response = await fetch(`/api/cards/${cardId}`, {
             method: 'PUT',
-            headers: { 'Content-Type': 'application/json' },
+            headers: cardRequestHeaders(updatedAt),
             body: JSON.stringify(cardData)
         });
         
@@ -526,6 +656,10 @@ async function handleEditCard(e) {
             alert('카드가 성공적으로 수정되었습니다!');
             closeEditModal();
             await fetchCards();
+        } else if (response.status === 412) {
+            alert('다른 곳에서 먼저 수정된 카드입니다. 최신 내용을 불러온 뒤 다시 수정해주세요.');
+            closeEditModal();
+            await fetchCards();
         } else {
             const error = await response.json();
             alert(error.error || '카드 수정에 실패했습니다.');
@@ -539,6 +673,7 @@ async function handleEditCard(e) {
 // 카드 삭제 처리
 async function handleDeleteCard() {
     const cardId = document.getElementById('deleteCardId').value;
+    const updatedAt = document.getElementById('deleteCardId').dataset.updatedAt;
     const password = document.getElementById('deletePassword').value;
     
     if (!password) {
@@ -549,7 +684,7 @@ async function handleDeleteCard() {
     try {
         const response = await fetch(`/api/cards/${cardId}`, {
             method: 'DELETE',
-            headers: { 'Content-Type': 'application/json' },
+            headers: cardRequestHeaders(updatedAt),
             body: JSON.stringify({ password: password })
         });
         
@@ -557,6 +692,10 @@ async function handleDeleteCard() {
             alert('카드가 성공적으로 삭제되었습니다!');
             closeDeleteModal();
             await fetchCards();
+        } else if (response.status === 412) {
+            alert('다른 곳에서 먼저 수정된 카드입니다. 최신 내용을 확인한 뒤 다시 시도해주세요.');
+            closeDeleteModal();
+            await fetchCards();
         } else {
             const error = await response.json();
             alert(error.error || '카드 삭제에 실패했습니다.');
@@ -567,7 +706,7 @@ async function handleDeleteCard() {
     }
 }
 
-// Excel 다운로드 처리
+// Excel 다운로드 처리 (백그라운드 내보내기 작업 생성 후 완료되면 다운로드)
 async function handleDownloadExcel() {
     const passwordElement = document.getElementById('downloadPassword');
     if (!passwordElement) {
@@ -582,75 +721,57 @@ async function handleDownloadExcel() {
         return;
     }
     
+    const formatElement = document.getElementById('downloadFormat');
+    const format = formatElement ? formatElement.value : 'xlsx';
+    const confirmButton = document.getElementById('confirmDownloadButton');
+    
     try {
-        console.log('Excel 다운로드 요청 시작...');
-        const response = await fetch('/api/download-excel', {
+        console.log('내보내기 작업 요청 시작...');
+        if (confirmButton) confirmButton.disabled = true;
+        
+        const response = await fetch('/api/export-jobs', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ password: password })
+            body: JSON.stringify({ password: password, format: format })
         });
         
-        console.log('서버 응답:', response.status, response.statusText);
-        console.log('응답 헤더:', Object.fromEntries(response.headers.entries()));
+        let job = await response.json();
+        console.log('내보내기 작업:', response.status, job);
         
-        if (response.ok) {
-            const blob = await response.blob();
-            console.log('받은 blob 크기:', blob.size, 'bytes');
-            
-            if (blob.size === 0) {
-                throw new Error('빈 파일이 반환되었습니다.');
-            }
-            
-            if (!window.URL || !window.URL.createObjectURL) {
-                throw new Error('브라우저가 파일 다운로드를 지원하지 않습니다.');
-            }
-            
-            const url = window.URL.createObjectURL(blob);
-            console.log('생성된 URL:', url);
-            
-            const a = document.createElement('a');
-            a.style.display = 'none';
-            a.href = url;
-            
-            try {
-                const dateStr = new Date().toISOString().slice(0,10);
-                a.download = `edutech_cards_${dateStr}.xlsx`;
-                console.log('파일명:', a.download);
-            } catch (dateError) {
-                console.warn('날짜 형식 오류:', dateError);
-                a.download = 'edutech_cards.xlsx';
-            }
-            
-            document.body.appendChild(a);
-            a.click();
-            document.body.removeChild(a);
-            window.URL.revokeObjectURL(url);
-            
-            console.log('다운로드 완료');
-            closeDownloadModal();
-            alert('Excel 파일이 다운로드되었습니다!');
-        } else {
-            let errorMessage = 'Excel 다운로드에 실패했습니다.';
-            try {
-                const contentType = response.headers.get('Content-Type');
-                console.log('오류 응답 Content-Type:', contentType);
-                
-                if (contentType && contentType.includes('application/json')) {
-                    const error = await response.json();
-                    console.log('서버 오류:', error);
-                    errorMessage = error.error || errorMessage;
-                } else {
-                    const errorText = await response.text();
-                    console.log('서버 오류 텍스트:', errorText);
-                }
-            } catch (parseError) {
-                console.warn('오류 응답 파싱 실패:', parseError);
+        if (!response.ok) {
+            alert(job.error || 'Excel 다운로드에 실패했습니다.');
+            return;
+        }
+        
+        // 작업이 끝날 때까지 상태 확인 (이미 만들어진 파일이 있으면 바로 done)
+        while (job.status === 'running') {
+            await new Promise(resolve => setTimeout(resolve, 1000));
+            const statusResponse = await fetch(`/api/export-jobs/${job.job_id}`);
+            job = await statusResponse.json();
+            if (!statusResponse.ok) {
+                throw new Error(job.error || `HTTP ${statusResponse.status}`);
             }
-            alert(errorMessage);
         }
+        
+        if (job.status !== 'done') {
+            throw new Error(job.error || '내보내기 작업이 실패했습니다.');
+        }
+        
+        // 서버가 Content-Disposition으로 파일명을 지정하므로 링크로 바로 다운로드
+        const a = document.createElement('a');
+        a.style.display = 'none';
+        a.href = job.download_url;
+        document.body.appendChild(a);
+        a.click();
+        document.body.removeChild(a);
+        
+        console.log('다운로드 완료:', job.size, 'bytes');
+        closeDownloadModal();
     } catch (error) {
         console.error('Excel 다운로드 실패:', error);
         alert('Excel 다운로드 중 오류가 발생했습니다: ' + error.message);
+    } finally {
+        if (confirmButton) confirmButton.disabled = false;
     }
 }
 
@@ -719,6 +840,12 @@ function toggleDragMode() {
     
     // 카드 재렌더링 (드래그 핸들 표시/숨김을 위해)
     renderCards();
+    
+    // 드래그 중에 미뤄둔 변경분 반영
+    if (!isDragModeEnabled && pendingCardSync) {
+        pendingCardSync = false;
+        scheduleCardSync();
+    }
 }
 
 // 드래그 모드 활성화
@@ -752,25 +879,23 @@ async function handleSaveOrder() {
     if (!password) return;
     
     try {
-        // 현재 카드 순서 수집
+        // 현재 카드 순서 수집 (서버가 실제로 바뀐 카드만 계산해서 저장)
         const cardElements = Array.from(cardsGrid.children);
-        const cardOrders = cardElements.map((element, index) => ({
-            id: parseInt(element.dataset.cardId),
-            sort_order: index + 1
-        }));
+        const cardIds = cardElements.map(element => parseInt(element.dataset.cardId));
         
         const response = await fetch('/api/cards/reorder', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify({
                 password: password,
-                card_orders: cardOrders
+                card_ids: cardIds
             })
         });
         
         const data = await response.json();
         
         if (response.ok) {
+            console.log(`순서 저장: ${data.rows_written}개 카드 변경 (${data.elapsed_ms}ms)`);
             alert('카드 순서가 성공적으로 저장되었습니다!');
             
             // 드래그 모드 해제
@@ -788,6 +913,47 @@ async function handleSaveOrder() {
     }
 }
 
+// 대기중 카드 일괄 승인 (카드별 PUT 대신 ID 목록으로 한 번에 변경)
+async function handleApprovePending() {
+    const pendingIds = filteredCards.filter(card => card.view !== 1).map(card => card.id);
+    if (pendingIds.length === 0) return;
+    if (!confirm(`대기중 카드 ${pendingIds.length}개를 승인하시겠습니까?`)) return;
+    
+    const password = prompt('관리자 비밀번호를 입력하세요:');
+    if (!password) return;
+    
+    approvePendingButton.disabled = true;
+    let updated = 0;
+    let notFound = 0;
+    try {
+        for (let start = 0; start < pendingIds.length; start += BULK_MODERATION_BATCH) {
+            const response = await fetch('/api/cards/moderate', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({
+                    password: password,
+                    ids: pendingIds.slice(start, start + BULK_MODERATION_BATCH),
+                    view: 1
+                })
+            });
+            const data = await response.json();
+            if (!response.ok) {
+                alert(data.error || '일괄 승인에 실패했습니다.');
+                return;
+            }
+            updated += data.updated;
+            notFound += data.results.filter(result => result.status === 'not_found').length;
+            console.log(`일괄 승인: ${data.updated}/${data.requested}개 (${data.elapsed_ms}ms)`);
+        }
+        alert(`${updated}개 카드를 승인했습니다.` + (notFound ? ` (찾을 수 없는 카드 ${notFound}개)` : ''));
+    } catch (error) {
+        console.error('일괄 승인 실패:', error);
+        alert('일괄 승인 중 오류가 발생했습니다.');
+    } finally {
+        await fetchCards();
+    }
+}
+
 // 추가 모달 썸네일 이벤트 설정
 function setupAddThumbnailEvents() {
     const dropzone = document.getElementById('addThumbnailDropzone');
@@ -1044,18 +1210,17 @@ function resetEditThumbnail() {
 
 // 썸네일 업로드 (기존 함수 재사용)
 async function uploadThumbnail(file) {
-    const formData = new FormData();
-    formData.append('thumbnail', file);
-    
     try {
+        // 파일을 요청 본문으로 그대로 전송 (서버가 청크 단위로 스트리밍 처리)
         const response = await fetch('/api/upload-thumbnail', {
             method: 'POST',
-            body: formData
+            headers: { 'Content-Type': file.type || 'application/octet-stream' },
+            body: file
         });
         
         if (response.ok) {
             const data = await response.json();
-            return data.url;
+            return data;  // { url, variants }
         } else {
             console.error('썸네일 업로드 실패');
             return null;
@@ -516,7 +516,7 @@ async function handleUrlCheck(e) {
         if (duplicates.length > 0) {
             const duplicateList = document.getElementById('duplicateList');
             duplicateList.innerHTML = duplicates.map(card => 
-                `<p class="text-sm text-yellow-700 mt-1">• ${card.webpage_name}</p>`
+                `<p class="text-sm text-yellow-700 mt-1">• ${card.webpage_name}${card.match === 'exact' ? ' (같은 URL)' : ''}</p>`
             ).join('');
             document.getElementById('duplicateWarning').classList.remove('hidden');
         } else {
@@ -571,7 +571,11 @@ async function handleAddCard(e) {
         } else {
             const error = await response.json();
             console.error('서버 오류:', error); // 디버깅용
-            alert(error.error || '카드 추가에 실패했습니다.');
+            if (error.duplicate) {
+                alert(`이미 등록된 URL입니다: ${error.duplicate.webpage_name}`);
+            } else {
+                alert(error.error || '카드 추가에 실패했습니다.');
+            }
         }
     } catch (error) {
         console.error('Error adding card:', error);
@@ -2,6 +2,8 @@
 let cards = [];
 let filteredCards = [];
 let searchQuery = '';
+let catalogVersion = 0;  // 마지막으로 동기화한 카탈로그 버전 (0이면 전체 목록 요청)
+const CARD_STORAGE_KEY = 'edutech-cards-v1';
 
 // DOM 요소
 const cardsGrid = document.getElementById('cardsGrid');
@@ -15,6 +17,7 @@ const requestButton = document.getElementById('requestButton');
 // 이벤트 리스너 설정
 document.addEventListener('DOMContentLoaded', function() {
     initializeEventListeners();
+    loadStoredCards();
     fetchCards();
 });
 
@@ -41,11 +44,34 @@ function initializeEventListeners() {
     });
 }
 
-// 카드 데이터 가져오기
+// 이전 방문 때 저장한 카드 목록을 먼저 보여주기 (이후 fetchCards가 바뀐 카드만 받아옴)
+function loadStoredCards() {
+    try {
+        const stored = JSON.parse(localStorage.getItem(CARD_STORAGE_KEY) || 'null');
+        if (stored && Array.isArray(stored.cards) && stored.version > 0) {
+            cards = stored.cards;
+            catalogVersion = stored.version;
+            filterCards();
+        }
+    } catch (error) {
+        console.warn('저장된 카드 목록을 읽지 못했습니다:', error);
+    }
+}
+
+function storeCards() {
+    try {
+        localStorage.setItem(CARD_STORAGE_KEY, JSON.stringify({ version: catalogVersion, cards }));
+    } catch (error) {
+        // 저장 공간 부족/비공개 모드 등: 다음 방문 때 전체 목록을 다시 받으면 됨
+        console.warn('카드 목록을 저장하지 못했습니다:', error);
+    }
+}
+
+// 카드 데이터 가져오기 (처음에는 전체 목록, 이후에는 마지막 버전 이후 바뀐 카드만)
 async function fetchCards() {
     try {
         console.log('=== 카드 데이터 요청 시작 ===');
-        const response = await fetch('/api/cards');
+        const response = await fetch(`/api/cards/changes?since=${catalogVersion}`);
         console.log('응답 상태:', response.status);
         
         if (!response.ok) {
@@ -53,14 +79,17 @@ async function fetchCards() {
         }
         
         const data = await response.json();
-        console.log('받은 데이터:', data);
-        console.log('카드 수:', Array.isArray(data) ? data.length : 0);
+        console.log(`받은 변경분: ${data.cards.length}개 (전체 목록: ${data.full}, 버전: ${data.version})`);
         
-        cards = Array.isArray(data) ? data.filter(c => c.view !== 0) : [];
+        cards = applyCardChanges(data.full ? [] : cards, data).filter(c => c.view !== 0);
+        catalogVersion = data.version;
+        console.log('카드 수:', cards.length);
+        storeCards();
         filterCards();
     } catch (error) {
         console.error('ERROR: 카드 가져오기 실패:', error);
         cards = [];
+        catalogVersion = 0;
         filterCards();
         
         // 사용자에게 오류 알림
@@ -79,6 +108,21 @@ async function fetchCards() {
     }
 }
 
+// 변경분을 로컬 목록에 적용 (바뀐 카드는 교체, deleted의 카드는 제거)
+function applyCardChanges(currentCards, changes) {
+    const cardsById = new Map(currentCards.map(card => [card.id, card]));
+    changes.cards.forEach(card => cardsById.set(card.id, card));
+    changes.deleted.forEach(id => cardsById.delete(id));
+    return Array.from(cardsById.values()).sort(compareCards);
+}
+
+// 서버 목록과 같은 순서: sort_order ASC, created_at DESC, id DESC
+function compareCards(a, b) {
+    return (a.sort_order || 0) - (b.sort_order || 0)
+        || String(b.created_at || '').localeCompare(String(a.created_at || ''))
+        || b.id - a.id;
+}
+
 // 검색 처리
 function handleSearch() {
     searchQuery = searchInput.value.trim();
@@ -116,9 +160,36 @@ function renderCards() {
     cardsGrid.innerHTML = filteredCards.map(card => createCardHTML(card)).join('');
 }
 
+// 썸네일은 서버의 /thumb/<id>/<너비> 프록시로 받습니다. (크기별 디스크 캐시, 이미지가 없으면 제목으로 대체 이미지 생성)
+// URL에 썸네일 버전(아래 thumbnailVersion)을 붙여 브라우저가 immutable로 캐시하고, 이미지가 바뀔 때만 새 URL로 받습니다.
+const THUMBNAIL_WIDTHS = [80, 240, 480];
+
+// 썸네일 버전: 업로드 파일명(내용의 SHA-256) 앞 16자 (카드를 수정/승인해도 이미지가 같으면 URL이 그대로)
+function thumbnailVersion(card) {
+    const sources = [card.thumbnail_url || '', ...Object.values(card.thumbnail_variants || {})];
+    for (const source of sources) {
+        const match = /[0-9a-f]{64}/.exec(String(source));
+        if (match) return match[0].slice(0, 16);
+    }
+    return '';
+}
+
+function thumbnailSrc(card, width, placeholder = false) {
+    const params = new URLSearchParams();
+    const version = thumbnailVersion(card);
+    if (version) params.set('v', version);
+    if (placeholder) params.set('placeholder', '1');
+    const query = params.toString();
+    return `/thumb/${card.id}/${width}${query ? `?${query}` : ''}`;
+}
+
+function thumbnailSrcset(card) {
+    return THUMBNAIL_WIDTHS.map(width => `${thumbnailSrc(card, width)} ${width}w`).join(', ');
+}
+
 // 카드 HTML 생성 (읽기 전용)
 function createCardHTML(card) {
-    const thumbnailUrl = card.thumbnail_url || `https://via.placeholder.com/80x60?text=${encodeURIComponent(card.webpage_name)}`;
+    const thumbnailUrl = thumbnailSrc(card, 80);
     const subjects = Array.isArray(card.useful_subjects) ? card.useful_subjects : [];
     const keywords = Array.isArray(card.keyword) ? card.keyword : [];
     
@@ -130,9 +201,11 @@ function createCardHTML(card) {
                     <div class="flex-shrink-0">
                         <img 
                             src="${thumbnailUrl}" 
+                            srcset="${thumbnailSrcset(card)}"
+                            sizes="64px"
                             alt="${card.webpage_name}"
                             class="w-16 h-12 object-cover rounded-md"
-                            onerror="this.src='https://via.placeholder.com/80x60?text=${encodeURIComponent(card.webpage_name)}'"
+                            onerror="this.onerror = null; this.removeAttribute('srcset'); this.src='${thumbnailSrc(card, 80, true)}'"
                         />
                     </div>
                     <div class="flex-1 min-w-0">
@@ -171,16 +244,18 @@ function openDetailModal(cardId) {
     
     const subjects = Array.isArray(card.useful_subjects) ? card.useful_subjects : [];
     const keywords = Array.isArray(card.keyword) ? card.keyword : [];
-    const thumbnailUrl = card.thumbnail_url || `https://via.placeholder.com/400x300?text=${encodeURIComponent(card.webpage_name)}`;
+    const thumbnailUrl = thumbnailSrc(card, 480);
     
     document.getElementById('detailContent').innerHTML = `
         <div class="space-y-6">
             <div class="text-center">
                 <img 
                     src="${thumbnailUrl}" 
+                    srcset="${thumbnailSrcset(card)}"
+                    sizes="(max-width: 480px) 100vw, 480px"
                     alt="${card.webpage_name}"
                     class="mx-auto rounded-lg shadow-md max-w-full h-48 object-cover"
-                    onerror="this.src='https://via.placeholder.com/400x300?text=${encodeURIComponent(card.webpage_name)}'"
+                    onerror="this.onerror = null; this.removeAttribute('srcset'); this.src='${thumbnailSrc(card, 480, true)}'"
                 />
             </div>
             
@@ -275,9 +350,10 @@ async function handleRequestCard(e) {
         // 새로운 썸네일이 업로드된 경우 먼저 업로드
         const fileInput = document.getElementById('requestThumbnailFile');
         if (fileInput.files && fileInput.files[0]) {
-            const thumbnailUrl = await uploadThumbnail(fileInput.files[0]);
-            if (thumbnailUrl) {
-                cardData.thumbnail_url = thumbnailUrl;
+            const uploaded = await uploadThumbnail(fileInput.files[0]);
+            if (uploaded) {
+                cardData.thumbnail_url = uploaded.url;
+                cardData.thumbnail_variants = uploaded.variants || {};
             }
         }
         
@@ -303,18 +379,17 @@ async function handleRequestCard(e) {
 
 // 썸네일 업로드
 async function uploadThumbnail(file) {
-    const formData = new FormData();
-    formData.append('thumbnail', file);
-    
     try {
+        // 파일을 요청 본문으로 그대로 전송 (서버가 청크 단위로 스트리밍 처리)
         const response = await fetch('/api/upload-thumbnail', {
             method: 'POST',
-            body: formData
+            headers: { 'Content-Type': file.type || 'application/octet-stream' },
+            body: file
         });
         
         if (response.ok) {
             const data = await response.json();
-            return data.url;
+            return data;  // { url, variants }
         } else {
             console.error('썸네일 업로드 실패');
             alert('썸네일 업로드에 실패했습니다.');
@@ -46,8 +46,9 @@ if not supabase_url or not supabase_key:
 app = None
 try:
     print("Flask 앱 import 중...")
-    from app import app as flask_app
-    app = flask_app
+    # import는 네트워크 연결 없이 끝나고, DB 연결 확인은 워커별 백그라운드 스레드에서 실행됩니다.
+    from app import create_app
+    app = create_app()
     print("✅ Flask 앱 import 성공")
     
     # Test app creation
@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+"""
+gevent 워커용 WSGI entry point
+
+Supabase 호출은 모두 동기 HTTP 요청이라 sync 워커에서는 워커 수(2)만큼만 동시에 처리됩니다.
+gevent 워커는 소켓 I/O를 기다리는 동안 다른 요청을 처리하므로 느린 DB/Storage 호출이 겹쳐서 진행됩니다.
+
+ssl, socket 등이 import되기 전에 monkey patch가 적용되어야 하므로
+(--preload 사용 시 마스터 프로세스에서 app을 import하기 때문) 반드시 이 파일을 통해 실행합니다.
+
+gunicorn wsgi_gevent:app --bind 0.0.0.0:$PORT --workers 2 --worker-class gevent --worker-connections 100 --timeout 300 --preload
+"""
+from gevent import monkey
+
+monkey.patch_all()
+
+from wsgi import app  # noqa: E402
+
+if __name__ == "__main__":
+    import os
+    from gevent.pywsgi import WSGIServer
+
+    port = int(os.environ.get('PORT', 5000))
+    print(f"🚀 gevent 서버 시작: 포트 {port}")
+    WSGIServer(('0.0.0.0', port), app).serve_forever()